@@ -0,0 +1,145 @@
+import math
+
+import numpy as np
+from tqdm.auto import tqdm
+
+from mir.ir.index import Index
+
+
+def forward_index(index: Index, doc_ids: list[int], min_df: int = 2, max_df_ratio: float = 0.5) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Invert the posting lists of an index into the list of terms of each document.
+    Terms in fewer than min_df documents can't bring documents together, and terms in most of the documents
+    are close whatever the order, so both are left out.
+
+    # Parameters
+    - index (Index): The index, it must support listing (see Index.supports_listing).
+    - doc_ids (list[int]): The doc_ids of the documents, the forward index refers to them by position in this list.
+    - min_df (int): The minimum number of documents of a term.
+    - max_df_ratio (float): The maximum fraction of the documents containing a term.
+
+    # Returns
+    - tuple[np.ndarray, np.ndarray]: The forward index in CSR format, the terms of the document at position i
+    are terms[pointers[i]:pointers[i + 1]], numbered from 0.
+    """
+    if not index.supports_listing:
+        raise ValueError(f"{index.__class__.__name__} can't list its terms")
+    positions = {doc_id: i for i, doc_id in enumerate(doc_ids)}
+    max_df = max_df_ratio * len(doc_ids)
+    term_documents = []
+    for term_id in index.get_term_ids():
+        documents = [positions[posting.doc_id] for posting in index.get_postings(term_id) if posting.doc_id in positions]
+        if min_df <= len(documents) <= max_df:
+            term_documents.append(np.array(documents, dtype=np.int64))
+    if len(term_documents) == 0:
+        return np.zeros(len(doc_ids) + 1, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    documents = np.concatenate(term_documents)
+    terms = np.repeat(np.arange(len(term_documents)), [len(d) for d in term_documents])
+    order = np.argsort(documents, kind="stable")
+    pointers = np.zeros(len(doc_ids) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(documents, minlength=len(doc_ids)), out=pointers[1:])
+    return pointers, terms[order]
+
+
+def _log_gap_cost(degrees: np.ndarray, size: int) -> np.ndarray:
+    # the estimated bits of the gaps of d postings spread over size documents
+    return degrees * np.log2(size / (degrees + 1))
+
+
+def _bisect(documents: np.ndarray, pointers: np.ndarray, terms: np.ndarray, iterations: int) -> tuple[np.ndarray, np.ndarray]:
+    n = len(documents)
+    lengths = pointers[documents + 1] - pointers[documents]
+    owner = np.repeat(np.arange(n), lengths)
+    starts = np.repeat(pointers[documents] - np.cumsum(lengths) + lengths, lengths)
+    document_terms = terms[starts + np.arange(len(owner))]
+    local_terms, document_terms = np.unique(document_terms, return_inverse=True)
+    num_terms = len(local_terms)
+    left_size = n // 2
+    right_size = n - left_size
+    right = np.zeros(n, dtype=bool)
+    right[left_size:] = True
+    for _ in range(iterations):
+        in_right = right[owner]
+        left_degrees = np.bincount(document_terms[~in_right], minlength=num_terms)
+        right_degrees = np.bincount(document_terms[in_right], minlength=num_terms)
+        cost = _log_gap_cost(left_degrees, left_size) + _log_gap_cost(right_degrees, right_size)
+        # the cost saved on each term by moving one of its documents to the other side
+        to_right = cost - _log_gap_cost(np.maximum(left_degrees - 1, 0), left_size) - _log_gap_cost(right_degrees + 1, right_size)
+        to_left = cost - _log_gap_cost(left_degrees + 1, left_size) - _log_gap_cost(np.maximum(right_degrees - 1, 0), right_size)
+        gains = np.bincount(
+            owner, weights=np.where(in_right, to_left[document_terms], to_right[document_terms]), minlength=n)
+        left_documents = np.flatnonzero(~right)
+        right_documents = np.flatnonzero(right)
+        left_documents = left_documents[np.argsort(-gains[left_documents], kind="stable")]
+        right_documents = right_documents[np.argsort(-gains[right_documents], kind="stable")]
+        # both sides are sorted by decreasing gain, so the swaps worth doing are a prefix
+        swaps = int(np.count_nonzero(gains[left_documents] + gains[right_documents[:left_size]] > 0))
+        if swaps == 0:
+            break
+        right[left_documents[:swaps]] = True
+        right[right_documents[:swaps]] = False
+    return documents[~right], documents[right]
+
+
+def graph_bisection_order(index: Index, iterations: int = 20, leaf_size: int = 16, min_df: int = 2, verbose: bool = False) -> list[int]:
+    """
+    Order the documents by recursive graph bisection, so that documents sharing many terms get close doc_ids
+    and the gaps between consecutive doc_ids of the posting lists get smaller.
+    The documents are split in two halves, then documents are swapped between the halves while the swaps
+    reduce the estimated size of the delta encoded posting lists, and each half is split again
+    until it has at most leaf_size documents.
+
+    # Parameters
+    - index (Index): The index, it must support listing (see Index.supports_listing).
+    - iterations (int): The maximum number of swap rounds of each split.
+    - leaf_size (int): The size of the partitions that are not split further.
+    - min_df (int): The minimum number of documents of the terms considered.
+    - verbose (bool): Whether to show a progress bar.
+
+    # Returns
+    - list[int]: The doc_ids of the index in the new order, to be used with convert_index.
+    """
+    if not index.supports_listing:
+        raise ValueError(f"{index.__class__.__name__} can't list its documents and terms")
+    doc_ids = list(index.get_doc_ids())
+    pointers, terms = forward_index(index, doc_ids, min_df)
+    order = np.arange(len(doc_ids))
+    partitions = [(0, len(doc_ids))]
+    total_splits = 2 ** max(0, math.ceil(math.log2(max(1, len(doc_ids) / leaf_size)))) - 1
+    with tqdm(total=total_splits, desc="Bisecting documents", disable=not verbose) as progress:
+        while len(partitions) > 0:
+            start, end = partitions.pop()
+            if end - start <= leaf_size:
+                continue
+            left, right = _bisect(order[start:end], pointers, terms, iterations)
+            order[start:end] = np.concatenate([left, right])
+            middle = start + len(left)
+            partitions.append((middle, end))
+            partitions.append((start, middle))
+            progress.update(1)
+    return [doc_ids[i] for i in order]
+
+
+def log_gap_bits(index: Index) -> float:
+    """
+    Estimate the compressibility of the posting lists of an index with the order of its doc_ids,
+    as the average number of bits of the gaps between consecutive doc_ids (log2 of the gap).
+
+    # Parameters
+    - index (Index): The index, it must support listing (see Index.supports_listing).
+
+    # Returns
+    - float: The average bits per posting.
+    """
+    if not index.supports_listing:
+        raise ValueError(f"{index.__class__.__name__} can't list its terms")
+    total_bits = 0.0
+    num_postings = 0
+    for term_id in index.get_term_ids():
+        doc_ids = np.fromiter((posting.doc_id for posting in index.get_postings(term_id)), dtype=np.int64)
+        if len(doc_ids) == 0:
+            continue
+        gaps = np.diff(doc_ids, prepend=-1)
+        total_bits += float(np.log2(gaps).sum())
+        num_postings += len(doc_ids)
+    return total_bits / num_postings if num_postings > 0 else 0.0
@@ -0,0 +1,84 @@
+from collections import OrderedDict
+import threading
+from typing import Any, Optional, Sized
+
+from mir.ir.document_contents import DocumentContents
+
+
+class DocumentCache(Sized):
+    def __init__(self, capacity: int):
+        """
+        A least recently used cache of document contents.
+
+        # Parameters
+        - capacity (int): The maximum number of documents kept in the cache.
+        """
+        assert capacity > 0, "The capacity must be positive"
+        self.capacity = capacity
+        self.entries: OrderedDict[int, DocumentContents] = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, doc_id: int) -> Optional[DocumentContents]:
+        """
+        Get the contents of a document and mark it as recently used.
+
+        # Parameters
+        - doc_id (int): The doc_id.
+
+        # Returns
+        - Optional[DocumentContents]: The contents, None if the document is not in the cache.
+        """
+        with self.lock:
+            contents = self.entries.get(doc_id)
+            if contents is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.entries.move_to_end(doc_id)
+            return contents
+
+    def put(self, doc_id: int, contents: DocumentContents) -> None:
+        """
+        Add the contents of a document, evicting the least recently used one if the cache is full.
+
+        # Parameters
+        - doc_id (int): The doc_id.
+        - contents (DocumentContents): The contents of the document.
+        """
+        with self.lock:
+            self.entries[doc_id] = contents
+            self.entries.move_to_end(doc_id)
+            if len(self.entries) > self.capacity:
+                self.entries.popitem(last=False)
+
+    def discard(self, doc_id: int) -> None:
+        """
+        Remove a document, if present, after it was changed or deleted.
+
+        # Parameters
+        - doc_id (int): The doc_id.
+        """
+        with self.lock:
+            self.entries.pop(doc_id, None)
+
+    def clear(self) -> None:
+        """
+        Remove all the documents.
+        """
+        with self.lock:
+            self.entries.clear()
+
+    def info(self) -> dict[str, Any]:
+        """
+        Get the usage of the cache.
+
+        # Returns
+        - dict[str, Any]: The number of documents in the cache "size", the "capacity", and the "hits" and "misses" of get.
+        """
+        with self.lock:
+            return {"size": len(self.entries), "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self.entries)
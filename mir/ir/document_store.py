@@ -0,0 +1,333 @@
+from array import array
+from collections import OrderedDict
+import json
+import os
+import struct
+import threading
+from typing import Any, Literal, Optional
+import zlib
+
+from mir.ir.document_contents import DocumentContents
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+Compression = Literal["zlib", "zstd"]
+
+
+class DocumentStore:
+    MAGIC = b"MIRDOCS2"
+    # the tables written before compact changed the generation of the data file
+    LEGACY_MAGIC = b"MIRDOCS1"
+
+    def __init__(self, path: str, block_size: int = 64, compression: Compression = "zlib", cache_size: int = 256, read_only: bool = False, cache_bytes: Optional[int] = None):
+        """
+        A file of document contents stored in compressed blocks, separated from the postings.
+        The contents are only read to show the results or to rerank them, so keeping them apart
+        leaves the page cache to the postings.
+
+        The blocks are appended to a data file, and path + ".idx" contains the offset table:
+        the generation of the data file, the position and size of each block and the block of each doc_id.
+        The data file is path itself, then path + "." + generation after each compact.
+        The table is rewritten by flush, so the documents put after the last flush are lost if the process stops.
+
+        # Parameters
+        - path (str): The path of the store.
+        - block_size (int): The number of documents compressed together,
+        larger blocks compress better but more text is decompressed to read a single document.
+        - compression (Compression): The compression of new blocks, "zstd" needs the zstandard package.
+        When the store already exists, its compression is used.
+        - cache_size (int): The number of decompressed blocks kept in memory.
+        - read_only (bool): Whether to open an existing store without modifying it.
+        - cache_bytes (Optional[int]): If set, the maximum size of the decompressed blocks kept in memory,
+        the least recently used blocks are evicted when either limit is reached.
+        """
+        self.path = path
+        self.block_size = block_size
+        self.cache_size = cache_size
+        self.cache_bytes = cache_bytes
+        self.read_only = read_only
+        # compact writes the live documents to the data file of the next generation
+        self.generation = 0
+        # the offset and size in bytes of each block
+        self.block_offsets = array("q")
+        self.block_sizes = array("q")
+        # the block of each doc_id, -1 if the document is not in the store
+        self.document_blocks = array("i")
+        self.pending: list[tuple[int, DocumentContents]] = []
+        self.cache: OrderedDict[int, dict[int, DocumentContents]] = OrderedDict()
+        # the size of the decompressed data of each cached block
+        self.cached_block_sizes: dict[int, int] = {}
+        self.cached_bytes = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.lock = threading.Lock()
+        if os.path.exists(f"{path}.idx"):
+            self._load_table()
+        else:
+            self.compression = compression
+        if self.compression == "zstd" and zstandard is None:
+            raise ImportError("zstd compression needs the zstandard package")
+        if not read_only:
+            # left by a compact that stopped before or after replacing the table
+            for generation in [self.generation - 1, self.generation + 1]:
+                if generation >= 0 and os.path.exists(self._data_path(generation)):
+                    os.remove(self._data_path(generation))
+        self.file = open(self._data_path(self.generation), "rb" if read_only else "ab+")
+
+    def _data_path(self, generation: int) -> str:
+        return self.path if generation == 0 else f"{self.path}.{generation}"
+
+    def _check_writable(self) -> None:
+        if self.read_only:
+            raise ValueError(f"The document store {self.path} is read-only")
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdCompressor().compress(data)
+        return zlib.compress(data)
+
+    def _decompress(self, data: bytes) -> bytes:
+        if self.compression == "zstd":
+            return zstandard.ZstdDecompressor().decompress(data)
+        return zlib.decompress(data)
+
+    def _load_table(self) -> None:
+        with open(f"{self.path}.idx", "rb") as f:
+            magic, = struct.unpack("<8s", f.read(8))
+            if magic == self.MAGIC:
+                compression, self.generation, num_blocks, num_documents = struct.unpack("<8sqqq", f.read(32))
+            elif magic == self.LEGACY_MAGIC:
+                compression, num_blocks, num_documents = struct.unpack("<8sqq", f.read(24))
+            else:
+                raise ValueError(f"{self.path}.idx is not a document store table")
+            self.compression = compression.rstrip(b"\0").decode()
+            self.block_offsets.fromfile(f, num_blocks)
+            self.block_sizes.fromfile(f, num_blocks)
+            self.document_blocks.fromfile(f, num_documents)
+
+    def _write_table(self) -> None:
+        temp_path = f"{self.path}.idx.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(struct.pack(
+                "<8s8sqqq", self.MAGIC, self.compression.encode(), self.generation,
+                len(self.block_offsets), len(self.document_blocks)))
+            self.block_offsets.tofile(f)
+            self.block_sizes.tofile(f)
+            self.document_blocks.tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        # the old table stays valid until the new one is complete
+        os.replace(temp_path, f"{self.path}.idx")
+        if hasattr(os, "O_DIRECTORY"):
+            # the rename itself must reach the disk
+            directory = os.open(os.path.dirname(os.path.abspath(self.path)), os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(directory)
+            finally:
+                os.close(directory)
+
+    def _write_block(self) -> None:
+        data = json.dumps([
+            [doc_id, contents.author, contents.title, contents.body]
+            for doc_id, contents in self.pending]).encode()
+        block = self._compress(data)
+        self.file.seek(0, os.SEEK_END)
+        offset = self.file.tell()
+        self.file.write(block)
+        block_id = len(self.block_offsets)
+        self.block_offsets.append(offset)
+        self.block_sizes.append(len(block))
+        for doc_id, _ in self.pending:
+            if doc_id >= len(self.document_blocks):
+                self.document_blocks.extend([-1] * (doc_id + 1 - len(self.document_blocks)))
+            self.document_blocks[doc_id] = block_id
+        self.pending = []
+
+    def put(self, doc_id: int, contents: DocumentContents) -> None:
+        """
+        Add or replace the contents of a document.
+
+        # Parameters
+        - doc_id (int): The doc_id.
+        - contents (DocumentContents): The contents of the document.
+        """
+        self._check_writable()
+        with self.lock:
+            self.pending.append((doc_id, DocumentContents(contents.author, contents.title, contents.body)))
+            if len(self.pending) >= self.block_size:
+                self._write_block()
+
+    def flush(self) -> None:
+        """
+        Write the pending documents and the offset table to disk.
+        """
+        if self.read_only:
+            return
+        with self.lock:
+            if len(self.pending) > 0:
+                self._write_block()
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self._write_table()
+
+    def discard(self) -> None:
+        """
+        Drop the documents put, deleted or replaced after the last flush, going back to the table on disk.
+        """
+        self._check_writable()
+        with self.lock:
+            self.pending = []
+            self.block_offsets, self.block_sizes, self.document_blocks = array("q"), array("q"), array("i")
+            if os.path.exists(f"{self.path}.idx"):
+                self._load_table()
+            self.cache.clear()
+            self.cached_block_sizes.clear()
+            self.cached_bytes = 0
+            # the blocks written after the flush are not referenced by the table
+            self.file.truncate(max((offset + size for offset, size in zip(self.block_offsets, self.block_sizes)), default=0))
+
+    def _read_block(self, block_id: int) -> dict[int, DocumentContents]:
+        block = self.cache.get(block_id)
+        if block is not None:
+            self.cache_hits += 1
+            self.cache.move_to_end(block_id)
+            return block
+        self.cache_misses += 1
+        data = self._decompress(os.pread(self.file.fileno(), self.block_sizes[block_id], self.block_offsets[block_id]))
+        block = {
+            doc_id: DocumentContents(author, title, body)
+            for doc_id, author, title, body in json.loads(data)}
+        self.cache[block_id] = block
+        self.cached_block_sizes[block_id] = len(data)
+        self.cached_bytes += len(data)
+        while len(self.cache) > self.cache_size or (self.cache_bytes is not None and self.cached_bytes > self.cache_bytes):
+            evicted_block_id, _ = self.cache.popitem(last=False)
+            self.cached_bytes -= self.cached_block_sizes.pop(evicted_block_id)
+        return block
+
+    def get_many(self, doc_ids: list[int]) -> list[DocumentContents]:
+        """
+        Get the contents of many documents, each block is decompressed at most once.
+
+        # Parameters
+        - doc_ids (list[int]): The doc_ids.
+
+        # Returns
+        - list[DocumentContents]: The contents of each document, in the same order as doc_ids.
+        """
+        with self.lock:
+            pending = {doc_id: contents for doc_id, contents in self.pending}
+            ret = []
+            for doc_id in doc_ids:
+                contents = pending.get(doc_id)
+                if contents is None:
+                    block_id = self.document_blocks[doc_id] if doc_id < len(self.document_blocks) else -1
+                    if block_id < 0:
+                        raise KeyError(f"Document {doc_id} is not in the store")
+                    contents = self._read_block(block_id)[doc_id]
+                # a copy, so the results can be modified without changing the cache
+                ret.append(DocumentContents(contents.author, contents.title, contents.body))
+            return ret
+
+    def get(self, doc_id: int) -> DocumentContents:
+        """
+        Get the contents of a document.
+
+        # Parameters
+        - doc_id (int): The doc_id.
+
+        # Returns
+        - DocumentContents: The contents of the document.
+        """
+        return self.get_many([doc_id])[0]
+
+    def __contains__(self, doc_id: int) -> bool:
+        with self.lock:
+            return any(pending_doc_id == doc_id for pending_doc_id, _ in self.pending) or \
+                (doc_id < len(self.document_blocks) and self.document_blocks[doc_id] >= 0)
+
+    def delete(self, doc_id: int) -> None:
+        """
+        Remove a document, its space is reclaimed by compact.
+
+        # Parameters
+        - doc_id (int): The doc_id.
+        """
+        self._check_writable()
+        with self.lock:
+            self.pending = [(pending_doc_id, contents) for pending_doc_id, contents in self.pending if pending_doc_id != doc_id]
+            if doc_id < len(self.document_blocks):
+                self.document_blocks[doc_id] = -1
+
+    def compact(self) -> None:
+        """
+        Rewrite the store keeping only the documents that were not deleted or replaced.
+        The documents are written to the data file of the next generation, which is only used
+        once the table that references it has replaced the old one, so the store stays valid if the process stops.
+        """
+        self._check_writable()
+        self.flush()
+        with self.lock:
+            live_doc_ids = [doc_id for doc_id, block_id in enumerate(self.document_blocks) if block_id >= 0]
+            old_file = self.file
+            old_offsets, old_sizes, old_blocks = self.block_offsets, self.block_sizes, self.document_blocks
+            old_path = self._data_path(self.generation)
+            self.file = open(self._data_path(self.generation + 1), "wb+")
+            self.block_offsets, self.block_sizes, self.document_blocks = array("q"), array("q"), array("i")
+            self.cache.clear()
+            self.cached_block_sizes.clear()
+            self.cached_bytes = 0
+            decoded_block_id, decoded_block = -1, {}
+            for doc_id in live_doc_ids:
+                if old_blocks[doc_id] != decoded_block_id:
+                    decoded_block_id = old_blocks[doc_id]
+                    data = os.pread(old_file.fileno(), old_sizes[decoded_block_id], old_offsets[decoded_block_id])
+                    decoded_block = {
+                        doc_id: DocumentContents(author, title, body)
+                        for doc_id, author, title, body in json.loads(self._decompress(data))}
+                self.pending.append((doc_id, decoded_block[doc_id]))
+                if len(self.pending) >= self.block_size:
+                    self._write_block()
+            if len(self.pending) > 0:
+                self._write_block()
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.generation += 1
+            self._write_table()
+            old_file.close()
+            os.remove(old_path)
+
+    def disk_size(self) -> int:
+        """
+        Get the size in bytes of the store on disk, with its offset table.
+        """
+        return os.path.getsize(self._data_path(self.generation)) + (os.path.getsize(f"{self.path}.idx") if os.path.exists(f"{self.path}.idx") else 0)
+
+    def cache_info(self) -> dict[str, Any]:
+        """
+        Get the usage of the cache of decompressed blocks.
+
+        # Returns
+        - dict[str, Any]: The number of cached "blocks", the "bytes" of their decompressed data,
+        the "capacity" in blocks, the "capacity_bytes" (None if unlimited), and the "hits" and "misses".
+        """
+        with self.lock:
+            return {
+                "blocks": len(self.cache),
+                "bytes": self.cached_bytes,
+                "capacity": self.cache_size,
+                "capacity_bytes": self.cache_bytes,
+                "hits": self.cache_hits,
+                "misses": self.cache_misses,
+            }
+
+    def close(self) -> None:
+        """
+        Write the pending documents and close the file.
+        """
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
@@ -0,0 +1,137 @@
+import pickle
+from typing import Optional
+
+import numpy as np
+from tqdm.auto import tqdm
+
+from mir.ir.impls.bm25f_scoring import BM25F_FIELD_INDICES, BM25FScoringFunction
+from mir.ir.index import Index
+
+
+class ImpactIndex:
+    def __init__(self, k1: float, b: float, field_weights: dict[str, float], bits: int, scale: float, num_slots: int):
+        """
+        Posting lists of precomputed BM25F scores, quantized to small integers (impacts) and sorted by decreasing impact,
+        for score-at-a-time retrieval (see the "impact" mode of Ir.rank).
+        Each list is split in segments of documents with the same impact.
+        Build it with ImpactIndex.build, the impacts refer to the statistics of the index at that time,
+        so it must be built again after the index changes (deleted documents are still skipped).
+
+        # Parameters
+        - k1 (float): The k1 parameter of BM25F.
+        - b (float): The b parameter of BM25F.
+        - field_weights (dict[str, float]): The weight of each field.
+        - bits (int): The number of bits of the impacts.
+        - scale (float): The score corresponding to the largest impact.
+        - num_slots (int): One more than the largest doc_id.
+        """
+        self.k1 = k1
+        self.b = b
+        self.field_weights = field_weights
+        self.bits = bits
+        self.scale = scale
+        self.num_slots = num_slots
+        # for each term, the impact of each segment, the start of each segment (and the end of the last one)
+        # and the doc_ids of all the segments, sorted by doc_id within a segment
+        self.segments: dict[str, tuple[np.ndarray, np.ndarray, np.ndarray]] = {}
+
+    @staticmethod
+    def _term_scores(
+            index: Index, term_id: int, scoring_function: BM25FScoringFunction,
+            lengths: np.ndarray, avg_field_lengths: dict[str, float], num_docs: int) -> tuple[np.ndarray, np.ndarray]:
+        postings = list(index.get_postings(term_id))
+        doc_ids = np.fromiter((posting.doc_id for posting in postings), dtype=np.int64, count=len(postings))
+        # all the postings of the term are scored at once, as documents of a query with a single term
+        tf = np.zeros((len(postings), 1, 3))
+        for field, field_index in BM25F_FIELD_INDICES.items():
+            tf[:, 0, field_index] = np.fromiter((posting.occurrences.get(field, 0) for posting in postings), dtype=np.float64, count=len(postings))
+        plan = scoring_function.prepare([index.get_term(term_id)], num_docs, avg_field_lengths)
+        return doc_ids, scoring_function.score_batch(plan, tf, lengths[doc_ids])
+
+    @staticmethod
+    def build(index: Index, scoring_function: Optional[BM25FScoringFunction] = None, bits: int = 8, verbose: bool = False) -> "ImpactIndex":
+        """
+        Compute the quantized BM25F score of every posting of an index.
+        The postings are read twice, first to find the largest score, then to quantize the scores,
+        so only the impacts of the index are kept in memory.
+
+        # Parameters
+        - index (Index): The index, it must support listing (see Index.supports_listing).
+        - scoring_function (Optional[BM25FScoringFunction]): The parameters of BM25F, the defaults if None.
+        - bits (int): The number of bits of the impacts, scores are mapped linearly to 1 ... 2^bits - 1.
+        - verbose (bool): Whether to show progress bars.
+
+        # Returns
+        - ImpactIndex: The impact index.
+        """
+        if not index.supports_listing:
+            raise ValueError(f"{index.__class__.__name__} can't list its documents and terms")
+        scoring_function = scoring_function if scoring_function is not None else BM25FScoringFunction()
+        doc_ids = list(index.get_doc_ids())
+        num_slots = max(doc_ids) + 1 if len(doc_ids) > 0 else 0
+        lengths = np.zeros((num_slots, 3))
+        for doc_id in tqdm(doc_ids, desc="Reading document lengths", disable=not verbose):
+            lengths[doc_id] = index.get_document_info(doc_id).lengths
+        global_info = index.get_global_info()
+        term_ids = list(index.get_term_ids())
+        scale = 0.0
+        for term_id in tqdm(term_ids, desc="Finding the largest score", disable=not verbose):
+            _, scores = ImpactIndex._term_scores(index, term_id, scoring_function, lengths, global_info["avg_field_lengths"], global_info["num_docs"])
+            if len(scores) > 0:
+                scale = max(scale, float(scores.max()))
+        ret = ImpactIndex(scoring_function.k1, scoring_function.b, dict(scoring_function.field_weights), bits, scale, num_slots)
+        levels = 2 ** bits - 1
+        for term_id in tqdm(term_ids, desc="Quantizing scores", disable=not verbose):
+            term_doc_ids, scores = ImpactIndex._term_scores(index, term_id, scoring_function, lengths, global_info["avg_field_lengths"], global_info["num_docs"])
+            # postings that can't increase the score are left out
+            keep = scores > 0
+            if scale <= 0 or not keep.any():
+                continue
+            impacts = np.clip(np.ceil(scores[keep] / scale * levels), 1, levels).astype(np.int64)
+            term_doc_ids = term_doc_ids[keep]
+            order = np.lexsort((term_doc_ids, -impacts))
+            impacts, term_doc_ids = impacts[order], term_doc_ids[order]
+            starts = np.flatnonzero(np.diff(impacts, prepend=levels + 1))
+            ret.segments[index.get_term(term_id).term] = (
+                impacts[starts].astype(np.uint16), np.append(starts, len(impacts)), term_doc_ids.astype(np.int32))
+        return ret
+
+    def get_segments(self, terms: list[str]) -> list[Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]]:
+        """
+        Get the impact ordered lists of some terms.
+
+        # Parameters
+        - terms (list[str]): The terms in string format.
+
+        # Returns
+        - list[Optional[tuple[np.ndarray, np.ndarray, np.ndarray]]]: For each term, None if it has no impacts,
+        otherwise the impact of each segment, the boundaries of the segments and the doc_ids.
+        """
+        return [self.segments.get(term) for term in terms]
+
+    def save(self, path: str) -> None:
+        """
+        Save the impact index with pickle.
+
+        # Parameters
+        - path (str): The path of the file.
+        """
+        with open(path, "wb") as f:
+            pickle.dump(self, f)
+
+    @staticmethod
+    def load(path: str) -> "ImpactIndex":
+        """
+        Load an impact index saved with save.
+
+        # Parameters
+        - path (str): The path of the file.
+
+        # Returns
+        - ImpactIndex: The impact index.
+        """
+        with open(path, "rb") as f:
+            ret = pickle.load(f)
+        if not isinstance(ret, ImpactIndex):
+            raise ValueError(f"{path} is not an impact index")
+        return ret
@@ -1,51 +1,131 @@
-from typing import List, Dict
+from typing import List, Dict, Optional
 from mir.ir.document_info import DocumentInfo
 from mir.ir.posting import Posting
-from mir.ir.scoring_function import ScoringFunction
+from mir.ir.scoring_function import ScoringBatch, ScoringFunction
 from mir.ir.term import Term
 import math
 
+import numpy as np
+
+# the order of the fields in DocumentInfo.lengths and in the tf arrays of BM25FScoringFunction.score_batch
+BM25F_FIELD_INDICES = {"author": 0, "title": 1, "body": 2}
+
+
+class BM25FQueryPlan:
+    def __init__(self, term_ids: list[int], idfs: list[float], fields: list[tuple[str, int, float, float]]):
+        """
+        The part of BM25F that depends only on the query and the collection, computed once per query
+        by BM25FScoringFunction.prepare.
+
+        # Parameters
+        - term_ids (list[int]): The term_ids of the query, in the order of the query.
+        - idfs (list[float]): The idf of each term, multiplied by its query_weight.
+        - fields (list[tuple[str, int, float, float]]): The name, the index in the lengths, the weight
+        and the average length of each weighted field.
+        """
+        self.term_ids = term_ids
+        self.idfs = idfs
+        self.fields = fields
+
 
 class BM25FScoringFunction(ScoringFunction):
     def __init__(self, k1: float = 1.5, b: float = 0.75, field_weights: Dict[str, float] = None):
         self.k1 = k1
         self.b = b
         self.field_weights = field_weights if field_weights is not None else {'title': 2.0, 'body': 1.0, 'author': 0.5}
+        # the plan of the last query, as (query, num_docs, avg_field_lengths, plan)
+        self._last_plan: Optional[tuple[List[Term], int, dict[str, int], BM25FQueryPlan]] = None
 
-    def _build_postings_dict(self, postings: List[Posting]) -> Dict[int, Posting]:
-        return {posting.term_id: posting for posting in postings}
+    def prepare(self, query: List[Term], num_docs: int, avg_field_lengths: dict[str, int]) -> BM25FQueryPlan:
+        """
+        Compute the idf of the terms and the field parameters of a query.
 
-    def __call__(self, document: DocumentInfo, postings: List[Posting], query: List[Term], *, num_docs: int, avg_field_lengths: dict[str, int], **_) -> float:
-        postings_dict = self._build_postings_dict(postings)
-        score = 0.0
-        for term in query:
-            if term.id in postings_dict:
-                score += self._rsv(term, document, num_docs, postings_dict, avg_field_lengths)
-        return score
+        # Parameters
+        - query (List[Term]): The query terms.
+        - num_docs (int): The number of documents in the collection.
+        - avg_field_lengths (dict[str, int]): The average length of each field.
 
-    def _rsv(self, term: Term, document: DocumentInfo, num_docs: int, postings_dict: dict[int, Posting], avg_field_lengths: dict[str, int]) -> float:
-        tfd = self._wtf(term, document, postings_dict, avg_field_lengths)
-        idf = math.log(num_docs / term.info['document_frequency'])
+        # Returns
+        - BM25FQueryPlan: The plan, for score and score_batch.
+        """
+        return BM25FQueryPlan(
+            [term.id for term in query],
+            # the weight of a term merged by a QueryRewriter, 1 otherwise,
+            # a term whose documents were all deleted keeps its column with a weight of 0
+            [math.log(num_docs / term.info['document_frequency']) * term.info.get('query_weight', 1)
+             if term.info['document_frequency'] > 0 else 0.0 for term in query],
+            [(field, BM25F_FIELD_INDICES[field], weight, avg_field_lengths[field]) for field, weight in self.field_weights.items()])
 
-        if tfd > 0:
-            return (tfd / (self.k1 + tfd)) * idf
-        return 0.0
+    def _get_plan(self, query: List[Term], num_docs: int, avg_field_lengths: dict[str, int]) -> BM25FQueryPlan:
+        # the documents of a query are scored one after the other with the same arguments, so the plan is reused
+        last_plan = self._last_plan
+        if last_plan is not None and last_plan[0] is query and last_plan[1] == num_docs and last_plan[2] == avg_field_lengths:
+            return last_plan[3]
+        plan = self.prepare(query, num_docs, avg_field_lengths)
+        self._last_plan = (query, num_docs, avg_field_lengths, plan)
+        return plan
 
-    def _wtf(self, term: Term, document: DocumentInfo, postings_dict: dict[int, Posting], avg_field_lengths: dict[str, int]) -> float:
-        tfd = 0.0
-        field_indices = {"author": 0, "title": 1, "body": 2}
+    def __call__(self, document: DocumentInfo, postings: List[Posting], query: List[Term], *, num_docs: int, avg_field_lengths: dict[str, int], **_) -> float:
+        return self.score(self._get_plan(query, num_docs, avg_field_lengths), document, postings)
+
+    def columnar_call(self, batch: ScoringBatch, query: List[Term], *, num_docs: int, avg_field_lengths: dict[str, int], **_) -> np.ndarray:
+        return self.score_batch(self._get_plan(query, num_docs, avg_field_lengths), batch.tf, batch.lengths)
 
-        if term.id not in postings_dict:
-            return 0.0
+    def score(self, plan: BM25FQueryPlan, document: DocumentInfo, postings: List[Posting]) -> float:
+        """
+        Score a document with a query plan.
 
-        posting = postings_dict[term.id]
-        for field, weight in self.field_weights.items():
-            tf = posting.occurrences.get(field, 0)
-            if tf == 0:
+        # Parameters
+        - plan (BM25FQueryPlan): The plan of the query, from prepare.
+        - document (DocumentInfo): The document info.
+        - postings (List[Posting]): The postings of the document for the terms of the query.
+
+        # Returns
+        - float: The score of the document.
+        """
+        occurrences = {posting.term_id: posting.occurrences for posting in postings}
+        one_minus_b = 1 - self.b
+        score = 0.0
+        for term_id, idf in zip(plan.term_ids, plan.idfs):
+            term_occurrences = occurrences.get(term_id)
+            if term_occurrences is None:
                 continue
-            field_index = field_indices[field]
-            avg_dlf = avg_field_lengths[field]
-            bb = 1 - self.b + self.b * document.lengths[field_index] / avg_dlf
-            tfd += weight * tf / bb
+            tfd = 0.0
+            for field, field_index, weight, avg_dlf in plan.fields:
+                tf = term_occurrences.get(field, 0)
+                if tf == 0:
+                    continue
+                bb = one_minus_b + self.b * document.lengths[field_index] / avg_dlf
+                tfd += weight * tf / bb
+            if tfd > 0:
+                score += (tfd / (self.k1 + tfd)) * idf
+        return score
+
+    def score_batch(self, plan: BM25FQueryPlan, tf: np.ndarray, lengths: np.ndarray) -> np.ndarray:
+        """
+        Score many documents at once with a query plan.
+        The operations are the ones of score in the same order, so the scores are identical.
+
+        # Parameters
+        - plan (BM25FQueryPlan): The plan of the query, from prepare.
+        - tf (np.ndarray): The occurrences of the terms, of shape (documents, terms, 3),
+        with the terms in the order of the plan and the fields in the order of BM25F_FIELD_INDICES.
+        - lengths (np.ndarray): The field lengths of the documents, of shape (documents, 3).
 
-        return tfd
+        # Returns
+        - np.ndarray: The score of each document.
+        """
+        tf = np.asarray(tf, dtype=np.float64)
+        lengths = np.asarray(lengths, dtype=np.float64)
+        one_minus_b = 1 - self.b
+        scores = np.zeros(len(lengths))
+        # fields that no document contains may have an average length of 0, like in score they are never used
+        with np.errstate(divide="ignore", invalid="ignore"):
+            bbs = [one_minus_b + self.b * lengths[:, field_index] / avg_dlf for _, field_index, _, avg_dlf in plan.fields]
+            for i, idf in enumerate(plan.idfs):
+                tfd = np.zeros(len(lengths))
+                for (_, field_index, weight, _), bb in zip(plan.fields, bbs):
+                    term_tf = tf[:, i, field_index]
+                    tfd += np.where(term_tf > 0, weight * term_tf / bb, 0.0)
+                scores += np.where(tfd > 0, (tfd / (self.k1 + tfd)) * idf, 0.0)
+        return scores
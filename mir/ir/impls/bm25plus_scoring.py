@@ -0,0 +1,42 @@
+from typing import List
+
+import numpy as np
+
+from mir.ir.document_info import DocumentInfo
+from mir.ir.posting import Posting
+from mir.ir.scoring_function import ScoringBatch, ScoringFunction
+from mir.ir.term import Term
+
+
+class BM25PlusScoringFunction(ScoringFunction):
+    def __init__(self, k1: float = 1.2, b: float = 0.75, delta: float = 1.0):
+        """
+        BM25+ on the whole document, with the fields added together.
+        Each query term that occurs in a document adds at least delta times its idf,
+        so long documents are not scored below short documents that don't contain the term.
+
+        # Parameters
+        - k1 (float): The saturation of the term frequency.
+        - b (float): The length normalization.
+        - delta (float): The lower bound of the normalized term frequency.
+        """
+        self.k1 = k1
+        self.b = b
+        self.delta = delta
+
+    def __call__(self, document: DocumentInfo, postings: List[Posting], query: List[Term], **kwargs) -> float:
+        batch = ScoringBatch.from_postings([document.id], [document.lengths], [postings], query)
+        return float(self.columnar_call(batch, query, **kwargs)[0])
+
+    def columnar_call(self, batch: ScoringBatch, query: List[Term], *, num_docs: int, avg_field_lengths: dict[str, float], **_) -> np.ndarray:
+        tf = batch.tf.sum(axis=2)
+        length_norm = self.k1 * (1 - self.b + self.b * batch.lengths.sum(axis=1) / sum(avg_field_lengths.values()))
+        scores = np.zeros(len(batch))
+        for i, term in enumerate(query):
+            document_frequency = term.info["document_frequency"]
+            if document_frequency == 0:
+                continue
+            idf = np.log((num_docs + 1) / document_frequency) * term.info.get("query_weight", 1)
+            term_tf = tf[:, i]
+            scores += np.where(term_tf > 0, idf * ((self.k1 + 1) * term_tf / (length_norm + term_tf) + self.delta), 0.0)
+        return scores
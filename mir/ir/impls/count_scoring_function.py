@@ -1,6 +1,16 @@
-from mir.ir.scoring_function import ScoringFunction
+import numpy as np
+
+from mir.ir.scoring_function import ScoringBatch, ScoringFunction
 
 
 class CountScoringFunction(ScoringFunction):
     def __call__(self, document, postings, query, **kwargs):
-        return len(postings) / len(query)
\ No newline at end of file
+        # the weights of the query terms the document contains, over the weights of all the query terms
+        matched = set(posting.term_id for posting in postings)
+        weights = [term.info.get("query_weight", 1) for term in query]
+        return float(np.dot([term.id in matched for term in query], weights) / np.sum(weights))
+
+    def columnar_call(self, batch: ScoringBatch, query, **kwargs) -> np.ndarray:
+        # a document has a posting for each query term it contains
+        weights = np.array([term.info.get("query_weight", 1) for term in query], dtype=np.float64)
+        return (batch.tf.sum(axis=2) > 0) @ weights / np.sum(weights)
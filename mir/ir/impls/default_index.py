@@ -1,26 +1,66 @@
-from collections import OrderedDict
+from collections import Counter, OrderedDict
 from collections.abc import Generator
 import os
 import pickle
+import sys
 from typing import Any, Optional
 from mir.ir.document_info import DocumentInfo
 from mir.ir.document_contents import DocumentContents
+from mir.ir.document_store import DocumentStore
 from mir.ir.index import Index
+from mir.ir.memory_budget import DOCUMENT_LENGTHS_BYTES, POSTING_BYTES, TERM_BYTES, MemoryBudget
+from mir.ir.positions import encode_positions
 from mir.ir.posting import Posting
-from mir.ir.term import Term
+from mir.ir.posting_cursor import ListPostingCursor, PostingCursor
+from mir.ir.term import Term, term_statistics
 from mir.ir.token_ir import TokenLocation
 from mir.ir.tokenizer import Tokenizer
+from mir.ir.tombstones import Tombstones
 from mir.utils.sized_generator import SizedGenerator
 
+# the version of the pickled dict of the index
+DEFAULT_INDEX_FORMAT = 1
+# the fields of the tuples pickled before the format version, the older tuples have the first 5, 7, 8 or 9
+DEFAULT_INDEX_FIELDS = [
+    "postings", "document_info", "document_contents", "terms", "term_lookup",
+    "total_field_lengths", "tombstones", "positions", "separate_contents", "external_ids"]
+DEFAULT_INDEX_TUPLE_LENGTHS = (5, 7, 8, 9, 10)
+
 
 class DefaultIndex(Index):
-    def __init__(self, path: Optional[str] = None):
+    supports_deletion = True
+    supports_listing = True
+    supports_import = True
+
+    def __init__(self, path: Optional[str] = None, positions: bool = False, separate_contents: bool = False, memory_budget: Optional[MemoryBudget] = None):
+        """
+        An index kept in memory and saved with pickle.
+
+        # Parameters
+        - path (Optional[str]): The path where the index is saved. If it exists, the index is loaded from it.
+        - positions (bool): Whether to store the positions of the terms, needed by phrase queries.
+        - separate_contents (bool): Whether to store the contents of the documents in a DocumentStore at path + ".docs"
+        instead of keeping them in memory and in the pickle.
+        positions and separate_contents are ignored when an existing index is loaded,
+        the index keeps the settings it was created with.
+        - memory_budget (Optional[MemoryBudget]): If set, it limits the size of the cache of the DocumentStore.
+        Everything else is always in memory, memory_usage reports its estimated size.
+        """
         super().__init__()
+        self.memory_budget = memory_budget
         self.postings: list[OrderedDict[Posting]] = []
         self.document_info: list[DocumentInfo] = []
         self.document_contents: list[DocumentContents] = []
         self.terms: list[Term] = []
         self.term_lookup: dict[str, int] = {}
+        self.tombstones = Tombstones()
+        # the id in the collection of the documents that were renumbered
+        self.external_ids: dict[int, int] = {}
+        self.positions = positions
+        self.separate_contents = separate_contents
+        self.document_store: Optional[DocumentStore] = None
+        # the doc_ids and postings of the posting lists as arrays, for binary search, built when needed
+        self.posting_arrays: dict[int, tuple[list[int], list[Posting]]] = {}
         self.path = None
         self.total_field_lengths = {
             "author": 0,
@@ -31,37 +71,74 @@ class DefaultIndex(Index):
             self.path = path
             if os.path.exists(path):
                 self.load()
+        if self.separate_contents:
+            if path is None:
+                raise ValueError("separate_contents needs the index to be saved in a file")
+            if memory_budget is not None:
+                # the cached blocks are only limited by their size
+                cache_bytes = memory_budget.allocate({}, posting_cache=False)["document_cache"]
+                self.document_store = DocumentStore(f"{path}.docs", cache_size=sys.maxsize, cache_bytes=cache_bytes)
+            else:
+                self.document_store = DocumentStore(f"{path}.docs")
     
     def get_postings(self, term_id: int) -> Generator[Posting, None, None]:
         for doc_id, posting in self.postings[term_id].items():
             yield posting
 
+    def get_posting_cursor(self, term_id: int, cost: Optional[int] = None) -> PostingCursor:
+        if term_id not in self.posting_arrays:
+            postings = self.postings[term_id]
+            self.posting_arrays[term_id] = (list(postings.keys()), list(postings.values()))
+        doc_ids, postings = self.posting_arrays[term_id]
+        return ListPostingCursor(doc_ids, postings)
+
     def get_document_info(self, doc_id: int) -> DocumentInfo:
         return self.document_info[doc_id]
     
     def get_document_contents(self, doc_id: int) -> DocumentContents:
+        if self.document_store is not None:
+            return self.document_store.get(doc_id)
         return self.document_contents[doc_id]
 
+    def get_documents_contents(self, doc_ids: list[int]) -> list[DocumentContents]:
+        if self.document_store is not None:
+            return self.document_store.get_many(doc_ids)
+        return [self.document_contents[doc_id] for doc_id in doc_ids]
+
     def get_term(self, term_id: int) -> Term:
         return self.terms[term_id]
 
     def get_term_id(self, term: str) -> Optional[int]:
         return self.term_lookup.get(term)
+
+    def get_terms(self, terms: list[str]) -> list[Optional[Term]]:
+        return [
+            Term(self.terms[term_id].term, term_id, **self.terms[term_id].info, posting_size=len(self.postings[term_id]))
+            if term_id is not None else None
+            for term_id in map(self.term_lookup.get, terms)]
     
     def get_global_info(self) -> dict[str, Any]:
         return {
             "avg_field_lengths": {
-                "author": self.total_field_lengths["author"] / len(self.document_info),
-                "title": self.total_field_lengths["title"] / len(self.document_info),
-                "body": self.total_field_lengths["body"] / len(self.document_info)
+                "author": self.total_field_lengths["author"] / len(self),
+                "title": self.total_field_lengths["title"] / len(self),
+                "body": self.total_field_lengths["body"] / len(self)
             },
-            "num_docs": len(self.document_info)
+            "num_docs": len(self),
+            "collection_length": sum(self.total_field_lengths.values()),
+            "total_field_lengths": dict(self.total_field_lengths)
         }
 
     def __len__(self) -> int:
-        return len(self.document_info)
+        return len(self.document_info) - len(self.tombstones)
 
     def index_document(self, doc: DocumentContents, tokenizer: Tokenizer) -> None:
+        doc_id = len(self.document_info)
+        self.document_info.append(None)
+        self.document_contents.append(None)
+        self._index_document_with_id(doc_id, doc, tokenizer)
+
+    def _index_document_with_id(self, doc_id: int, doc: DocumentContents, tokenizer: Tokenizer) -> None:
         terms = tokenizer.tokenize_document(doc)
         author_length = sum(1 for term in terms if term.location == TokenLocation.AUTHOR)
         title_length = sum(1 for term in terms if term.location == TokenLocation.TITLE)
@@ -69,22 +146,182 @@ class DefaultIndex(Index):
         self.total_field_lengths["author"] += author_length
         self.total_field_lengths["title"] += title_length
         self.total_field_lengths["body"] += body_length
+        field_names = {TokenLocation.AUTHOR: "author", TokenLocation.TITLE: "title", TokenLocation.BODY: "body"}
         term_ids = []
+        # the positions of each term in each field, counted after the stopwords are removed
+        term_positions: dict[int, dict[str, list[int]]] = {}
+        field_lengths = {"author": 0, "title": 0, "body": 0}
         for term in terms:
             if term.text not in self.term_lookup:
                 term_id = len(self.terms)
-                self.terms.append(Term(term.text, term_id))
+                self.terms.append(Term(term.text, term_id, **term_statistics([], {})))
                 self.term_lookup[term.text] = term_id
             else:
                 term_id = self.term_lookup[term.text]
-            term_ids.append(term_id)
-        doc_id = len(self.document_info)
-        self.document_info.append(DocumentInfo.from_document_contents(doc_id, doc, tokenizer))
-        self.document_contents.append(doc)
-        for term_id in term_ids:
-            if term_id >= len(self.postings):
+            field = field_names[term.location]
+            term_ids.append((term_id, field))
+            if self.positions:
+                term_positions.setdefault(term_id, {"author": [], "title": [], "body": []})[field].append(field_lengths[field])
+            field_lengths[field] += 1
+        self.document_info[doc_id] = DocumentInfo(doc_id, [author_length, title_length, body_length])
+        if self.document_store is not None:
+            self.document_store.put(doc_id, doc)
+        else:
+            self.document_contents[doc_id] = doc
+        for term_id, field in term_ids:
+            self.posting_arrays.pop(term_id, None)
+            while term_id >= len(self.postings):
                 self.postings.append(OrderedDict())
-            self.postings[term_id][doc_id] = Posting(doc_id, term_id)
+            postings = self.postings[term_id]
+            if doc_id not in postings:
+                self.terms[term_id].info["document_frequency"] += 1
+                # keep the posting list sorted if the document is being reindexed
+                sorted_insert = len(postings) > 0 and next(reversed(postings)) > doc_id
+                postings[doc_id] = Posting(doc_id, term_id)
+                if sorted_insert:
+                    self.postings[term_id] = OrderedDict(sorted(postings.items()))
+                    postings = self.postings[term_id]
+            postings[doc_id].occurrences[field] += 1
+            self.terms[term_id].info["collection_frequency"] += 1
+            self.terms[term_id].info[f"collection_frequency_{field}"] += 1
+        document_length = author_length + title_length + body_length
+        for term_id, tf in Counter(term_id for term_id, _ in term_ids).items():
+            info = self.terms[term_id].info
+            info["max_tf"] = max(info["max_tf"], tf)
+            if info["min_document_length"] is None or document_length < info["min_document_length"]:
+                info["min_document_length"] = document_length
+        for term_id, positions in term_positions.items():
+            self.postings[term_id][doc_id].positions = encode_positions(positions)
+
+    def _remove_from_statistics(self, doc_id: int, tokenizer: Tokenizer) -> None:
+        for field, length in zip(["author", "title", "body"], self.document_info[doc_id].lengths):
+            self.total_field_lengths[field] -= length
+        # max_tf and min_document_length are left as bounds until compact
+        for term_id in self._document_term_ids(doc_id, tokenizer):
+            info = self.terms[term_id].info
+            info["document_frequency"] -= 1
+            for field, occurrences in self.postings[term_id][doc_id].occurrences.items():
+                info["collection_frequency"] -= occurrences
+                info[f"collection_frequency_{field}"] -= occurrences
+
+    def _document_term_ids(self, doc_id: int, tokenizer: Tokenizer) -> set[int]:
+        if self.document_store is not None:
+            doc = self.document_store.get(doc_id) if doc_id in self.document_store else None
+        else:
+            doc = self.document_contents[doc_id]
+        if doc is None:
+            # already compacted, the document is not in any posting list
+            return set()
+        tokens = tokenizer.tokenize_document(doc)
+        return set(self.term_lookup[token.text] for token in tokens if token.text in self.term_lookup)
+
+    def delete_document(self, doc_id: int, tokenizer: Tokenizer) -> None:
+        if doc_id >= len(self.document_info) or self.document_info[doc_id] is None or doc_id in self.tombstones:
+            raise ValueError(f"Document {doc_id} is not in the index")
+        self._remove_from_statistics(doc_id, tokenizer)
+        self.tombstones.add(doc_id)
+
+    def update_document(self, doc_id: int, doc: DocumentContents, tokenizer: Tokenizer) -> None:
+        if doc_id >= len(self.document_info):
+            raise ValueError(f"Document {doc_id} is not in the index")
+        if doc_id not in self.tombstones:
+            self._remove_from_statistics(doc_id, tokenizer)
+        for term_id in self._document_term_ids(doc_id, tokenizer):
+            del self.postings[term_id][doc_id]
+            self.posting_arrays.pop(term_id, None)
+        self.tombstones.discard(doc_id)
+        self._index_document_with_id(doc_id, doc, tokenizer)
+
+    def get_tombstones(self) -> Tombstones:
+        return self.tombstones
+
+    def compact(self) -> None:
+        # doc_ids are positions in the lists so the slots of deleted documents are kept
+        # and their tombstones stay valid after compaction
+        for postings in self.postings:
+            for doc_id in [doc_id for doc_id in postings if doc_id in self.tombstones]:
+                del postings[doc_id]
+        for doc_id in self.tombstones:
+            self.document_contents[doc_id] = None
+            self.external_ids.pop(doc_id, None)
+            if self.document_store is not None:
+                self.document_store.delete(doc_id)
+        if self.document_store is not None:
+            self.document_store.compact()
+        self.posting_arrays.clear()
+        self._recompute_term_statistics()
+
+    def _recompute_term_statistics(self) -> None:
+        # the statistics of every term from its postings, so the bounds are exact
+        document_lengths = {doc_id: sum(info.lengths) for doc_id, info in enumerate(self.document_info) if info is not None}
+        for term in self.terms:
+            postings = self.postings[term.id].values() if term.id < len(self.postings) else []
+            term.info.update(term_statistics(
+                (posting for posting in postings if posting.doc_id not in self.tombstones), document_lengths))
+
+    def get_doc_ids(self) -> Generator[int, None, None]:
+        for doc_id, info in enumerate(self.document_info):
+            if info is not None and doc_id not in self.tombstones:
+                yield doc_id
+
+    def get_term_ids(self) -> Generator[int, None, None]:
+        for term_id, postings in enumerate(self.postings):
+            if len(postings) > 0:
+                yield term_id
+
+    def get_external_ids(self, doc_ids: list[int]) -> list[int]:
+        return [self.external_ids.get(doc_id, doc_id) for doc_id in doc_ids]
+
+    def memory_usage(self) -> dict[str, Any]:
+        return {
+            "budget": self.memory_budget.config() if self.memory_budget is not None else None,
+            "resident": {
+                "document_lengths": len(self.document_info) * DOCUMENT_LENGTHS_BYTES,
+                "lexicon": len(self.terms) * TERM_BYTES,
+                "postings": sum(len(postings) for postings in self.postings) * POSTING_BYTES,
+            },
+            "paged": [],
+            "document_store": self.document_store.cache_info() if self.document_store is not None else None,
+        }
+
+    def import_document(self, doc_id: int, info: DocumentInfo, doc: DocumentContents, external_id: Optional[int] = None) -> None:
+        if doc_id < len(self.document_info):
+            raise ValueError(f"Document {doc_id} is already in the index")
+        # doc_ids are positions in the lists, the missing ones are filled with deleted documents
+        for missing_doc_id in range(len(self.document_info), doc_id):
+            self.document_info.append(DocumentInfo(missing_doc_id, [0, 0, 0]))
+            self.document_contents.append(None)
+            self.tombstones.add(missing_doc_id)
+        self.document_info.append(DocumentInfo(doc_id, list(info.lengths)))
+        if external_id is not None and external_id != doc_id:
+            self.external_ids[doc_id] = external_id
+        if self.document_store is not None:
+            self.document_contents.append(None)
+            self.document_store.put(doc_id, doc)
+        else:
+            self.document_contents.append(DocumentContents(doc.author, doc.title, doc.body))
+
+    def import_postings(self, term: str, postings: list[Posting]) -> None:
+        if term in self.term_lookup:
+            raise ValueError(f"Term {term!r} is already in the index")
+        term_id = len(self.terms)
+        self.terms.append(Term(term, term_id, **term_statistics(
+            postings, {posting.doc_id: sum(self.document_info[posting.doc_id].lengths) for posting in postings})))
+        self.term_lookup[term] = term_id
+        if self.positions and any(posting.positions is None for posting in postings):
+            raise ValueError("The imported postings have no positions")
+        self.postings.append(OrderedDict(
+            (posting.doc_id, Posting(
+                posting.doc_id, term_id, dict(posting.occurrences), posting.positions if self.positions else None))
+            for posting in postings))
+
+    def finish_import(self) -> None:
+        for i, field in enumerate(["author", "title", "body"]):
+            self.total_field_lengths[field] = sum(
+                info.lengths[i] for doc_id, info in enumerate(self.document_info) if doc_id not in self.tombstones)
+        self.posting_arrays.clear()
+        if self.path is not None:
+            self.save()
 
     def bulk_index_documents(self, docs: SizedGenerator[DocumentContents, None, None], tokenizer: Tokenizer, verbose: bool = False) -> None:
         super().bulk_index_documents(docs, tokenizer, verbose)
@@ -92,29 +329,69 @@ class DefaultIndex(Index):
             self.save()
 
     def load(self):
-        if self.path is not None:
-            try:
-                with open(self.path, "rb") as f:
-                    postings, document_info, document_contents, terms, term_lookup = pickle.load(f)
-                assert isinstance(postings, list)
-                assert isinstance(document_info, list)
-                assert isinstance(document_contents, list)
-                assert isinstance(terms, list)
-                assert isinstance(term_lookup, dict)
-            except Exception as e:
-                pass
-            else:
-                self.postings = postings
-                self.document_info = document_info
-                self.document_contents = document_contents
-                self.terms = terms
-                self.term_lookup = term_lookup
-        else:
+        if self.path is None:
             raise ValueError("Path not set for index.")
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+        except (pickle.UnpicklingError, EOFError, AttributeError, ImportError) as e:
+            raise ValueError(f"{self.path} is not a valid DefaultIndex") from e
+        if isinstance(data, tuple) and len(data) in DEFAULT_INDEX_TUPLE_LENGTHS:
+            # the indexes saved before the format version, as a tuple that grew with every new field
+            data = dict(zip(DEFAULT_INDEX_FIELDS, data))
+        elif not isinstance(data, dict) or data.get("format") != DEFAULT_INDEX_FORMAT:
+            raise ValueError(f"{self.path} is not a DefaultIndex with a supported format")
+        tombstones = data.get("tombstones", Tombstones())
+        document_info = data["document_info"]
+        if "total_field_lengths" in data:
+            total_field_lengths = data["total_field_lengths"]
+        else:
+            total_field_lengths = {
+                field: sum(info.lengths[i] for doc_id, info in enumerate(document_info) if info is not None and doc_id not in tombstones)
+                for i, field in enumerate(["author", "title", "body"])}
+        fields = {
+            "postings": (data["postings"], list),
+            "document_info": (document_info, list),
+            "document_contents": (data["document_contents"], list),
+            "terms": (data["terms"], list),
+            "term_lookup": (data["term_lookup"], dict),
+            "total_field_lengths": (total_field_lengths, dict),
+            "tombstones": (tombstones, Tombstones),
+            "positions": (data.get("positions", False), bool),
+            "separate_contents": (data.get("separate_contents", False), bool),
+            "external_ids": (data.get("external_ids", {}), dict),
+        }
+        for name, (value, expected_type) in fields.items():
+            if not isinstance(value, expected_type):
+                raise ValueError(f"{self.path} is not a valid DefaultIndex, {name} is a {type(value).__name__}")
+        for name, (value, _) in fields.items():
+            setattr(self, name, value)
+        self.posting_arrays = {}
+        if "positions" not in data:
+            # postings pickled before positions were stored
+            for postings in self.postings:
+                for posting in postings.values():
+                    posting.__dict__.setdefault("positions", None)
+        # indexes saved before some statistics of the terms were stored
+        if any("min_document_length" not in term.info for term in self.terms):
+            self._recompute_term_statistics()
 
     def save(self):
-        if self.path is not None:
-            with open(self.path, "wb") as f:
-                pickle.dump((self.postings, self.document_info, self.document_contents, self.terms, self.term_lookup), f)
-        else:
-            raise ValueError("Path not set for index.")
\ No newline at end of file
+        if self.path is None:
+            raise ValueError("Path not set for index.")
+        if self.document_store is not None:
+            self.document_store.flush()
+        with open(self.path, "wb") as f:
+            pickle.dump({
+                "format": DEFAULT_INDEX_FORMAT,
+                "postings": self.postings,
+                "document_info": self.document_info,
+                "document_contents": self.document_contents,
+                "terms": self.terms,
+                "term_lookup": self.term_lookup,
+                "total_field_lengths": self.total_field_lengths,
+                "tombstones": self.tombstones,
+                "positions": self.positions,
+                "separate_contents": self.separate_contents,
+                "external_ids": self.external_ids,
+            }, f)
\ No newline at end of file
@@ -0,0 +1,42 @@
+from typing import List
+
+import numpy as np
+
+from mir.ir.document_info import DocumentInfo
+from mir.ir.posting import Posting
+from mir.ir.scoring_function import ScoringBatch, ScoringFunction
+from mir.ir.term import Term
+
+
+class DFReeScoringFunction(ScoringFunction):
+    """
+    DFRee, the parameter free model of the divergence from randomness framework, on the whole document.
+    It compares the frequency of each term in the document with its frequency in the collection,
+    so it needs the collection_frequency of the terms and the collection_length of the index.
+    """
+
+    def __call__(self, document: DocumentInfo, postings: List[Posting], query: List[Term], **kwargs) -> float:
+        batch = ScoringBatch.from_postings([document.id], [document.lengths], [postings], query)
+        return float(self.columnar_call(batch, query, **kwargs)[0])
+
+    def columnar_call(self, batch: ScoringBatch, query: List[Term], *, collection_length: int, **_) -> np.ndarray:
+        tf = batch.tf.sum(axis=2)
+        document_length = batch.lengths.sum(axis=1)
+        scores = np.zeros(len(batch))
+        # the terms that a document doesn't contain add nothing, the log of their prior would be infinite
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for i, term in enumerate(query):
+                collection_frequency = term.info["collection_frequency"]
+                if collection_frequency == 0:
+                    continue
+                inverse_collection_prior = collection_length / collection_frequency
+                term_tf = tf[:, i]
+                prior = term_tf / document_length
+                posterior = (term_tf + 1) / (document_length + 1)
+                norm = term_tf * np.log2(posterior / prior)
+                score = term.info.get("query_weight", 1) * norm * (
+                    term_tf * -np.log2(prior * inverse_collection_prior)
+                    + (term_tf + 1) * np.log2(posterior * inverse_collection_prior)
+                    + 0.5 * np.log2(posterior / prior))
+                scores += np.where(term_tf > 0, score, 0.0)
+        return scores
@@ -0,0 +1,37 @@
+from typing import List
+
+import numpy as np
+
+from mir.ir.document_info import DocumentInfo
+from mir.ir.posting import Posting
+from mir.ir.scoring_function import ScoringBatch, ScoringFunction
+from mir.ir.term import Term
+
+
+class DirichletScoringFunction(ScoringFunction):
+    def __init__(self, mu: float = 2500.0):
+        """
+        Query likelihood with Dirichlet smoothing, on the whole document.
+        The score is the log probability of the query in the language model of the document,
+        smoothed with the language model of the collection, so it is never positive.
+
+        # Parameters
+        - mu (float): The weight of the collection model, as a number of tokens.
+        """
+        self.mu = mu
+
+    def __call__(self, document: DocumentInfo, postings: List[Posting], query: List[Term], **kwargs) -> float:
+        batch = ScoringBatch.from_postings([document.id], [document.lengths], [postings], query)
+        return float(self.columnar_call(batch, query, **kwargs)[0])
+
+    def columnar_call(self, batch: ScoringBatch, query: List[Term], *, collection_length: int, **_) -> np.ndarray:
+        tf = batch.tf.sum(axis=2)
+        smoothed_length = batch.lengths.sum(axis=1) + self.mu
+        scores = np.zeros(len(batch))
+        for i, term in enumerate(query):
+            collection_frequency = term.info["collection_frequency"]
+            if collection_frequency == 0:
+                # no document contains the term anymore, its probability would be 0 in every document
+                continue
+            scores += term.info.get("query_weight", 1) * np.log((tf[:, i] + self.mu * collection_frequency / collection_length) / smoothed_length)
+        return scores
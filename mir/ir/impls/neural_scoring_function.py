@@ -6,12 +6,14 @@ from mir import DATA_DIR
 from mir.neural_relevance.model import NeuralRelevance
 from mir.ir.document_info import DocumentInfo
 from mir.ir.posting import Posting
-from mir.ir.scoring_function import ScoringFunction
+from mir.ir.scoring_function import ScoringBatch, ScoringFunction
 from mir.ir.term import Term
 from mir.neural_relevance.dataset import MSMarcoDataset
 
 
 class NeuralScoringFunction(ScoringFunction):
+    needs_contents = True
+
     def __init__(self):
         # Load the model
         self.model = NeuralRelevance.from_pretrained()
@@ -24,10 +26,17 @@ class NeuralScoringFunction(ScoringFunction):
             score = self.model.forward_queries_and_documents([query_content], [document_content])
         return score.item()
     
-    def batched_call(self, document_contents: list[str], query_contents: str) -> list[float]:
+    def columnar_call(self, batch: ScoringBatch, query: list[Term], *, query_content: str, **kwargs) -> np.ndarray:
+        if len(batch) == 0:
+            return np.zeros(0)
+        return np.array(self.batched_call(batch.contents, query_content))
+
+    def batched_call(self, document_contents: list[str], query_contents: str | list[str]) -> list[float]:
+        if isinstance(query_contents, str):
+            query_contents = [query_contents]*len(document_contents)
         scores = []
         with torch.no_grad():
-            scores = self.model.forward_queries_and_documents([query_contents]*len(document_contents), document_contents)
+            scores = self.model.forward_queries_and_documents(query_contents, document_contents)
         return scores.tolist()
     
 if __name__ == "__main__":
@@ -0,0 +1,272 @@
+import os
+from typing import Any, Literal, Optional
+
+from tqdm.auto import tqdm
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.document_info import DocumentInfo
+from mir.ir.impls.sqlite_index import SQLITE_TERM_STATISTICS, SqliteIndex
+from mir.ir.index import Index
+from mir.ir.memory_budget import MemoryBudget
+from mir.ir.term import Term
+from mir.ir.tokenizer import Tokenizer
+from mir.utils.sized_generator import SizedGenerator
+
+
+class ShardedIndex:
+    # the shards number their terms independently, so the index can't list them as a whole or import postings
+    supports_deletion = True
+    supports_listing = False
+    supports_import = False
+
+    def __init__(self, path: str, num_shards: Optional[int] = None, partition: Literal["hash", "range"] = "hash", range_size: int = 1_000_000, positions: bool = False, memory_budget: Optional[MemoryBudget] = None):
+        """
+        Create or open an index split in multiple SqliteIndex shards.
+        Documents are assigned to a shard by their doc_id.
+
+        # Parameters
+        - path (str): The directory containing the shards.
+        - num_shards (Optional[int]): The number of shards. If None, the number of cpus is used.
+        If the directory already contains shards, their number is used.
+        - partition (Literal["hash", "range"]): How doc_ids are assigned to shards,
+        "hash" uses doc_id % num_shards, "range" uses doc_id // range_size.
+        - range_size (int): The number of doc_ids per shard when partition is "range".
+        - positions (bool): Whether the shards store the positions of the terms, needed by phrase queries.
+        - memory_budget (Optional[MemoryBudget]): If set, it is split evenly between the shards.
+        """
+        os.makedirs(path, exist_ok=True)
+        existing_shards = [file for file in os.listdir(path) if file.startswith("shard-") and file.endswith(".db")]
+        if len(existing_shards) > 0:
+            num_shards = len(existing_shards)
+        elif num_shards is None:
+            num_shards = os.cpu_count()
+        assert num_shards > 0, "At least one shard is needed"
+        self.path = path
+        self.partition = partition
+        self.range_size = range_size
+        self.shard_paths = [os.path.join(path, f"shard-{i}.db") for i in range(num_shards)]
+        self.memory_budget = memory_budget
+        self.shards = [SqliteIndex(shard_path, positions, memory_budget=self.shard_memory_budget()) for shard_path in self.shard_paths]
+        self.next_doc_id = 1 + max(
+            shard.connection.execute("select coalesce(max(doc_id), 0) from document_info").fetchone()[0]
+            for shard in self.shards)
+
+    def shard_of(self, doc_id: int) -> int:
+        """
+        Get the shard that contains a doc_id.
+
+        # Parameters
+        - doc_id (int): The doc_id.
+
+        # Returns
+        - int: The index of the shard.
+        """
+        if self.partition == "hash":
+            return doc_id % len(self.shards)
+        else:
+            return min(doc_id // self.range_size, len(self.shards) - 1)
+
+    def shard_memory_budget(self) -> Optional[MemoryBudget]:
+        """
+        Get the memory budget of each shard.
+
+        # Returns
+        - Optional[MemoryBudget]: An even part of the budget of the index, None if it has no budget.
+        """
+        return self.memory_budget.split(len(self.shard_paths)) if self.memory_budget is not None else None
+
+    def memory_usage(self) -> dict[str, Any]:
+        return {
+            "budget": self.memory_budget.config() if self.memory_budget is not None else None,
+            "shards": [shard.memory_usage() for shard in self.shards],
+        }
+
+    def get_global_info(self) -> dict[str, Any]:
+        num_docs = sum(len(shard) for shard in self.shards)
+        total_field_lengths = {"author": 0, "title": 0, "body": 0}
+        for shard in self.shards:
+            if len(shard) == 0:
+                continue
+            shard_info = shard.get_global_info()
+            for field in total_field_lengths:
+                total_field_lengths[field] += shard_info["total_field_lengths"][field]
+        return {
+            "avg_field_lengths": {field: total / num_docs for field, total in total_field_lengths.items()},
+            "num_docs": num_docs,
+            "collection_length": sum(total_field_lengths.values()),
+            "total_field_lengths": total_field_lengths
+        }
+
+    def get_term_statistics(self, terms: list[str]) -> dict[str, dict[str, Optional[int]]]:
+        """
+        Get the statistics of some terms across all the shards: the frequencies are added,
+        max_tf is the largest of the shards and min_document_length the smallest.
+        Terms that are not in any shard are not included.
+
+        # Parameters
+        - terms (list[str]): The terms in string format.
+
+        # Returns
+        - dict[str, dict[str, Optional[int]]]: The statistics of each term, with the keys of SQLITE_TERM_STATISTICS
+        and the document_frequency.
+        """
+        merged_statistics: dict[str, dict[str, Optional[int]]] = {}
+        unique_terms = list(set(terms))
+        for shard in self.shards:
+            for term in shard.get_terms(unique_terms):
+                if term is None:
+                    continue
+                statistics = merged_statistics.get(term.term)
+                if statistics is None:
+                    merged_statistics[term.term] = {key: term.info[key] for key in ["document_frequency", *SQLITE_TERM_STATISTICS]}
+                    continue
+                for key in statistics:
+                    value = term.info[key]
+                    if key == "max_tf":
+                        statistics[key] = max(statistics[key], value)
+                    elif key == "min_document_length":
+                        # None for a term whose documents were all deleted
+                        if statistics[key] is None or (value is not None and value < statistics[key]):
+                            statistics[key] = value
+                    else:
+                        statistics[key] += value
+        return merged_statistics
+
+    def get_document_info(self, doc_id: int) -> DocumentInfo:
+        return self.shards[self.shard_of(doc_id)].get_document_info(doc_id)
+
+    def get_documents_info(self, doc_ids: list[int]) -> list[DocumentInfo]:
+        shard_doc_ids: dict[int, list[int]] = {}
+        for doc_id in doc_ids:
+            shard_doc_ids.setdefault(self.shard_of(doc_id), []).append(doc_id)
+        found = {}
+        for shard, ids in shard_doc_ids.items():
+            found.update(zip(ids, self.shards[shard].get_documents_info(ids)))
+        return [found[doc_id] for doc_id in doc_ids]
+
+    def get_document_contents(self, doc_id: int) -> DocumentContents:
+        return self.shards[self.shard_of(doc_id)].get_document_contents(doc_id)
+
+    def get_documents_contents(self, doc_ids: list[int]) -> list[DocumentContents]:
+        # one batch per shard
+        shard_doc_ids: dict[int, list[int]] = {}
+        for doc_id in doc_ids:
+            shard_doc_ids.setdefault(self.shard_of(doc_id), []).append(doc_id)
+        found = {}
+        for shard, ids in shard_doc_ids.items():
+            found.update(zip(ids, self.shards[shard].get_documents_contents(ids)))
+        return [found[doc_id] for doc_id in doc_ids]
+
+    def get_external_ids(self, doc_ids: list[int]) -> list[int]:
+        shard_doc_ids: dict[int, list[int]] = {}
+        for doc_id in doc_ids:
+            shard_doc_ids.setdefault(self.shard_of(doc_id), []).append(doc_id)
+        found = {}
+        for shard, ids in shard_doc_ids.items():
+            found.update(zip(ids, self.shards[shard].get_external_ids(ids)))
+        return [found[doc_id] for doc_id in doc_ids]
+
+    def __len__(self) -> int:
+        return sum(len(shard) for shard in self.shards)
+
+    def index_document(self, doc: DocumentContents, tokenizer: Tokenizer) -> None:
+        if doc.__dict__.get("doc_id") is None:
+            doc.add_field("doc_id", self.next_doc_id)
+        self.next_doc_id = max(self.next_doc_id, doc.doc_id + 1)
+        self.shards[self.shard_of(doc.doc_id)].index_document(doc, tokenizer)
+
+    def bulk_index_documents(self, docs: SizedGenerator[DocumentContents, None, None], tokenizer: Tokenizer, verbose: bool = False, batch_size: int = 10000) -> None:
+        """
+        Add multiple documents to the shards, each shard commits its documents in batches
+        instead of once per document, like SqliteIndex.bulk_index_documents.
+        The documents are not checked against the ones already in the index.
+
+        # Parameters
+        - docs (SizedGenerator[DocumentContents, None, None]): A generator of documents to add to the index.
+        - tokenizer (Tokenizer): The tokenizer to use to tokenize the documents.
+        - verbose (bool): Whether to show a progress bar.
+        - batch_size (int): The number of documents of a shard in each committed batch.
+        """
+        pending = [0] * len(self.shards)
+        for doc in tqdm(docs, desc="Indexing documents", disable=not verbose, total=len(docs)):
+            # the doc_ids are assigned before the documents are split between the shards
+            if doc.__dict__.get("doc_id") is None:
+                doc.add_field("doc_id", self.next_doc_id)
+            self.next_doc_id = max(self.next_doc_id, doc.doc_id + 1)
+            shard_id = self.shard_of(doc.doc_id)
+            shard = self.shards[shard_id]
+            shard._index_document(doc, tokenizer)
+            pending[shard_id] += 1
+            if pending[shard_id] == batch_size:
+                shard._commit()
+                pending[shard_id] = 0
+        for shard in self.shards:
+            shard._commit()
+            shard.connection.execute("pragma optimize")
+            shard.connection.commit()
+            # the finished shards can be opened as immutable
+            shard._checkpoint_wal()
+
+    def delete_document(self, doc_id: int, tokenizer: Tokenizer) -> None:
+        self.shards[self.shard_of(doc_id)].delete_document(doc_id, tokenizer)
+
+    def update_document(self, doc_id: int, doc: DocumentContents, tokenizer: Tokenizer) -> None:
+        self.shards[self.shard_of(doc_id)].update_document(doc_id, doc, tokenizer)
+
+    def compact(self) -> None:
+        for shard in self.shards:
+            shard.compact()
+
+
+class GlobalStatisticsView:
+    def __init__(self, index: Index):
+        """
+        Wrap the index of a shard so that scoring functions see the statistics of the whole collection.
+        All the methods that are not related to statistics are forwarded to the wrapped index.
+
+        # Parameters
+        - index (Index): The index of the shard.
+        """
+        self.index = index
+        self.global_info: dict[str, Any] = {}
+        self.term_statistics: dict[str, dict[str, Optional[int]]] = {}
+
+    def set_statistics(self, global_info: dict[str, Any], term_statistics: dict[str, dict[str, Optional[int]]]) -> None:
+        """
+        Set the statistics to use for the next queries.
+
+        # Parameters
+        - global_info (dict[str, Any]): The global info of the whole collection.
+        - term_statistics (dict[str, dict[str, int]]): The statistics of the query terms in the whole collection,
+        see ShardedIndex.get_term_statistics.
+        """
+        self.global_info = global_info
+        self.term_statistics = term_statistics
+
+    def get_global_info(self) -> dict[str, Any]:
+        return self.global_info
+
+    def get_term(self, term_id: int) -> Term:
+        term = self.index.get_term(term_id)
+        info = {**term.info, **self.term_statistics.get(term.term, {})}
+        return Term(term.term, term.id, **info)
+
+    def get_terms(self, terms: list[str]) -> list[Optional[Term]]:
+        ret = []
+        # the terms that are only in other shards get a negative term_id without postings,
+        # so the queries see the same terms in every shard
+        missing_term_ids: dict[str, int] = {}
+        for text, term in zip(terms, self.index.get_terms(terms)):
+            if term is not None:
+                info = {**term.info, **self.term_statistics.get(term.term, {})}
+                term = Term(term.term, term.id, **info)
+            elif text in self.term_statistics:
+                term = Term(text, -1 - missing_term_ids.setdefault(text, len(missing_term_ids)), **self.term_statistics[text], posting_size=0)
+            ret.append(term)
+        return ret
+
+    def __len__(self) -> int:
+        return self.global_info.get("num_docs", len(self.index))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.index, name)
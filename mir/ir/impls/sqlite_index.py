@@ -1,32 +1,152 @@
+from array import array
+from collections import Counter
 from collections.abc import Generator
+from itertools import groupby, islice
 import os
 import sqlite3
 import sys
+import threading
 from typing import Any, Optional
+import urllib.parse
+import weakref
 
 import psutil
+from tqdm.auto import tqdm
+
 from mir.ir.document_info import DocumentInfo
 from mir.ir.document_contents import DocumentContents
+from mir.ir.document_store import DocumentStore
 from mir.ir.impls.default_tokenizers import DefaultTokenizer
 from mir.ir.index import Index
+from mir.ir.memory_budget import DOCUMENT_LENGTHS_BYTES, POSTING_BYTES, TERM_BYTES, MemoryBudget
+from mir.ir.positions import encode_positions
 from mir.ir.posting import Posting
-from mir.ir.term import Term
+from mir.ir.posting_block import decode_posting_block, encode_posting_block
+from mir.ir.posting_cache import PostingListCache
+from mir.ir.posting_cursor import BlockPostingCursor, ListPostingCursor, PostingCursor
+from mir.ir.search_trace import SearchTrace
+from mir.ir.term import Term, term_statistics
 from mir.ir.token_ir import TokenLocation
 from mir.ir.tokenizer import Tokenizer
+from mir.ir.tombstones import Tombstones
+from mir.utils.sized_generator import SizedGenerator
+
+# the statistics of the terms table that are added to the info of a Term, besides the document frequency,
+# the collection frequencies don't count the deleted documents, max_tf and min_document_length are bounds
+# after documents are deleted and exact again after compact
+SQLITE_TERM_STATISTICS = {
+    "collection_frequency": "integer not null default 0",
+    "collection_frequency_author": "integer not null default 0",
+    "collection_frequency_title": "integer not null default 0",
+    "collection_frequency_body": "integer not null default 0",
+    "max_tf": "integer not null default 0",
+    "min_document_length": "integer",
+}
 
 
 class SqliteIndex(Index):
-    def __init__(self, path: Optional[str] = None):
+    supports_deletion = True
+    supports_listing = True
+    supports_import = True
+    # the number of postings in each block when posting_blocks is enabled
+    posting_block_size = 128
+
+    def __init__(
+            self,
+            path: Optional[str] = None,
+            positions: bool = False,
+            separate_contents: bool = False,
+            posting_blocks: bool = False,
+            read_only: bool = False,
+            cache_size: Optional[int] = None,
+            mmap_size: Optional[int] = None,
+            memory_budget: Optional[MemoryBudget] = None):
+        """
+        An index stored in a SQLite database.
+
+        # Parameters
+        - path (Optional[str]): The path of the database. If None, the index is kept in memory.
+        - positions (bool): Whether to store the positions of the terms, needed by phrase queries.
+        - separate_contents (bool): Whether to store the contents of the documents in a DocumentStore at path + ".docs"
+        instead of the database, so that the database only contains the postings and the statistics.
+        - posting_blocks (bool): Whether to store the posting list of each term in compressed blocks,
+        one row per block instead of one row per posting. See convert_to_posting_blocks for existing indexes.
+        positions, separate_contents and posting_blocks are ignored when an existing index is opened,
+        the index keeps the settings it was created with.
+        - read_only (bool): Whether to open an existing index for reading only.
+        Every thread (and every process after a fork) gets its own connection, so many query workers can share the file.
+        The database is opened as immutable, so it must not be modified while it is open,
+        unless a writer still has uncommitted pages in the write-ahead log, in which case it is read normally.
+        - cache_size (Optional[int]): The size in bytes of the page cache of each connection.
+        If None, half of the system memory for a read-write index and 64 MiB for each read-only connection.
+        - mmap_size (Optional[int]): The maximum number of bytes of the database mapped in memory, 16 GiB if None.
+        Mapped pages live in the page cache of the operating system, so they are shared by all the connections.
+        - memory_budget (Optional[MemoryBudget]): If set, it replaces cache_size and mmap_size.
+        A read-only index keeps the document lengths and the lexicon in memory if they fit in the budget,
+        and caches the posting lists of the most used terms, a read-write index only sizes its caches with it.
+        """
         super().__init__()
 
-        self.connection = sqlite3.connect(
+        assert sys.version_info.major == 3, "Python 2 is not supported"
+        assert sys.version_info.minor >= 10, "Python <3.10 is not supported"
+
+        self.path = path
+        self.read_only = read_only
+        self.memory_budget = memory_budget
+        if memory_budget is not None:
+            assert cache_size is None and mmap_size is None, "cache_size and mmap_size are set by the memory budget"
+            # an upper bound until the budget is allocated, when the sizes of the structures are known
+            cache_size, mmap_size = memory_budget.total // memory_budget.connections, 0
+        if cache_size is None:
+            cache_size = 64 * 1024 * 1024 if read_only else psutil.virtual_memory().total // 2
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size if mmap_size is not None else 1024*1024*1024 * 16
+        self.thread_connections = threading.local()
+        # all the read-only connections of this process, and the ones whose thread has ended
+        self.read_connections: list[sqlite3.Connection] = []
+        self.free_read_connections: list[sqlite3.Connection] = []
+        self.read_connections_pid = os.getpid()
+        self.read_connections_lock = threading.Lock()
+        self.document_store: Optional[DocumentStore] = None
+        # the field lengths of the documents added by import_document, three for each doc_id,
+        # needed by the block bounds when posting_blocks is enabled
+        self.import_lengths = array("i")
+        self.imported_rows = 0
+        # the postings added since the last commit, by term_id, with the field lengths of their documents
+        self.pending_postings: dict[int, list[tuple[Posting, tuple[int, int, int]]]] = {}
+        # what the memory budget keeps in memory: the term_id, posting count and statistics of each term,
+        # the three field lengths of each doc_id (-1 if the doc_id is not used) and the most used posting lists
+        self.memory_allocation: Optional[dict[str, Any]] = None
+        self.resident_terms: Optional[dict[str, tuple[int, ...]]] = None
+        self.resident_term_texts: Optional[dict[int, str]] = None
+        self.resident_lengths: Optional[array] = None
+        self.posting_cache: Optional[PostingListCache] = None
+
+        if read_only:
+            if path is None or not os.path.exists(path):
+                raise ValueError("A read-only index needs an existing database")
+            self.write_connection = None
+            settings = dict(self.connection.execute(
+                "select key, value from global_info where key in ('positions', 'separate_contents', 'posting_blocks')"))
+            self.positions = bool(settings.get("positions", 0))
+            self.posting_blocks = bool(settings.get("posting_blocks", 0))
+            self.has_external_ids = self._has_external_ids()
+            self.term_statistics = self._term_statistics()
+            if memory_budget is not None:
+                self._allocate_memory(bool(settings.get("separate_contents", 0)))
+            if settings.get("separate_contents", 0):
+                self.document_store = self._open_document_store()
+            self.global_info_dirty = True
+            self.cached_global_info = None
+            self.tombstones = Tombstones(
+                doc_id for doc_id, in self.connection.execute("select doc_id from tombstones"))
+            return
+
+        self.write_connection = sqlite3.connect(
             path if path is not None else ":memory:", 
             check_same_thread=False, 
             cached_statements=1024,)
         
-        assert sys.version_info.major == 3, "Python 2 is not supported"
-        assert sys.version_info.minor >= 10, "Python <3.10 is not supported"
-        
         legacy_mode = sys.version_info.minor == 10
         if legacy_mode:
             self.isolation_level = None
@@ -36,9 +156,8 @@ class SqliteIndex(Index):
         self.connection.execute("pragma synchronous = off")
         self.connection.execute(f"pragma threads = {os.cpu_count()}")
         self.connection.execute("pragma journal_mode = WAL")
-        cache_memory = psutil.virtual_memory().total // 1024 // 2
-        self.connection.execute(f"pragma cache_size = {-cache_memory}")
-        self.connection.execute(f"pragma mmap_size = {1024*1024*1024 * 16}")
+        self.connection.execute(f"pragma cache_size = {-(self.cache_size // 1024)}")
+        self.connection.execute(f"pragma mmap_size = {self.mmap_size}")
         self.connection.execute("pragma temp_store = memory")
 
         if legacy_mode:
@@ -54,7 +173,26 @@ class SqliteIndex(Index):
             "occurrences_author integer not null, "
             "occurrences_title integer not null, "
             "occurrences_body integer not null, "
+            "positions blob, "
             "primary key (term_id, doc_id))")
+        # indexes created before positions were supported
+        if "positions" not in [column[1] for column in self.connection.execute("pragma table_info(postings)")]:
+            self.connection.execute("alter table postings add column positions blob")
+        self.connection.execute(
+            "create table if not exists posting_blocks "
+            "(term_id integer references terms(term_id) not null, "
+            "first_doc_id integer not null, "
+            "last_doc_id integer not null, "
+            "posting_count integer not null, "
+            # the maximum occurrences and the minimum field lengths of the block bound the score of its postings
+            "max_occurrences_author integer not null, "
+            "max_occurrences_title integer not null, "
+            "max_occurrences_body integer not null, "
+            "min_author_len integer not null, "
+            "min_title_len integer not null, "
+            "min_body_len integer not null, "
+            "data blob not null, "
+            "primary key (term_id, first_doc_id)) without rowid")
         self.connection.execute(
             "create table if not exists document_info "
             "(doc_id integer not null primary key autoincrement, "
@@ -71,50 +209,405 @@ class SqliteIndex(Index):
             "create table if not exists terms "
             "(term_id integer not null primary key autoincrement, "
             "term text unique not null, "
-            "document_frequency integer not null)")
+            "document_frequency integer not null, "
+            "posting_count integer not null default 0, "
+            f"{', '.join(f'{column} {definition}' for column, definition in SQLITE_TERM_STATISTICS.items())})")
+        # indexes created before the posting count was stored
+        if "posting_count" not in [column[1] for column in self.connection.execute("pragma table_info(terms)")]:
+            self.connection.execute("alter table terms add column posting_count integer not null default 0")
+            self.connection.execute(
+                "update terms set posting_count = (select count(*) from postings where postings.term_id = terms.term_id)")
+        # indexes created before some statistics were stored, they are computed at the end
+        term_columns = [column[1] for column in self.connection.execute("pragma table_info(terms)")]
+        missing_term_statistics = [column for column in SQLITE_TERM_STATISTICS if column not in term_columns]
+        for column in missing_term_statistics:
+            self.connection.execute(f"alter table terms add column {column} {SQLITE_TERM_STATISTICS[column]}")
+        self.term_statistics = self._term_statistics()
+        self.connection.execute(
+            "create table if not exists external_ids "
+            "(doc_id integer not null primary key references document_info(doc_id), "
+            "external_id integer not null)")
+        self.has_external_ids = self._has_external_ids()
+        self.connection.execute(
+            "create table if not exists tombstones "
+            "(doc_id integer not null primary key references document_info(doc_id))")
         
+        self.connection.execute(
+            "create table if not exists build_checkpoint "
+            "(key text not null primary key, value integer)")
         self.connection.execute("create table if not exists global_info (key text not null primary key, value integer)")
         # add global info default values if not present
         self.connection.execute("insert or ignore into global_info values ('total_author_len', 0)")
         self.connection.execute("insert or ignore into global_info values ('total_title_len', 0)")
         self.connection.execute("insert or ignore into global_info values ('total_body_len', 0)")
         self.connection.execute("insert or ignore into global_info values ('num_docs', 0)")
+        self.connection.execute("insert or ignore into global_info values ('positions', ?)", (int(positions),))
+        self.positions = bool(self.connection.execute("select value from global_info where key = 'positions'").fetchone()[0])
+        self.connection.execute("insert or ignore into global_info values ('separate_contents', ?)", (int(separate_contents),))
+        self.connection.execute("insert or ignore into global_info values ('posting_blocks', ?)", (int(posting_blocks),))
+        self.posting_blocks = bool(self.connection.execute("select value from global_info where key = 'posting_blocks'").fetchone()[0])
+        separate_contents = bool(self.connection.execute("select value from global_info where key = 'separate_contents'").fetchone()[0])
+        if memory_budget is not None:
+            self._allocate_memory(separate_contents)
+        if separate_contents:
+            if path is None:
+                raise ValueError("separate_contents needs the index to be stored in a file")
+            self.document_store = self._open_document_store()
 
         self.connection.execute("pragma optimize")
 
         self.connection.commit()
         self.global_info_dirty = True 
         self.cached_global_info = None
+        self.tombstones = Tombstones(
+            doc_id for doc_id, in self.connection.execute("select doc_id from tombstones"))
+        if len(missing_term_statistics) > 0:
+            # a one-time migration, it decodes every posting of an index with posting blocks
+            self._recompute_term_statistics(verbose=self.posting_blocks)
+
+    def _allocate_memory(self, separate_contents: bool) -> None:
+        if self.read_only:
+            num_terms, = self.connection.execute("select count(*) from terms").fetchone()
+            num_slots, = self.connection.execute("select coalesce(max(doc_id), 0) + 1 from document_info").fetchone()
+            # the lengths are read for every scored document, so they come first
+            resident = {"document_lengths": num_slots * DOCUMENT_LENGTHS_BYTES, "lexicon": num_terms * TERM_BYTES}
+        else:
+            # the structures of a read-write index change with every document, only the caches are sized
+            resident = {}
+        self.memory_allocation = self.memory_budget.allocate(resident, posting_cache=self.read_only, document_cache=separate_contents)
+        self.cache_size = self.memory_allocation["page_cache"]
+        self.mmap_size = self.memory_allocation["mmap"]
+        with self.read_connections_lock:
+            connections = [self.write_connection] if self.write_connection is not None else list(self.read_connections)
+        for connection in connections:
+            connection.execute(f"pragma cache_size = {-(self.cache_size // 1024)}")
+            connection.execute(f"pragma mmap_size = {self.mmap_size}")
+        if "document_lengths" in self.memory_allocation["resident"]:
+            self.resident_lengths = array("i", [-1]) * (3 * num_slots)
+            for doc_id, author_len, title_len, body_len in self.connection.execute(
+                    "select doc_id, author_len, title_len, body_len from document_info"):
+                self.resident_lengths[3 * doc_id] = author_len
+                self.resident_lengths[3 * doc_id + 1] = title_len
+                self.resident_lengths[3 * doc_id + 2] = body_len
+        if "lexicon" in self.memory_allocation["resident"]:
+            self.resident_terms = {
+                term: (term_id, posting_count, *statistics)
+                for term_id, term, posting_count, *statistics in self.connection.execute(
+                    f"select term_id, term, posting_count, {', '.join(self.term_statistics)} from terms")}
+            self.resident_term_texts = {row[0]: term for term, row in self.resident_terms.items()}
+        if self.memory_allocation["posting_cache"] > 0:
+            self.posting_cache = PostingListCache(self.memory_allocation["posting_cache"])
+
+    def _open_document_store(self) -> DocumentStore:
+        if self.memory_allocation is None:
+            return DocumentStore(f"{self.path}.docs", read_only=self.read_only)
+        # the cached blocks are only limited by their size
+        return DocumentStore(
+            f"{self.path}.docs", read_only=self.read_only, cache_size=sys.maxsize, cache_bytes=self.memory_allocation["document_cache"])
+
+    def memory_usage(self) -> dict[str, Any]:
+        resident = {}
+        if self.resident_lengths is not None:
+            resident["document_lengths"] = self.resident_lengths.itemsize * len(self.resident_lengths)
+        if self.resident_terms is not None:
+            resident["lexicon"] = len(self.resident_terms) * TERM_BYTES
+        with self.read_connections_lock:
+            connections = 1 if self.write_connection is not None else len(self.read_connections)
+        return {
+            "budget": self.memory_budget.config() if self.memory_budget is not None else None,
+            "resident": resident,
+            "paged": self.memory_allocation["paged"] if self.memory_allocation is not None else [],
+            "page_cache": self.cache_size,
+            "connections": connections,
+            "mmap": self.mmap_size,
+            "posting_cache": self.posting_cache.info() if self.posting_cache is not None else None,
+            "document_store": self.document_store.cache_info() if self.document_store is not None else None,
+        }
+
+    def _has_external_ids(self) -> bool:
+        # indexes created before renumbering was supported don't have the table
+        if self.connection.execute("select count(*) from sqlite_master where name = 'external_ids'").fetchone()[0] == 0:
+            return False
+        return self.connection.execute("select exists(select 1 from external_ids)").fetchone()[0] == 1
+
+    def _term_statistics(self) -> list[str]:
+        # the statistics of the terms table that are in the info of a Term,
+        # a read-only index created before some of them were stored can't add them
+        columns = [column[1] for column in self.connection.execute("pragma table_info(terms)")]
+        return ["document_frequency", *(column for column in SQLITE_TERM_STATISTICS if column in columns)]
+
+    def _document_lengths(self) -> dict[int, int]:
+        return {
+            doc_id: author_len + title_len + body_len
+            for doc_id, author_len, title_len, body_len in self.connection.execute(
+                "select doc_id, author_len, title_len, body_len from document_info")}
+
+    def _recompute_term_statistics(self, verbose: bool = False) -> None:
+        # the statistics of every term from its postings, so the bounds are exact
+        cursor = self.connection.cursor()
+        if not self.posting_blocks:
+            # one pass over the postings table in sqlite, the postings of each term are found through the primary key
+            cursor.execute(
+                f"update terms set ({', '.join(SQLITE_TERM_STATISTICS)}) = ("
+                "select coalesce(sum(occurrences_author + occurrences_title + occurrences_body), 0), "
+                "coalesce(sum(occurrences_author), 0), coalesce(sum(occurrences_title), 0), coalesce(sum(occurrences_body), 0), "
+                "coalesce(max(occurrences_author + occurrences_title + occurrences_body), 0), "
+                "min(author_len + title_len + body_len) "
+                "from postings join document_info using (doc_id) "
+                "where postings.term_id = terms.term_id and doc_id not in (select doc_id from tombstones))")
+            self._commit()
+            return
+        # the postings in blocks must be decoded
+        document_lengths = self._document_lengths()
+        rows = []
+        for term_id, in tqdm(cursor.execute("select term_id from terms").fetchall(), desc="Computing term statistics", disable=not verbose):
+            statistics = term_statistics(
+                (posting for posting in self.get_postings(term_id) if posting.doc_id not in self.tombstones), document_lengths)
+            rows.append((*(statistics[column] for column in SQLITE_TERM_STATISTICS), term_id))
+        cursor.executemany(
+            f"update terms set {', '.join(f'{column} = ?' for column in SQLITE_TERM_STATISTICS)} where term_id = ?", rows)
+        self._commit()
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """
+        The connection to the database.
+        For a read-only index, the connection of the current thread, taken from a pool of connections
+        that is returned to the pool when the thread ends.
+        """
+        if self.write_connection is not None:
+            return self.write_connection
+        local = self.thread_connections
+        # a connection inherited through fork must not be used by the child process
+        if getattr(local, "pid", None) != os.getpid():
+            local.connection = self._acquire_read_connection()
+            local.pid = os.getpid()
+            weakref.finalize(threading.current_thread(), self._release_read_connection, local.connection)
+        return local.connection
+
+    def _acquire_read_connection(self) -> sqlite3.Connection:
+        with self.read_connections_lock:
+            if self.read_connections_pid != os.getpid():
+                # the pool was inherited through fork, its connections belong to the parent process
+                self.read_connections = []
+                self.free_read_connections = []
+                self.read_connections_pid = os.getpid()
+            if len(self.free_read_connections) > 0:
+                return self.free_read_connections.pop()
+        connection = self._connect_read_only()
+        with self.read_connections_lock:
+            self.read_connections.append(connection)
+        return connection
+
+    def _release_read_connection(self, connection: sqlite3.Connection) -> None:
+        with self.read_connections_lock:
+            if any(connection is pooled for pooled in self.read_connections):
+                self.free_read_connections.append(connection)
+
+    def _connect_read_only(self) -> sqlite3.Connection:
+        uri = f"file:{urllib.parse.quote(os.path.abspath(self.path))}?mode=ro"
+        # an immutable database is read without locks and ignores the write-ahead log,
+        # so it is only safe when the log is empty
+        wal_path = f"{self.path}-wal"
+        if not os.path.exists(wal_path) or os.path.getsize(wal_path) == 0:
+            uri += "&immutable=1"
+        connection = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=1024)
+        connection.execute(f"pragma cache_size = {-(self.cache_size // 1024)}")
+        connection.execute(f"pragma mmap_size = {self.mmap_size}")
+        connection.execute("pragma temp_store = memory")
+        connection.execute("pragma query_only = on")
+        return connection
+
+    def close(self) -> None:
+        """
+        Close the connections to the database.
+        A read-write index moves the write-ahead log into the database first,
+        so that the index can then be opened as immutable by read-only instances.
+        """
+        if self.write_connection is not None:
+            self._commit()
+            self._checkpoint_wal()
+            self.write_connection.close()
+        with self.read_connections_lock:
+            for connection in self.read_connections:
+                connection.close()
+            self.read_connections.clear()
+            self.free_read_connections.clear()
+        if self.document_store is not None:
+            self.document_store.close()
     
     def get_postings(self, term_id: int) -> Generator[Posting, None, None]:
+        if self.posting_cache is not None:
+            cached = self._cached_posting_list(term_id)
+            if cached is not None:
+                yield from cached[1]
+                return
+        yield from self._read_postings(term_id)
+
+    def _read_postings(self, term_id: int) -> Generator[Posting, None, None]:
+        if self.posting_blocks:
+            self._flush_posting_blocks()
+            cursor = self.connection.cursor()
+            cursor.execute("select data from posting_blocks where term_id = ? order by first_doc_id", (term_id,))
+            for data, in cursor:
+                yield from decode_posting_block(data, term_id)
+            return
         cursor = self.connection.cursor()
         cursor.execute(
-            "select doc_id, occurrences_author, occurrences_title, occurrences_body from postings where term_id = ? "
+            "select doc_id, occurrences_author, occurrences_title, occurrences_body, positions from postings where term_id = ? "
             "order by doc_id", (term_id,))
         def row_factory(_cursor, row):
-            return Posting(row[0], term_id, {"author": row[1], "title": row[2], "body": row[3]})
+            return Posting(row[0], term_id, {"author": row[1], "title": row[2], "body": row[3]}, row[4])
         cursor.row_factory = row_factory
         yield from cursor
 
+    def _cached_posting_list(self, term_id: int, posting_size: Optional[int] = None) -> Optional[tuple[list[int], list[Posting]]]:
+        # the whole posting list from the cache, it is read and added to the cache if it is short enough
+        cached = self.posting_cache.get(term_id)
+        if cached is not None:
+            return cached
+        if posting_size is None:
+            posting_size = self.get_term(term_id).info["posting_size"]
+        if not self.posting_cache.admits(posting_size * POSTING_BYTES):
+            return None
+        postings = list(self._read_postings(term_id))
+        doc_ids = [posting.doc_id for posting in postings]
+        size = sum(POSTING_BYTES + (len(posting.positions) if posting.positions is not None else 0) for posting in postings)
+        self.posting_cache.put(term_id, doc_ids, postings, size)
+        return doc_ids, postings
+
+    def get_posting_cursor(self, term_id: int, cost: Optional[int] = None) -> PostingCursor:
+        if self.posting_cache is not None:
+            cached = self._cached_posting_list(term_id, cost)
+            if cached is not None:
+                return ListPostingCursor(*cached)
+        # keyset pagination on the primary key (term_id, doc_id), every seek past the current block is a b-tree lookup
+        def fetch_block(doc_id: int, block_size: int) -> list[Posting]:
+            cursor = self.connection.cursor()
+            cursor.execute(
+                "select doc_id, occurrences_author, occurrences_title, occurrences_body, positions from postings "
+                "where term_id = ? and doc_id >= ? order by doc_id limit ?", (term_id, doc_id, block_size))
+            return [
+                Posting(row[0], term_id, {"author": row[1], "title": row[2], "body": row[3]}, row[4])
+                for row in cursor]
+        def fetch_stored_blocks(doc_id: int, block_size: int) -> list[Posting]:
+            # starting from the block that contains doc_id, until enough postings are decoded
+            cursor = self.connection.cursor()
+            cursor.execute(
+                "select data from posting_blocks where term_id = ? and first_doc_id >= coalesce("
+                "(select max(first_doc_id) from posting_blocks where term_id = ? and first_doc_id <= ?), 0) "
+                "order by first_doc_id", (term_id, term_id, doc_id))
+            ret = []
+            for data, in cursor:
+                ret.extend(posting for posting in decode_posting_block(data, term_id) if posting.doc_id >= doc_id)
+                if len(ret) >= block_size:
+                    break
+            return ret[:block_size]
+        if self.posting_blocks:
+            self._flush_posting_blocks()
+        if cost is None:
+            cost = self.get_term(term_id).info["posting_size"]
+        return BlockPostingCursor(fetch_stored_blocks if self.posting_blocks else fetch_block, cost)
+
+    def _resident_document_lengths(self, doc_id: int) -> list[int]:
+        lengths = self.resident_lengths[3 * doc_id:3 * doc_id + 3].tolist()
+        if len(lengths) < 3 or lengths[0] < 0:
+            raise KeyError(f"Document {doc_id} is not in the index")
+        return lengths
+
     def get_document_info(self, doc_id: int) -> DocumentInfo:
+        if self.resident_lengths is not None:
+            return DocumentInfo(doc_id, self._resident_document_lengths(doc_id))
         cursor = self.connection.cursor()
         cursor.execute("select author_len, title_len, body_len from document_info where doc_id = ?", (doc_id,))
         author_len, title_len, body_len = cursor.fetchone()
         return DocumentInfo(doc_id, [author_len, title_len, body_len])
     
+    def get_documents_info(self, doc_ids: list[int]) -> list[DocumentInfo]:
+        if self.resident_lengths is not None:
+            return [DocumentInfo(doc_id, self._resident_document_lengths(doc_id)) for doc_id in doc_ids]
+        found = {}
+        cursor = self.connection.cursor()
+        unique_doc_ids = list(set(doc_ids))
+        for start in range(0, len(unique_doc_ids), 999):
+            chunk = unique_doc_ids[start:start + 999]
+            cursor.execute(
+                f"select doc_id, author_len, title_len, body_len from document_info where doc_id in ({', '.join('?' * len(chunk))})", chunk)
+            for doc_id, author_len, title_len, body_len in cursor:
+                found[doc_id] = [author_len, title_len, body_len]
+        return [DocumentInfo(doc_id, found[doc_id]) for doc_id in doc_ids]
+
     def get_document_contents(self, doc_id: int) -> DocumentContents:
+        if self.document_store is not None:
+            return self.document_store.get(doc_id)
         cursor = self.connection.cursor()
         cursor.execute("select author, title, body from document_contents where doc_id = ?", (doc_id,))
         author, title, body = cursor.fetchone()
         return DocumentContents(author, title, body)
 
+    def get_documents_contents(self, doc_ids: list[int]) -> list[DocumentContents]:
+        if self.document_store is not None:
+            return self.document_store.get_many(doc_ids)
+        found = {}
+        cursor = self.connection.cursor()
+        unique_doc_ids = list(set(doc_ids))
+        # older versions of sqlite allow at most 999 parameters per query
+        for start in range(0, len(unique_doc_ids), 999):
+            chunk = unique_doc_ids[start:start + 999]
+            cursor.execute(
+                "select doc_id, author, title, body from document_contents "
+                f"where doc_id in ({', '.join('?' * len(chunk))})", chunk)
+            for doc_id, author, title, body in cursor:
+                found[doc_id] = DocumentContents(author, title, body)
+        return [found[doc_id] for doc_id in doc_ids]
+
+    def get_external_ids(self, doc_ids: list[int]) -> list[int]:
+        if not self.has_external_ids:
+            return list(doc_ids)
+        found = {}
+        cursor = self.connection.cursor()
+        unique_doc_ids = list(set(doc_ids))
+        for start in range(0, len(unique_doc_ids), 999):
+            chunk = unique_doc_ids[start:start + 999]
+            cursor.execute(
+                f"select doc_id, external_id from external_ids where doc_id in ({', '.join('?' * len(chunk))})", chunk)
+            found.update(cursor)
+        return [found.get(doc_id, doc_id) for doc_id in doc_ids]
+
+    def _resident_term(self, term: str) -> Optional[Term]:
+        row = self.resident_terms.get(term)
+        if row is None:
+            return None
+        term_id, posting_count, *statistics = row
+        return Term(term, term_id, **dict(zip(self.term_statistics, statistics)), posting_size=posting_count)
+
     def get_term(self, term_id: int) -> Term:
+        if self.resident_terms is not None:
+            return self._resident_term(self.resident_term_texts[term_id])
         cursor = self.connection.cursor()
-        cursor.execute("select term, document_frequency from terms where term_id = ?", (term_id,))
-        term, document_frequency = cursor.fetchone()
-        return Term(term, term_id, document_frequency=document_frequency)
+        cursor.execute(f"select term, posting_count, {', '.join(self.term_statistics)} from terms where term_id = ?", (term_id,))
+        term, posting_count, *statistics = cursor.fetchone()
+        return Term(term, term_id, **dict(zip(self.term_statistics, statistics)), posting_size=posting_count)
+
+    def get_terms(self, terms: list[str]) -> list[Optional[Term]]:
+        if self.resident_terms is not None:
+            return [self._resident_term(term) for term in terms]
+        if len(terms) == 0:
+            return []
+        unique_terms = list(set(terms))
+        cursor = self.connection.cursor()
+        cursor.execute(
+            f"select term_id, term, posting_count, {', '.join(self.term_statistics)} from terms "
+            f"where term in ({', '.join('?' * len(unique_terms))})", unique_terms)
+        found = {
+            term: Term(term, term_id, **dict(zip(self.term_statistics, statistics)), posting_size=posting_count)
+            for term_id, term, posting_count, *statistics in cursor}
+        return [found.get(term) for term in terms]
 
     def get_term_id(self, term: str) -> Optional[int]:
+        if self.resident_terms is not None:
+            row = self.resident_terms.get(term)
+            return row[0] if row is not None else None
         cursor = self.connection.cursor()
         cursor.execute("select term_id from terms where term = ?", (term,))
         result = cursor.fetchone()
@@ -132,7 +625,13 @@ class SqliteIndex(Index):
                     "title": global_info["total_title_len"] / global_info["num_docs"],
                     "body": global_info["total_body_len"] / global_info["num_docs"]
                 },
-                "num_docs": global_info["num_docs"]
+                "num_docs": global_info["num_docs"],
+                "collection_length": global_info["total_author_len"] + global_info["total_title_len"] + global_info["total_body_len"],
+                "total_field_lengths": {
+                    "author": global_info["total_author_len"],
+                    "title": global_info["total_title_len"],
+                    "body": global_info["total_body_len"]
+                }
             }
             self.global_info_dirty = False
         return self.cached_global_info
@@ -161,28 +660,28 @@ class SqliteIndex(Index):
         else:
             cursor.execute("insert into document_info(author_len, title_len, body_len) values (?, ?, ?)", (author_len, title_len, body_len))
         doc_id = cursor.lastrowid
-        cursor.execute("insert into document_contents(doc_id, author, title, body) values (?, ?, ?, ?)", (doc_id, doc.author, doc.title, doc.body))
+        if self.document_store is not None:
+            self.document_store.put(doc_id, doc)
+        else:
+            cursor.execute("insert into document_contents(doc_id, author, title, body) values (?, ?, ?, ?)", (doc_id, doc.author, doc.title, doc.body))
         cursor.execute("update global_info set value = value + 1 where key = 'num_docs'")
         return doc_id
 
-    def _update_postings(self, term_id: int, doc_id: int, location: TokenLocation) -> None:
-        increments = {
-            "author": 1 if location == TokenLocation.AUTHOR else 0, 
-            "title": 1 if location == TokenLocation.TITLE else 0, 
-            "body": 1 if location == TokenLocation.BODY else 0
-        }
+    def _insert_postings(self, doc_id: int, term_fields: dict[int, dict[str, list[int]]], lengths: tuple[int, int, int]) -> None:
+        if self.posting_blocks:
+            for term_id, fields in term_fields.items():
+                posting = Posting(
+                    doc_id, term_id, {field: len(positions) for field, positions in fields.items()},
+                    encode_positions(fields) if self.positions else None)
+                self.pending_postings.setdefault(term_id, []).append((posting, lengths))
+            return
         cursor = self.connection.cursor()
-        cursor.execute("select occurrences_author, occurrences_title, occurrences_body from postings where term_id = ? and doc_id = ?", (term_id, doc_id))
-        result = cursor.fetchone()
-        if result is None:
-            cursor.execute(
-                "insert into postings(term_id, doc_id, occurrences_author, occurrences_title, occurrences_body) "
-                "values (?, ?, ?, ?, ?)", (term_id, doc_id, increments["author"], increments["title"], increments["body"]))
-        else:
-            cursor.execute(
-                "update postings set occurrences_author = occurrences_author + ?, occurrences_title = occurrences_title + ?, "
-                "occurrences_body = occurrences_body + ? where term_id = ? and doc_id = ?",
-                (increments["author"], increments["title"], increments["body"], term_id, doc_id))
+        cursor.executemany(
+            "insert into postings(term_id, doc_id, occurrences_author, occurrences_title, occurrences_body, positions) "
+            "values (?, ?, ?, ?, ?, ?)", (
+                (term_id, doc_id, len(fields["author"]), len(fields["title"]), len(fields["body"]),
+                 encode_positions(fields) if self.positions else None)
+                for term_id, fields in term_fields.items()))
 
     def _contains_document(self, doc_id: int) -> bool:
         cursor = self.connection.cursor()
@@ -190,15 +689,142 @@ class SqliteIndex(Index):
         ret = cursor.fetchone()[0]
         return ret > 0
 
-    def _increment_document_frequency(self, term_id: int) -> None:
+    def _increment_term_statistics(self, term_fields: dict[int, dict[str, list[int]]], document_length: int) -> None:
+        cursor = self.connection.cursor()
+        cursor.executemany(
+            "update terms set document_frequency = document_frequency + 1, posting_count = posting_count + 1, "
+            "collection_frequency = collection_frequency + ?, collection_frequency_author = collection_frequency_author + ?, "
+            "collection_frequency_title = collection_frequency_title + ?, collection_frequency_body = collection_frequency_body + ?, "
+            "max_tf = max(max_tf, ?), min_document_length = coalesce(min(min_document_length, ?), ?) where term_id = ?", (
+                (len(fields["author"]) + len(fields["title"]) + len(fields["body"]),
+                 len(fields["author"]), len(fields["title"]), len(fields["body"]),
+                 len(fields["author"]) + len(fields["title"]) + len(fields["body"]),
+                 document_length, document_length, term_id)
+                for term_id, fields in term_fields.items()))
+
+    def _write_posting_blocks(self, term_id: int, entries: list[tuple[Posting, tuple[int, int, int]]]) -> None:
+        # entries are sorted by doc_id, each with the field lengths of its document or a lower bound of them
+        cursor = self.connection.cursor()
+        cursor.executemany(
+            "insert into posting_blocks values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", (
+                (term_id, block[0][0].doc_id, block[-1][0].doc_id, len(block),
+                 max(posting.occurrences["author"] for posting, _ in block),
+                 max(posting.occurrences["title"] for posting, _ in block),
+                 max(posting.occurrences["body"] for posting, _ in block),
+                 min(lengths[0] for _, lengths in block),
+                 min(lengths[1] for _, lengths in block),
+                 min(lengths[2] for _, lengths in block),
+                 encode_posting_block([posting for posting, _ in block]))
+                for block in (
+                    entries[start:start + self.posting_block_size]
+                    for start in range(0, len(entries), self.posting_block_size))))
+
+    def _take_posting_block(self, term_id: int, doc_id: int) -> Optional[list[tuple[Posting, tuple[int, int, int]]]]:
+        # remove the block that contains doc_id, or the first block if doc_id comes before all of them,
+        # and return its postings with the minimum field lengths of the block
+        cursor = self.connection.cursor()
+        cursor.execute(
+            "select first_doc_id, min_author_len, min_title_len, min_body_len, data from posting_blocks "
+            "where term_id = ? and first_doc_id <= ? order by first_doc_id desc limit 1", (term_id, doc_id))
+        row = cursor.fetchone()
+        if row is None:
+            cursor.execute(
+                "select first_doc_id, min_author_len, min_title_len, min_body_len, data from posting_blocks "
+                "where term_id = ? order by first_doc_id limit 1", (term_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+        first_doc_id, min_author_len, min_title_len, min_body_len, data = row
+        cursor.execute("delete from posting_blocks where term_id = ? and first_doc_id = ?", (term_id, first_doc_id))
+        lengths = (min_author_len, min_title_len, min_body_len)
+        return [(posting, lengths) for posting in decode_posting_block(data, term_id)]
+
+    def _flush_posting_blocks(self) -> None:
+        pending, self.pending_postings = self.pending_postings, {}
+        for term_id, entries in pending.items():
+            entries.sort(key=lambda entry: entry[0].doc_id)
+            while len(entries) > 0:
+                # the postings that fall in the same block are merged with it, usually all of them go in the last one
+                block = self._take_posting_block(term_id, entries[0][0].doc_id)
+                if block is None:
+                    self._write_posting_blocks(term_id, entries)
+                    break
+                next_first_doc_id = self.connection.execute(
+                    "select min(first_doc_id) from posting_blocks where term_id = ? and first_doc_id > ?",
+                    (term_id, block[-1][0].doc_id)).fetchone()[0]
+                split = len(entries) if next_first_doc_id is None else \
+                    next((i for i, (posting, _) in enumerate(entries) if posting.doc_id >= next_first_doc_id), len(entries))
+                merged = {posting.doc_id: (posting, lengths) for posting, lengths in block}
+                merged.update((posting.doc_id, (posting, lengths)) for posting, lengths in entries[:split])
+                self._write_posting_blocks(term_id, [merged[doc_id] for doc_id in sorted(merged)])
+                entries = entries[split:]
+
+    def _rewrite_posting_blocks(self, exclude: set[int]) -> None:
+        # rebuild the blocks of every term without the documents in exclude, with exact field lengths
+        cursor = self.connection.cursor()
+        lengths = {
+            doc_id: (author_len, title_len, body_len)
+            for doc_id, author_len, title_len, body_len in cursor.execute(
+                "select doc_id, author_len, title_len, body_len from document_info")}
+        for term_id, in cursor.execute("select distinct term_id from posting_blocks").fetchall():
+            entries = [
+                (posting, lengths[posting.doc_id])
+                for data, in cursor.execute(
+                    "select data from posting_blocks where term_id = ? order by first_doc_id", (term_id,)).fetchall()
+                for posting in decode_posting_block(data, term_id)
+                if posting.doc_id not in exclude]
+            cursor.execute("delete from posting_blocks where term_id = ?", (term_id,))
+            self._write_posting_blocks(term_id, entries)
+
+    def convert_to_posting_blocks(self) -> None:
+        """
+        Move the postings of an index created with one row per posting into compressed blocks.
+        The conversion streams the postings one term at a time, then the database is vacuumed.
+        """
+        if self.posting_blocks:
+            return
+        self._commit()
         cursor = self.connection.cursor()
-        cursor.execute("update terms set document_frequency = document_frequency + 1 where term_id = ?", (term_id,))
+        cursor.execute(
+            "select term_id, doc_id, occurrences_author, occurrences_title, occurrences_body, positions, "
+            "author_len, title_len, body_len from postings join document_info using (doc_id) order by term_id, doc_id")
+        for term_id, rows in groupby(cursor, key=lambda row: row[0]):
+            self._write_posting_blocks(term_id, [
+                (Posting(doc_id, term_id, {"author": author, "title": title, "body": body}, positions), (author_len, title_len, body_len))
+                for _, doc_id, author, title, body, positions, author_len, title_len, body_len in rows])
+        self.connection.execute("delete from postings")
+        self.connection.execute("update global_info set value = 1 where key = 'posting_blocks'")
+        self.posting_blocks = True
+        self._commit()
+        self._set_autocommit(True)
+        self.connection.execute("vacuum")
+        self._set_autocommit(False)
+        self._checkpoint_wal()
+
+    def _commit(self) -> None:
+        if self.posting_blocks:
+            self._flush_posting_blocks()
+        # the documents must be in the store before the transaction that references them is committed
+        if self.document_store is not None:
+            self.document_store.flush()
+        self.connection.commit()
+
+    def _rollback(self) -> None:
+        # drop what was written after the last commit, also the postings and contents buffered in memory
+        self.connection.rollback()
+        self.pending_postings = {}
+        if self.document_store is not None:
+            self.document_store.discard()
+        self.global_info_dirty = True
+        self.has_external_ids = self._has_external_ids()
 
     def index_document(self, doc: DocumentContents, tokenizer: Tokenizer) -> None:
+        if doc.__dict__.get("doc_id") is not None and self._contains_document(doc.doc_id):
+            return
+        self._index_document(doc, tokenizer)
+        self._commit()
 
-        if doc.__dict__.get("doc_id") is not None:
-            if self._contains_document(doc.doc_id):
-                return
+    def _index_document(self, doc: DocumentContents, tokenizer: Tokenizer) -> None:
         self.global_info_dirty = True
 
         terms = tokenizer.tokenize_document(doc)
@@ -208,23 +834,292 @@ class SqliteIndex(Index):
         
         self._increment_field_lengths(author_length, title_length, body_length)
 
-        encountered_terms = set()
-        term_ids_and_locations = []
+        # the positions of each term in each field, counted after the stopwords are removed
+        term_fields: dict[int, dict[str, list[int]]] = {}
+        field_lengths = {"author": 0, "title": 0, "body": 0}
+        field_names = {TokenLocation.AUTHOR: "author", TokenLocation.TITLE: "title", TokenLocation.BODY: "body"}
         for term in terms:
             term_id = self._create_or_get_term_id(term.text)
-            if term_id not in encountered_terms:
-                self._increment_document_frequency(term_id)
-            encountered_terms.add(term_id)
-            term_ids_and_locations.append((term_id, term.location))
+            if term_id not in term_fields:
+                term_fields[term_id] = {"author": [], "title": [], "body": []}
+            field = field_names[term.location]
+            term_fields[term_id][field].append(field_lengths[field])
+            field_lengths[field] += 1
+        self._increment_term_statistics(term_fields, author_length + title_length + body_length)
         doc_id = self._new_document(doc, author_length, title_length, body_length)
-        for term_id, location in term_ids_and_locations:
-            self._update_postings(term_id, doc_id, location)
+        self._insert_postings(doc_id, term_fields, (author_length, title_length, body_length))
+
+    def _document_term_ids(self, doc_id: int, tokenizer: Tokenizer) -> set[int]:
+        return set(self._document_term_counts(doc_id, tokenizer))
+
+    def _document_term_counts(self, doc_id: int, tokenizer: Tokenizer) -> dict[int, list[int]]:
+        # the occurrences of each term of the document in the author, title and body
+        doc = self.get_document_contents(doc_id)
+        field_indices = {TokenLocation.AUTHOR: 0, TokenLocation.TITLE: 1, TokenLocation.BODY: 2}
+        term_counts = {}
+        for (term, location), count in Counter((token.text, token.location) for token in tokenizer.tokenize_document(doc)).items():
+            term_id = self.get_term_id(term)
+            if term_id is not None:
+                term_counts.setdefault(term_id, [0, 0, 0])[field_indices[location]] += count
+        return term_counts
+
+    def _purge_document(self, doc_id: int, term_ids: set[int]) -> None:
+        cursor = self.connection.cursor()
+        if self.posting_blocks:
+            self._flush_posting_blocks()
+            for term_id in term_ids:
+                block = self._take_posting_block(term_id, doc_id)
+                if block is not None:
+                    self._write_posting_blocks(term_id, [(posting, lengths) for posting, lengths in block if posting.doc_id != doc_id])
+        else:
+            cursor.executemany("delete from postings where term_id = ? and doc_id = ?", ((term_id, doc_id) for term_id in term_ids))
+        cursor.executemany("update terms set posting_count = posting_count - 1 where term_id = ?", ((term_id,) for term_id in term_ids))
+        cursor.execute("delete from document_contents where doc_id = ?", (doc_id,))
+        if self.document_store is not None:
+            self.document_store.delete(doc_id)
+        cursor.execute("delete from document_info where doc_id = ?", (doc_id,))
+        cursor.execute("delete from tombstones where doc_id = ?", (doc_id,))
+        self.tombstones.discard(doc_id)
+
+    def _set_autocommit(self, autocommit: bool) -> None:
+        if sys.version_info.minor == 10:
+            self.connection.isolation_level = None if autocommit else "DEFERRED"
+        else:
+            self.connection.autocommit = autocommit
+
+    def _checkpoint_wal(self) -> None:
+        # move the write-ahead log into the database, it can't run inside a transaction
+        self._set_autocommit(True)
+        self.connection.execute("pragma wal_checkpoint(truncate)")
+        self._set_autocommit(False)
+
+    def delete_document(self, doc_id: int, tokenizer: Tokenizer) -> None:
+        if not self._contains_document(doc_id) or doc_id in self.tombstones:
+            raise ValueError(f"Document {doc_id} is not in the index")
+        self.global_info_dirty = True
+
+        term_counts = self._document_term_counts(doc_id, tokenizer)
+        document_info = self.get_document_info(doc_id)
+        cursor = self.connection.cursor()
+        # max_tf and min_document_length are left as bounds until compact
+        cursor.executemany(
+            "update terms set document_frequency = document_frequency - 1, collection_frequency = collection_frequency - ?, "
+            "collection_frequency_author = collection_frequency_author - ?, collection_frequency_title = collection_frequency_title - ?, "
+            "collection_frequency_body = collection_frequency_body - ? where term_id = ?",
+            ((sum(counts), *counts, term_id) for term_id, counts in term_counts.items()))
+        self._increment_field_lengths(*(-length for length in document_info.lengths))
+        cursor.execute("update global_info set value = value - 1 where key = 'num_docs'")
+        cursor.execute("insert into tombstones(doc_id) values (?)", (doc_id,))
         self.connection.commit()
+        self.tombstones.add(doc_id)
 
-    def bulk_index_documents(self, docs, tokenizer, verbose = False):
-        super().bulk_index_documents(docs, tokenizer, verbose)
+    def update_document(self, doc_id: int, doc: DocumentContents, tokenizer: Tokenizer) -> None:
+        if self._contains_document(doc_id):
+            if doc_id not in self.tombstones:
+                self.delete_document(doc_id, tokenizer)
+            self._purge_document(doc_id, self._document_term_ids(doc_id, tokenizer))
+        doc.add_field("doc_id", doc_id)
+        self.index_document(doc, tokenizer)
+
+    def set_trace(self, trace: Optional[SearchTrace]) -> None:
+        if trace is not None:
+            self.connection.set_trace_callback(lambda _statement: trace.count("sql_calls"))
+        else:
+            self.connection.set_trace_callback(None)
+
+    def get_tombstones(self) -> Tombstones:
+        return self.tombstones
+
+    def compact(self) -> None:
+        cursor = self.connection.cursor()
+        cursor.execute("delete from postings where doc_id in (select doc_id from tombstones)")
+        if self.posting_blocks:
+            self._flush_posting_blocks()
+            self._rewrite_posting_blocks(set(self.tombstones))
+        cursor.execute("delete from document_contents where doc_id in (select doc_id from tombstones)")
+        if self.document_store is not None:
+            for doc_id in self.tombstones:
+                self.document_store.delete(doc_id)
+        cursor.execute("delete from external_ids where doc_id in (select doc_id from tombstones)")
+        cursor.execute("delete from document_info where doc_id in (select doc_id from tombstones)")
+        cursor.execute("delete from terms where document_frequency = 0")
+        # without deleted documents every posting belongs to a document counted in the document frequency
+        cursor.execute("update terms set posting_count = document_frequency")
+        cursor.execute("delete from tombstones")
+        self.tombstones.clear()
+        self._recompute_term_statistics()
+        # vacuum can't run inside a transaction
+        self._set_autocommit(True)
+        self.connection.execute("vacuum")
+        self._set_autocommit(False)
+        self._checkpoint_wal()
+        if self.document_store is not None:
+            self.document_store.compact()
+
+    def get_doc_ids(self) -> Generator[int, None, None]:
+        cursor = self.connection.cursor()
+        cursor.execute(
+            "select doc_id from document_info where doc_id not in (select doc_id from tombstones) order by doc_id")
+        for doc_id, in cursor:
+            yield doc_id
+
+    def get_term_ids(self) -> Generator[int, None, None]:
+        cursor = self.connection.cursor()
+        cursor.execute("select term_id from terms where posting_count > 0 order by term_id")
+        for term_id, in cursor:
+            yield term_id
+
+    def import_document(self, doc_id: int, info: DocumentInfo, doc: DocumentContents, external_id: Optional[int] = None) -> None:
+        author_len, title_len, body_len = info.lengths
+        cursor = self.connection.cursor()
+        cursor.execute(
+            "insert into document_info(doc_id, author_len, title_len, body_len) values (?, ?, ?, ?)",
+            (doc_id, author_len, title_len, body_len))
+        if external_id is not None and external_id != doc_id:
+            cursor.execute("insert into external_ids(doc_id, external_id) values (?, ?)", (doc_id, external_id))
+            self.has_external_ids = True
+        if self.document_store is not None:
+            self.document_store.put(doc_id, doc)
+        else:
+            cursor.execute(
+                "insert into document_contents(doc_id, author, title, body) values (?, ?, ?, ?)",
+                (doc_id, doc.author, doc.title, doc.body))
+        # the lengths of the documents are needed by the blocks and by the statistics of the imported terms
+        if 3 * doc_id + 3 > len(self.import_lengths):
+            self.import_lengths.extend([0] * (3 * doc_id + 3 - len(self.import_lengths)))
+        self.import_lengths[3 * doc_id:3 * doc_id + 3] = array("i", info.lengths)
+        self._count_imported_rows(1)
+
+    def _count_imported_rows(self, rows: int) -> None:
+        # commit from time to time, so that the write-ahead log doesn't grow as large as the index
+        self.imported_rows += rows
+        if self.imported_rows >= 100000:
+            self._commit()
+            self.imported_rows = 0
+
+    def import_postings(self, term: str, postings: list[Posting]) -> None:
+        if self.positions and any(posting.positions is None for posting in postings):
+            raise ValueError("The imported postings have no positions")
+        cursor = self.connection.cursor()
+        statistics = term_statistics(postings, {
+            posting.doc_id: sum(self.import_lengths[3 * posting.doc_id:3 * posting.doc_id + 3]) for posting in postings})
+        cursor.execute(
+            f"insert into terms(term, document_frequency, posting_count, {', '.join(SQLITE_TERM_STATISTICS)}) "
+            f"values (?, ?, ?, {', '.join('?' * len(SQLITE_TERM_STATISTICS))})",
+            (term, len(postings), len(postings), *(statistics[column] for column in SQLITE_TERM_STATISTICS)))
+        term_id = cursor.lastrowid
+        if self.posting_blocks:
+            self._write_posting_blocks(term_id, [
+                (Posting(posting.doc_id, term_id, posting.occurrences, posting.positions if self.positions else None),
+                 tuple(self.import_lengths[3 * posting.doc_id:3 * posting.doc_id + 3]))
+                for posting in postings])
+        else:
+            cursor.executemany(
+                "insert into postings(term_id, doc_id, occurrences_author, occurrences_title, occurrences_body, positions) "
+                "values (?, ?, ?, ?, ?, ?)", (
+                    (term_id, posting.doc_id, posting.occurrences["author"], posting.occurrences["title"],
+                     posting.occurrences["body"], posting.positions if self.positions else None)
+                    for posting in postings))
+        self._count_imported_rows(len(postings))
+
+    def finish_import(self) -> None:
+        cursor = self.connection.cursor()
+        num_docs, total_author_len, total_title_len, total_body_len = cursor.execute(
+            "select count(*), coalesce(sum(author_len), 0), coalesce(sum(title_len), 0), coalesce(sum(body_len), 0) "
+            "from document_info").fetchone()
+        cursor.executemany("update global_info set value = ? where key = ?", [
+            (num_docs, "num_docs"),
+            (total_author_len, "total_author_len"),
+            (total_title_len, "total_title_len"),
+            (total_body_len, "total_body_len")])
+        self.import_lengths = array("i")
+        self.global_info_dirty = True
+        self._commit()
+        self._set_autocommit(True)
+        self.connection.execute("analyze")
+        self.connection.execute("vacuum")
+        self._set_autocommit(False)
+        self._checkpoint_wal()
+
+    def get_checkpoint(self) -> Optional[dict[str, int]]:
+        """
+        Get the progress of the last bulk indexing.
+
+        # Returns
+        - Optional[dict[str, int]]: None if bulk_index_documents was never called, otherwise a dictionary with
+        the number of the last committed "batch" and the number of "documents" committed, counted across all the builds,
+        the number of "build_documents" committed by the last build, the "offset" attribute
+        of the last committed document (-1 if not available) and whether the indexing was "completed" (0 or 1).
+        """
+        cursor = self.connection.cursor()
+        cursor.execute("select key, value from build_checkpoint")
+        checkpoint = {key: value for key, value in cursor.fetchall()}
+        return checkpoint if len(checkpoint) > 0 else None
+
+    def _save_checkpoint(self, batch: int, documents: int, build_documents: int, offset: Optional[int], completed: bool) -> None:
+        self.connection.executemany(
+            "insert or replace into build_checkpoint(key, value) values (?, ?)", [
+                ("batch", batch),
+                ("documents", documents),
+                ("build_documents", build_documents),
+                ("offset", offset if offset is not None else -1),
+                ("completed", int(completed))])
+
+    def bulk_index_documents(self, docs: SizedGenerator[DocumentContents, None, None], tokenizer: Tokenizer, verbose: bool = False, checkpoint_every: int = 10000) -> None:
+        """
+        Add multiple documents to the index, committing a checkpoint every checkpoint_every documents.
+        If the indexing is interrupted (also by an exception) only the documents up to the last checkpoint are kept,
+        and calling it again with the same documents resumes it. If docs can be resumed (see SizedGenerator.resume)
+        and its documents have an offset attribute, the reading restarts from the offset of the last committed document,
+        otherwise the documents already committed are read again and skipped.
+        The documents are not checked against the ones already in the index.
+
+        # Parameters
+        - docs (SizedGenerator[DocumentContents, None, None]): A generator of documents to add to the index,
+        from the first one even when an interrupted build is resumed.
+        - tokenizer (Tokenizer): The tokenizer to use to tokenize the documents.
+        - verbose (bool): Whether to show a progress bar.
+        - checkpoint_every (int): The number of documents in each committed batch.
+        """
+        checkpoint = self.get_checkpoint()
+        batch, documents, build_documents, offset = 0, 0, 0, None
+        if checkpoint is not None:
+            # the counts go on across builds
+            batch, documents = checkpoint["batch"], checkpoint["documents"]
+            if not checkpoint["completed"]:
+                # checkpoints saved before build_documents was stored come from a single build
+                build_documents = checkpoint.get("build_documents", documents)
+                offset = checkpoint["offset"] if checkpoint["offset"] >= 0 else None
+        remaining = max(len(docs) - build_documents, 0)
+        if build_documents == 0:
+            remaining_docs = docs
+        elif offset is not None and docs.resume is not None:
+            remaining_docs = docs.resume(offset, remaining)
+        else:
+            remaining_docs = islice(docs, build_documents, None)
+        pending = 0
+        try:
+            for doc in tqdm(remaining_docs, desc="Indexing documents", disable=not verbose, total=remaining):
+                self._index_document(doc, tokenizer)
+                offset = doc.__dict__.get("offset")
+                pending += 1
+                if pending == checkpoint_every:
+                    batch += 1
+                    documents += pending
+                    build_documents += pending
+                    pending = 0
+                    self._save_checkpoint(batch, documents, build_documents, offset, False)
+                    self._commit()
+        except BaseException:
+            # the partial batch is dropped, so the index is the one of the last checkpoint
+            self._rollback()
+            raise
+        self._save_checkpoint(batch + 1, documents + pending, build_documents + pending, offset, True)
+        self._commit()
         self.connection.execute("pragma optimize")
         self.connection.commit()
+        # the finished index can be opened as immutable
+        self._checkpoint_wal()
 
 if __name__ == "__main__":
     index = SqliteIndex()
@@ -6,12 +6,24 @@ from tqdm.auto import tqdm
 from mir.ir.document_info import DocumentInfo
 from mir.ir.document_contents import DocumentContents
 from mir.ir.posting import Posting
+from mir.ir.posting_cursor import GeneratorPostingCursor, PostingCursor
+from mir.ir.search_trace import SearchTrace
 from mir.ir.term import Term
 from mir.ir.tokenizer import Tokenizer
+from mir.ir.tombstones import Tombstones
 from mir.utils.sized_generator import SizedGenerator
 
 
 class Index(Protocol):
+    # the optional capabilities of a backend, checked by the callers before using the methods they cover,
+    # which raise NotImplementedError by default:
+    # deletion for delete_document and update_document,
+    # listing for get_doc_ids and get_term_ids,
+    # import for import_document, import_postings and finish_import
+    supports_deletion: bool = False
+    supports_listing: bool = False
+    supports_import: bool = False
+
     def get_global_info(self) -> dict[str, Any]:
         """
         Get global info from the index.
@@ -34,6 +46,22 @@ class Index(Protocol):
         - Posting: A posting from the posting list related to the term_id.
         """
 
+    def get_posting_cursor(self, term_id: int, cost: Optional[int] = None) -> PostingCursor:
+        """
+        Get a cursor over the posting list of a term_id, that can skip to a doc_id with next_geq.
+        By default it wraps get_postings, so skipping reads all the postings in between.
+
+        # Parameters
+        - term_id (int): The term_id.
+        - cost (Optional[int]): The length of the posting list if already known (see get_terms), to avoid looking it up.
+
+        # Returns
+        - PostingCursor: A cursor on the first posting of the list.
+        """
+        if cost is None:
+            cost = self.get_term(term_id).info.get("document_frequency", 0)
+        return GeneratorPostingCursor(self.get_postings(term_id), cost)
+
     @abstractmethod
     def get_document_info(self, doc_id: int) -> DocumentInfo:
         """
@@ -46,6 +74,19 @@ class Index(Protocol):
         - DocumentInfo: The document info related to the doc_id.
         """
     
+    def get_documents_info(self, doc_ids: list[int]) -> list[DocumentInfo]:
+        """
+        Get the info of many documents at once.
+        By default it calls get_document_info for each doc_id.
+
+        # Parameters
+        - doc_ids (list[int]): The doc_ids.
+
+        # Returns
+        - list[DocumentInfo]: The info of each document, in the same order as doc_ids.
+        """
+        return [self.get_document_info(doc_id) for doc_id in doc_ids]
+
     def get_document_contents(self, doc_id: int) -> DocumentContents:
         """
         Get document contents from a doc_id.
@@ -57,6 +98,19 @@ class Index(Protocol):
         - DocumentContents: The document contents related to the doc_id.
         """
 
+    def get_documents_contents(self, doc_ids: list[int]) -> list[DocumentContents]:
+        """
+        Get the contents of many documents at once.
+        By default it calls get_document_contents for each doc_id.
+
+        # Parameters
+        - doc_ids (list[int]): The doc_ids.
+
+        # Returns
+        - list[DocumentContents]: The contents of each document, in the same order as doc_ids.
+        """
+        return [self.get_document_contents(doc_id) for doc_id in doc_ids]
+
     @abstractmethod
     def get_term(self, term_id: int) -> Term:
         """
@@ -82,6 +136,29 @@ class Index(Protocol):
         - Optional[int]: The term_id related to the term or None if the term is not in the index.
         """
 
+    def get_terms(self, terms: list[str]) -> list[Optional[Term]]:
+        """
+        Get the info of many terms at once, to prepare a query with a single lookup.
+        By default it calls get_term_id and get_term for each term.
+
+        # Parameters
+        - terms (list[str]): The terms in string format.
+
+        # Returns
+        - list[Optional[Term]]: The term related to each string, None if it's not in the index.
+        Their info contains the "document_frequency" and the "posting_size", the number of postings in the list
+        (it can be larger than the document frequency until the deleted documents are compacted).
+        """
+        ret = []
+        for text in terms:
+            term_id = self.get_term_id(text)
+            if term_id is None:
+                ret.append(None)
+            else:
+                term = self.get_term(term_id)
+                ret.append(Term(term.term, term.id, **{"posting_size": term.info.get("document_frequency", 0), **term.info}))
+        return ret
+
     @abstractmethod
     def __len__(self) -> int:
         """
@@ -101,6 +178,122 @@ class Index(Protocol):
         - tokenizer (Tokenizer): The tokenizer to use to tokenize the document.
         """
 
+    def delete_document(self, doc_id: int, tokenizer: Tokenizer) -> None:
+        """
+        Delete a document from the index.
+        The document is only marked with a tombstone and the global statistics are corrected,
+        the space is reclaimed by compact.
+
+        # Parameters
+        - doc_id (int): The doc_id of the document to delete.
+        - tokenizer (Tokenizer): The tokenizer used to index the document.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not support deletion, see supports_deletion")
+
+    def update_document(self, doc_id: int, doc: DocumentContents, tokenizer: Tokenizer) -> None:
+        """
+        Replace the contents of a document, keeping its doc_id.
+
+        # Parameters
+        - doc_id (int): The doc_id of the document to replace.
+        - doc (DocumentContents): The new contents of the document.
+        - tokenizer (Tokenizer): The tokenizer to use to tokenize the document.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not support updates, see supports_deletion")
+
+    def set_trace(self, trace: Optional[SearchTrace]) -> None:
+        """
+        Record the counters of the index (e.g. the number of SQL calls) in a trace
+        until it is set to None.
+
+        # Parameters
+        - trace (Optional[SearchTrace]): The trace of the current query.
+        """
+
+    def get_tombstones(self) -> Tombstones:
+        """
+        Get the doc_ids of the deleted documents that are still present in the posting lists.
+
+        # Returns
+        - Tombstones: The bitmap of deleted doc_ids.
+        """
+        return Tombstones()
+
+    def compact(self) -> None:
+        """
+        Physically remove the deleted documents from the index.
+        """
+
+    def get_doc_ids(self) -> Generator[int, None, None]:
+        """
+        Get the doc_ids of all the documents that are not deleted, used to copy the index (see convert_index).
+
+        # Yields
+        - int: A doc_id, in increasing order.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} can't list its documents, see supports_listing")
+
+    def get_term_ids(self) -> Generator[int, None, None]:
+        """
+        Get the term_ids of all the terms with a posting list, used to copy the index (see convert_index).
+
+        # Yields
+        - int: A term_id.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} can't list its terms, see supports_listing")
+
+    def get_external_ids(self, doc_ids: list[int]) -> list[int]:
+        """
+        Get the ids that the documents had in the collection, which differ from the doc_ids
+        when the documents were renumbered (see convert_index). By default they are the doc_ids.
+
+        # Parameters
+        - doc_ids (list[int]): The doc_ids.
+
+        # Returns
+        - list[int]: The external id of each document, in the same order as doc_ids.
+        """
+        return list(doc_ids)
+
+    def memory_usage(self) -> dict[str, Any]:
+        """
+        Get the memory used by the structures of the index and the usage of its caches (see MemoryBudget).
+
+        # Returns
+        - dict[str, Any]: The estimated bytes of the "resident" structures by name, and the statistics of the caches.
+        By default it is empty.
+        """
+        return {}
+
+    def import_document(self, doc_id: int, info: DocumentInfo, doc: DocumentContents, external_id: Optional[int] = None) -> None:
+        """
+        Add a document whose statistics are already known, without tokenizing it.
+        The doc_ids must be increasing, and the postings are added later with import_postings.
+
+        # Parameters
+        - doc_id (int): The doc_id of the document.
+        - info (DocumentInfo): The field lengths of the document.
+        - doc (DocumentContents): The contents of the document.
+        - external_id (Optional[int]): The id of the document in the collection, if different from doc_id.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not support imports, see supports_import")
+
+    def import_postings(self, term: str, postings: list[Posting]) -> None:
+        """
+        Add a term that is not in the index and its whole posting list.
+
+        # Parameters
+        - term (str): The term in string format.
+        - postings (list[Posting]): The postings of the term, sorted by doc_id, all of imported documents.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not support imports, see supports_import")
+
+    def finish_import(self) -> None:
+        """
+        Recompute the global statistics after import_document and import_postings, and write the index to disk.
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not support imports, see supports_import")
+
     def bulk_index_documents(self, docs: SizedGenerator[DocumentContents, None, None], tokenizer: Tokenizer, verbose: bool = False) -> None:
         """
         Add multiple documents to the index, this calls index_document for each document.
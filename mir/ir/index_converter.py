@@ -0,0 +1,79 @@
+from array import array
+from typing import Optional
+
+from tqdm.auto import tqdm
+
+from mir.ir.index import Index
+from mir.ir.posting import Posting
+
+
+def lexicographic_order(index: Index, batch_size: int = 1000, key_length: int = 64, verbose: bool = False) -> list[int]:
+    """
+    Sort the documents by author, title and the start of the body,
+    so that similar documents get close doc_ids, like sorting web pages by URL.
+
+    # Parameters
+    - index (Index): The index.
+    - batch_size (int): The number of documents read at once.
+    - key_length (int): The number of characters of the body used in the sort key.
+    - verbose (bool): Whether to show a progress bar.
+
+    # Returns
+    - list[int]: The doc_ids of the index in the new order.
+    """
+    if not index.supports_listing:
+        raise ValueError(f"{index.__class__.__name__} can't list its documents")
+    doc_ids = list(index.get_doc_ids())
+    keys = []
+    for start in tqdm(range(0, len(doc_ids), batch_size), desc="Sorting documents", disable=not verbose):
+        for doc in index.get_documents_contents(doc_ids[start:start + batch_size]):
+            keys.append((doc.author, doc.title, doc.body[:key_length]))
+    return [doc_id for _, doc_id in sorted(zip(keys, doc_ids), key=lambda pair: pair[0])]
+
+
+def convert_index(source: Index, target: Index, doc_order: Optional[list[int]] = None, batch_size: int = 1000, verbose: bool = False) -> None:
+    """
+    Copy an index into an empty index of another backend, without tokenizing the documents again.
+    The documents are copied in batches and the postings one term at a time, so the source is never loaded whole in memory.
+    Deleted documents are left out, and the target recomputes the global statistics and writes itself to disk at the end.
+
+    # Parameters
+    - source (Index): The index to copy, it must support listing (see Index.supports_listing).
+    - target (Index): The empty index to fill, it must support imports (see Index.supports_import).
+    - doc_order (Optional[list[int]]): The doc_ids of the source in the order they get in the target,
+    renumbered from 0 (see lexicographic_order and graph_bisection_order). If None the doc_ids are kept.
+    The target maps the new doc_ids back to the external ids of the source, see Index.get_external_ids.
+    - batch_size (int): The number of documents copied at once.
+    - verbose (bool): Whether to show progress bars.
+    """
+    if not source.supports_listing:
+        raise ValueError(f"{source.__class__.__name__} can't list its documents and terms")
+    if not target.supports_import:
+        raise ValueError(f"{target.__class__.__name__} does not support imports")
+    if len(target) > 0:
+        raise ValueError("The target index must be empty")
+    if doc_order is not None and len(set(doc_order)) != len(doc_order):
+        raise ValueError("doc_order contains duplicates")
+    doc_ids = list(source.get_doc_ids()) if doc_order is None else doc_order
+    # the new doc_id of each source doc_id, -1 for the deleted ones
+    new_doc_ids = array("q", [-1]) * ((max(doc_ids) + 1) if len(doc_ids) > 0 else 0)
+    for new_doc_id, doc_id in enumerate(doc_ids):
+        new_doc_ids[doc_id] = new_doc_id if doc_order is not None else doc_id
+
+    for start in tqdm(range(0, len(doc_ids), batch_size), desc="Copying documents", disable=not verbose):
+        batch = doc_ids[start:start + batch_size]
+        # the external ids of the source are kept, so a renumbered index can be renumbered again
+        for doc_id, external_id, doc in zip(batch, source.get_external_ids(batch), source.get_documents_contents(batch)):
+            target.import_document(new_doc_ids[doc_id], source.get_document_info(doc_id), doc, external_id)
+
+    for term_id in tqdm(source.get_term_ids(), desc="Copying postings", disable=not verbose):
+        postings = [
+            Posting(new_doc_ids[posting.doc_id], term_id, posting.occurrences, posting.positions)
+            for posting in source.get_postings(term_id)
+            if posting.doc_id < len(new_doc_ids) and new_doc_ids[posting.doc_id] >= 0]
+        if len(postings) == 0:
+            continue
+        if doc_order is not None:
+            postings.sort(key=lambda posting: posting.doc_id)
+        target.import_postings(source.get_term(term_id).term, postings)
+    target.finish_import()
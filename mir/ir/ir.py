@@ -1,22 +1,37 @@
 from collections.abc import Generator
+import heapq
+import itertools
 import string
 import time
-from typing import Optional
+from typing import Any, Literal, Optional
 
+import numpy as np
 import pandas as pd
 from tqdm.auto import tqdm
-from more_itertools import peekable
 
+from mir.ir.document_cache import DocumentCache
 from mir.ir.document_contents import DocumentContents
+from mir.ir.impact_index import ImpactIndex
 from mir.ir.impls.default_index import DefaultIndex
 from mir.ir.impls.count_scoring_function import CountScoringFunction
 from mir.ir.impls.default_tokenizers import DefaultTokenizer
 from mir.ir.index import Index
+from mir.ir.lazy_document_contents import LazyDocumentContents
+from mir.ir.memory_budget import process_memory_usage
+from mir.ir.positions import phrase_matches
+from mir.ir.posting import Posting
+from mir.ir.posting_cursor import PostingCursor
 from mir.ir.priority_queue import PriorityQueue
-from mir.ir.scoring_function import ScoringFunction
+from mir.ir.query_rewriter import QueryRewriter
+from mir.ir.scoring_function import ScoringBatch, ScoringFunction
+from mir.ir.search_trace import SearchProfiler, SearchTrace
+from mir.ir.term import Term
 from mir.ir.tokenizer import Tokenizer
+from mir.ir.tombstones import Tombstones
 from mir.utils.sized_generator import SizedGenerator
 
+QueryMode = Literal["or", "and", "phrase", "impact"]
+
 class Ir:
     def __init__(self, index: Optional[Index] = None, tokenizer: Optional[Tokenizer] = None, scoring_functions: Optional[list[tuple[int, ScoringFunction]]] = None):
         """
@@ -33,6 +48,13 @@ class Ir:
         self.scoring_functions: list[tuple[int, ScoringFunction]] = scoring_functions if scoring_functions is not None else [
             (1000, CountScoringFunction())
         ]
+        self.profiler: Optional[SearchProfiler] = None
+        self.content_cache: Optional[DocumentCache] = None
+        self.impact_index: Optional[ImpactIndex] = None
+        self.impact_budget: Optional[int] = None
+        self.query_rewriter: Optional[QueryRewriter] = None
+        # the number of candidates scored at once by the scoring functions with a columnar_call
+        self.scoring_block_size = 256
 
     def __len__(self) -> int:
         """
@@ -59,107 +81,627 @@ class Ir:
         """
         self.index.bulk_index_documents(docs, self.tokenizer, verbose)
 
-    def search(self, query: str) -> Generator[DocumentContents, None, None]:
+    def delete_document(self, doc_id: int) -> None:
+        """
+        Delete a document, the space is reclaimed when compact is called.
+
+        # Parameters
+        - doc_id (int): The doc_id of the document to delete.
+        """
+        if not self.index.supports_deletion:
+            raise ValueError(f"{self.index.__class__.__name__} does not support deletion")
+        self.index.delete_document(doc_id, self.tokenizer)
+        if self.content_cache is not None:
+            self.content_cache.discard(doc_id)
+
+    def update_document(self, doc_id: int, doc: DocumentContents) -> None:
+        """
+        Replace the contents of a document, keeping its doc_id.
+
+        # Parameters
+        - doc_id (int): The doc_id of the document to replace.
+        - doc (DocumentContents): The new contents of the document.
+        """
+        if not self.index.supports_deletion:
+            raise ValueError(f"{self.index.__class__.__name__} does not support updates")
+        self.index.update_document(doc_id, doc, self.tokenizer)
+        if self.content_cache is not None:
+            self.content_cache.discard(doc_id)
+
+    def compact(self) -> None:
+        """
+        Physically remove the deleted documents from the index.
+        """
+        self.index.compact()
+        if self.content_cache is not None:
+            self.content_cache.clear()
+
+    def search(self, query: str, trace: Optional[SearchTrace] = None, mode: QueryMode = "or") -> Generator[DocumentContents, None, None]:
         """
         Search for documents based on a query.
         Uses document-at-a-time scoring.
 
         # Parameters
         - query (str): The query to search for.
-        - scoring_functions (list[ScoringFunction]): A list of scoring functions to use.
+        - trace (Optional[SearchTrace]): If set, the timers and counters of the query are recorded in it.
+        - mode (QueryMode): "or" to match any term of the query, "and" to match all of them, "phrase" to match the exact phrase,
+        "impact" to match any term selecting the documents score-at-a-time (see enable_impacts).
 
         # Yields
         - DocumentContents: A document that matches the query. In decreasing order of score.
-        It also has a score attribute with the score of the document.
+        It also has an id, an external_id (the id in the collection, see Index.get_external_ids)
+        and a score attribute. The author, title and body are loaded the first time
+        one of them is accessed, for all the results at once, so they are never loaded if only the ids and scores are used.
+        """
+        profiler = self.profiler
+        owned_trace = trace is None and profiler is not None
+        if owned_trace:
+            trace = SearchTrace(query)
+        # the contents loaded by the rerankers are reused for the results
+        contents: dict[int, DocumentContents] = {}
+        try:
+            ranking = self.rank(query, trace, mode, contents)
+            loaded = False
+            def load() -> dict[int, DocumentContents]:
+                nonlocal loaded
+                if not loaded:
+                    loaded = True
+                    doc_ids = [doc_id for _, doc_id in ranking]
+                    if trace is not None:
+                        with trace.stage("content_fetch"):
+                            self._load_contents(doc_ids, contents, trace)
+                    else:
+                        self._load_contents(doc_ids, contents, None)
+                return contents
+            external_ids = self.index.get_external_ids([doc_id for _, doc_id in ranking])
+            for (score, doc_id), external_id in zip(ranking, external_ids):
+                yield LazyDocumentContents(doc_id, load, score=score, external_id=external_id)
+        finally:
+            # also when the caller stops iterating early, which closes the generator
+            if owned_trace:
+                profiler.record(trace)
+
+    def get_documents_contents(self, doc_ids: list[int], contents: Optional[dict[int, DocumentContents]] = None) -> list[DocumentContents]:
+        """
+        Get the contents of many documents, from the content cache if enabled and from the index in a single batch.
+
+        # Parameters
+        - doc_ids (list[int]): The doc_ids.
+        - contents (Optional[dict[int, DocumentContents]]): The documents already loaded for the same query (see rank),
+        they are not loaded again.
+
+        # Returns
+        - list[DocumentContents]: The contents of each document, in the same order as doc_ids.
+        """
+        contents = contents if contents is not None else {}
+        self._load_contents(doc_ids, contents, None)
+        return [contents[doc_id] for doc_id in doc_ids]
+
+    def _load_contents(self, doc_ids: list[int], contents: dict[int, DocumentContents], trace: Optional[SearchTrace]) -> None:
+        missing = []
+        cache_hits = 0
+        for doc_id in dict.fromkeys(doc_ids):
+            if doc_id in contents:
+                continue
+            cached = self.content_cache.get(doc_id) if self.content_cache is not None else None
+            if cached is not None:
+                contents[doc_id] = cached
+                cache_hits += 1
+            else:
+                missing.append(doc_id)
+        if len(missing) > 0:
+            for doc_id, document_contents in zip(missing, self.index.get_documents_contents(missing)):
+                contents[doc_id] = document_contents
+                if self.content_cache is not None:
+                    self.content_cache.put(doc_id, document_contents)
+        if trace is not None:
+            trace.count("contents_fetched", len(missing))
+            if self.content_cache is not None:
+                trace.count("content_cache_hits", cache_hits)
+
+    def enable_content_cache(self, capacity: int) -> DocumentCache:
+        """
+        Keep the contents of the most recently used documents in memory.
+
+        # Parameters
+        - capacity (int): The maximum number of documents in the cache.
+
+        # Returns
+        - DocumentCache: The cache, with its hits and misses.
+        """
+        if self.content_cache is None or self.content_cache.capacity != capacity:
+            self.content_cache = DocumentCache(capacity)
+        return self.content_cache
+
+    def disable_content_cache(self) -> None:
+        """
+        Stop caching the contents of the documents.
+        """
+        self.content_cache = None
+
+    def memory_usage(self) -> dict[str, Any]:
+        """
+        Get the memory actually used by the process, the memory used by the index and the usage of the caches.
+
+        # Returns
+        - dict[str, Any]: The "process" memory (see process_memory_usage), the "index" one (see Index.memory_usage)
+        and the "content_cache" statistics, None if the cache is disabled.
+        """
+        return {
+            "process": process_memory_usage(),
+            "index": self.index.memory_usage(),
+            "content_cache": self.content_cache.info() if self.content_cache is not None else None,
+        }
+
+    def enable_impacts(self, impact_index: ImpactIndex, budget: Optional[int] = None) -> None:
+        """
+        Use an impact index for the queries in "impact" mode.
+
+        # Parameters
+        - impact_index (ImpactIndex): The impacts of the index, built with ImpactIndex.build.
+        - budget (Optional[int]): The maximum number of impacts added up for a query, the search stops there
+        and returns the best documents found so far. If None the search stops only when the top documents can't change.
+        """
+        self.impact_index = impact_index
+        self.impact_budget = budget
+
+    def disable_impacts(self) -> None:
+        """
+        Stop using the impact index, queries in "impact" mode raise ValueError.
+        """
+        self.impact_index = None
+        self.impact_budget = None
+
+    def enable_query_rewriting(self, query_rewriter: QueryRewriter) -> None:
+        """
+        Rewrite the terms of the following queries, except the phrase queries, before their posting lists are opened.
+
+        # Parameters
+        - query_rewriter (QueryRewriter): The rewriter, see QueryRewriter for its parameters.
+        """
+        self.query_rewriter = query_rewriter
+
+    def disable_query_rewriting(self) -> None:
+        """
+        Stop rewriting the queries, every term of a query is searched again.
+        """
+        self.query_rewriter = None
+
+    def enable_profiling(self) -> SearchProfiler:
+        """
+        Record the traces of all the following queries in a SearchProfiler.
+
+        # Returns
+        - SearchProfiler: The profiler with the aggregated histograms.
+        """
+        if self.profiler is None:
+            self.profiler = SearchProfiler()
+        return self.profiler
+
+    def disable_profiling(self) -> None:
+        """
+        Stop recording the traces of the queries.
+        """
+        self.profiler = None
+
+    def rank(self, query: str, trace: Optional[SearchTrace] = None, mode: QueryMode = "or", contents: Optional[dict[int, DocumentContents]] = None) -> list[tuple[float, int]]:
+        """
+        Rank the documents for a query without loading their contents
+        (except for the scoring functions that need them).
+
+        # Parameters
+        - query (str): The query to search for.
+        - trace (Optional[SearchTrace]): If set, the timers and counters of the query are recorded in it.
+        - mode (QueryMode): Which documents are ranked, the ones containing any term of the query ("or"),
+        the ones containing all the terms ("and") or the ones containing the terms one after the other in the same field ("phrase").
+        Phrase queries need an index that stores the positions.
+        In "impact" mode only the documents with the highest quantized BM25F scores of the impact index (see enable_impacts)
+        are scored by the first scoring function.
+        - contents (Optional[dict[int, DocumentContents]]): If set, the contents loaded by the rerankers are added to it,
+        so they are not loaded again when the results are shown.
+
+        # Returns
+        - list[tuple[float, int]]: The scores and doc_ids of the results, in decreasing order of score.
         """
 
         assert len(self.scoring_functions) > 0, "At least one scoring function must be provided"
+        if mode not in ("or", "and", "phrase", "impact"):
+            raise ValueError(f"Unknown query mode {mode!r}")
+        if mode == "impact" and self.impact_index is None:
+            raise ValueError("The impact mode needs an impact index, see enable_impacts")
 
-        ks, scoring_functions = zip(*self.scoring_functions)
-        scoring_functions: list[ScoringFunction] = list(scoring_functions)
-        ks: list[int] = list(ks)[::-1]
-        
-        terms = self.tokenizer.tokenize_query(query)
-        term_ids = [term_id for term in terms if (
-            term_id := self.index.get_term_id(term.text)) is not None]
-        terms = [self.index.get_term(term_id) for term_id in term_ids]
-        posting_generators = [
-            peekable(self.index.get_postings(term_id)) for term_id in term_ids]
-
-        priority_queue = PriorityQueue(ks[-1])
-        first_scoring_function = scoring_functions[0]
-        postings_cache = {}
+        profiler = self.profiler
+        owned_trace = trace is None and profiler is not None
+        if owned_trace:
+            trace = SearchTrace(query)
+        tracing = trace is not None
+        if tracing:
+            self.index.set_trace(trace)
+        contents = contents if contents is not None else {}
+        try:
+            ranking, terms, postings_cache = self._first_stage(query, trace, mode, contents)
+            ranking = self._rerank(query, terms, ranking, postings_cache, contents, trace)
+        finally:
+            # the index must not keep counting in the trace of a failed query
+            if tracing:
+                self.index.set_trace(None)
+                if owned_trace:
+                    profiler.record(trace)
+        return ranking
 
-        while True:
-            # find the lowest doc_id among all the posting lists
-            # doing this avoids having to iterate over all the doc_ids
-            # we only take into account the doc_ids that are present in the posting lists
-            lowest_doc_id = None
-            empty_posting_lists = []
-            for i, posting in enumerate(posting_generators):
-                try:
-                    doc_id = posting.peek().doc_id
-                    if lowest_doc_id is None or doc_id < lowest_doc_id:
-                        lowest_doc_id = doc_id
-                except StopIteration:
-                    empty_posting_lists.append(i)
-            # all the posting lists are empty
-            if lowest_doc_id is None:
-                break
+    def _first_stage(self, query: str, trace: Optional[SearchTrace], mode: QueryMode, contents: dict[int, DocumentContents]) -> tuple[list[tuple[float, int]], list[Term], dict[int, list[Posting]]]:
+        """
+        Select the documents of a query and score them with the first scoring function.
 
-            # remove the empty posting lists
-            for i in reversed(empty_posting_lists):
-                posting_generators.pop(i)
-                term_ids.pop(i)
+        # Parameters
+        - query (str): The query to search for.
+        - trace (Optional[SearchTrace]): If set, the timers and counters of the query are recorded in it.
+        - mode (QueryMode): The query mode, see rank.
+        - contents (dict[int, DocumentContents]): The documents loaded by the scoring function are added to it.
 
-            postings = []
-            # get all the postings with the current doc_id, and advance their iterators
-            for i, posting in enumerate(posting_generators):
-                if posting.peek().doc_id == lowest_doc_id:
-                    next_posting = next(posting)
-                    postings.append(next_posting)
-            postings_cache[lowest_doc_id] = postings
-            # now that we have all the info about the current document, we can score it
-            global_info = self.index.get_global_info()
-            document_info = self.index.get_document_info(lowest_doc_id)
-            score = first_scoring_function(document_info, postings, terms, **global_info)
-            # we add the score and doc_id to the priority queue
-            popped_doc_id = priority_queue.push(lowest_doc_id, score)
-            # if the priority queue is full, we remove the lowest score
-            if popped_doc_id is not None:
-                del postings_cache[popped_doc_id]
+        # Returns
+        - tuple[list[tuple[float, int]], list[Term], dict[int, list[Posting]]]: The top k scores and doc_ids of the first stage,
+        in decreasing order of score, the terms of the query and the postings of each of the top k documents.
+        """
+        tracing = trace is not None
+        if tracing:
+            start_time = time.perf_counter()
+        k, first_scoring_function = self.scoring_functions[0]
+
+        query_terms = self.tokenizer.tokenize_query(query)
+        if tracing:
+            trace.add_time("tokenize", time.perf_counter() - start_time)
+            start_time = time.perf_counter()
+        # all the terms are looked up at once
+        found_terms = self.index.get_terms([term.text for term in query_terms])
+        all_terms_found = all(term is not None for term in found_terms)
+        terms = [term for term in found_terms if term is not None]
+        if self.query_rewriter is not None and mode != "phrase":
+            # every term of an "and" query is required, so it is only reweighted
+            terms = self.query_rewriter.rewrite(terms, len(self.index), trace, drop=mode != "and")
+        if mode != "phrase":
+            # the most selective terms first, a phrase must keep the order of the query
+            terms.sort(key=lambda term: term.info["document_frequency"])
+        term_ids = [term.id for term in terms]
+        if tracing:
+            trace.add_time("term_lookup", time.perf_counter() - start_time)
+            trace.count("terms", len(terms))
+            start_time = time.perf_counter()
+        if mode == "or":
+            posting_generators = [self.index.get_postings(term_id) for term_id in term_ids]
+            # fetch the first posting of each list
+            heap = [
+                (posting.doc_id, i, posting) for i, postings in enumerate(posting_generators)
+                if (posting := next(postings, None)) is not None]
+        elif mode == "impact":
+            # the cursors only fetch the postings of the documents selected on the impacts
+            posting_cursors = {
+                term.id: self.index.get_posting_cursor(term.id, term.info["posting_size"]) for term in terms
+            }
+        else:
+            # if a term is not in the index, no document contains all the terms
+            posting_cursors = {
+                term.id: self.index.get_posting_cursor(term.id, term.info["posting_size"]) for term in terms
+            } if all_terms_found else {}
+        if tracing:
+            trace.add_time("posting_fetch", time.perf_counter() - start_time)
+            merge_start_time = time.perf_counter()
+            document_info_time = 0.0
+            scoring_time = 0.0
+            documents_scored = 0
+            heap_evictions = 0
+
+        priority_queue = PriorityQueue(k)
+        postings_cache = {}
+        tombstones = self.index.get_tombstones()
+        if mode == "or":
+            candidates = self._disjunctive_candidates(heap, posting_generators, tombstones, trace)
+        elif mode == "impact":
+            candidates = self._impact_candidates(terms, posting_cursors, k, tombstones, trace)
+        else:
+            candidates = self._conjunctive_candidates(term_ids, posting_cursors, mode == "phrase", tombstones, trace)
+
+        if first_scoring_function.columnar_call is not None:
+            # the candidates are scored in blocks, with a single call for all the documents of a block
+            for block in iter(lambda: list(itertools.islice(candidates, self.scoring_block_size)), []):
+                if tracing:
+                    stage_start_time = time.perf_counter()
+                batch = self._scoring_batch(block, terms, first_scoring_function.needs_contents, contents, trace)
+                if tracing:
+                    document_info_time += time.perf_counter() - stage_start_time
+                    stage_start_time = time.perf_counter()
+                scores = first_scoring_function.columnar_call(batch, terms, **{**self.index.get_global_info(), "query_content": query}).tolist()
+                if tracing:
+                    scoring_time += time.perf_counter() - stage_start_time
+                    documents_scored += len(block)
+                for (doc_id, postings), score in zip(block, scores):
+                    postings_cache[doc_id] = postings
+                    popped_doc_id = priority_queue.push(doc_id, score)
+                    if popped_doc_id is not None:
+                        del postings_cache[popped_doc_id]
+                        if tracing and popped_doc_id != doc_id:
+                            heap_evictions += 1
+        else:
+            for doc_id, postings in candidates:
+                postings_cache[doc_id] = postings
+                # now that we have all the info about the current document, we can score it
+                global_info = self.index.get_global_info()
+                if tracing:
+                    stage_start_time = time.perf_counter()
+                    document_info = self.index.get_document_info(doc_id)
+                    document_info_time += time.perf_counter() - stage_start_time
+                    stage_start_time = time.perf_counter()
+                    score = first_scoring_function(document_info, postings, terms, **global_info)
+                    scoring_time += time.perf_counter() - stage_start_time
+                    documents_scored += 1
+                else:
+                    document_info = self.index.get_document_info(doc_id)
+                    score = first_scoring_function(document_info, postings, terms, **global_info)
+                # we add the score and doc_id to the priority queue
+                popped_doc_id = priority_queue.push(doc_id, score)
+                # if the priority queue is full, we remove the lowest score
+                if popped_doc_id is not None:
+                    del postings_cache[popped_doc_id]
+                    if tracing and popped_doc_id != doc_id:
+                        heap_evictions += 1
         
         priority_queue.finalise()
+        if tracing:
+            trace.add_time("merge", time.perf_counter() - merge_start_time - document_info_time - scoring_time)
+            trace.add_time("document_info", document_info_time)
+            trace.add_time("score", scoring_time)
+            trace.count("documents_scored", documents_scored)
+            trace.count("heap_evictions", heap_evictions)
+        return list(priority_queue), terms, postings_cache
+
+    def _rerank(self, query: str, terms: list[Term], ranking: list[tuple[float, int]], postings_cache: dict[int, list[Posting]], contents: dict[int, DocumentContents], trace: Optional[SearchTrace]) -> list[tuple[float, int]]:
+        """
+        Apply the scoring functions after the first one to the results of the first stage.
 
-        for scoring_function in scoring_functions[1:]:
-            ks.pop()
+        # Parameters
+        - query (str): The query to search for.
+        - terms (list[Term]): The terms of the query.
+        - ranking (list[tuple[float, int]]): The scores and doc_ids of the first stage, in decreasing order of score.
+        - postings_cache (dict[int, list[Posting]]): The postings of each document of the ranking.
+        - contents (dict[int, DocumentContents]): The documents already loaded for the query, the new ones are added to it.
+        - trace (Optional[SearchTrace]): If set, the timers and counters of the stages are recorded in it.
+
+        # Returns
+        - list[tuple[float, int]]: The scores and doc_ids of the results, in decreasing order of score.
+        """
+        tracing = trace is not None
+        for k, scoring_function in self.scoring_functions[1:]:
+            reranked_documents = ranking[:k]
+            if tracing:
+                start_time = time.perf_counter()
+            # the documents reranked by a stage are a subset of the ones of the previous stage, so they are loaded once
+            self._load_contents([doc_id for _, doc_id in reranked_documents], contents, trace)
+            if tracing:
+                content_fetch_time = time.perf_counter() - start_time
             resorted_documents = []
-            if scoring_function.batched_call is not None:
-                scores: list[float] = scoring_function.batched_call(
-                    [self.index.get_document_contents(doc_id).body for _, doc_id in priority_queue.heap[:ks[-1]]],
-                    query
-                )
-                for i, (score, doc_id) in enumerate(priority_queue.heap[:ks[-1]]):
+            if scoring_function.columnar_call is not None:
+                batch = self._scoring_batch(
+                    [(doc_id, postings_cache[doc_id]) for _, doc_id in reranked_documents], terms, scoring_function.needs_contents, contents, None)
+                scores = scoring_function.columnar_call(batch, terms, **{**self.index.get_global_info(), "query_content": query}).tolist()
+                for (score, doc_id), new_score in zip(reranked_documents, scores):
+                    resorted_documents.append((new_score + score, doc_id))
+            elif scoring_function.batched_call is not None:
+                document_contents = [contents[doc_id].body for _, doc_id in reranked_documents]
+                scores: list[float] = scoring_function.batched_call(document_contents, query)
+                for i, (score, doc_id) in enumerate(reranked_documents):
                     new_score = scores[i]
                     resorted_documents.append((new_score + score, doc_id))
             else:
-                for score, doc_id in priority_queue.heap[:ks[-1]]:
+                for score, doc_id in reranked_documents:
                     postings = postings_cache[doc_id]
                     global_info = self.index.get_global_info()
-                    global_info["document_content"] = self.index.get_document_contents(doc_id).body
+                    global_info["document_content"] = contents[doc_id].body
                     global_info["query_content"] = query
                     new_score = scoring_function(self.index.get_document_info(doc_id), postings, terms, **global_info)
                     # we add the old score to maintain monotonicity
                     resorted_documents.append((new_score + score, doc_id))
             
             resorted_documents.sort(key=lambda x: x[0], reverse=True)
-            priority_queue.heap = resorted_documents + priority_queue.heap[ks[-1]:]
+            ranking = resorted_documents + ranking[k:]
+            if tracing:
+                trace.add_time("content_fetch", content_fetch_time)
+                trace.add_time("rerank", time.perf_counter() - start_time - content_fetch_time)
+                trace.count("documents_reranked", len(resorted_documents))
+        return ranking
+
+    def _scoring_batch(self, block: list[tuple[int, list[Posting]]], terms: list[Term], needs_contents: bool, contents: dict[int, DocumentContents], trace: Optional[SearchTrace]) -> ScoringBatch:
+        """
+        Convert candidates to the columnar form of the scoring functions.
 
-        for score, doc_id in priority_queue:
-            ret = self.index.get_document_contents(doc_id)
-            ret.add_field("id", doc_id)
-            ret.set_score(score)
-            yield ret
+        # Parameters
+        - block (list[tuple[int, list[Posting]]]): The doc_ids and postings of the candidates.
+        - terms (list[Term]): The terms of the query, the columns of the term frequencies.
+        - needs_contents (bool): Whether to load the contents of the documents.
+        - contents (dict[int, DocumentContents]): The documents already loaded for the query, the new ones are added to it.
+        - trace (Optional[SearchTrace]): If set, the counters are recorded in it.
+
+        # Returns
+        - ScoringBatch: The batch.
+        """
+        doc_ids = [doc_id for doc_id, _ in block]
+        batch_contents = None
+        if needs_contents:
+            self._load_contents(doc_ids, contents, trace)
+            batch_contents = [contents[doc_id].body for doc_id in doc_ids]
+        return ScoringBatch.from_postings(
+            doc_ids, [document_info.lengths for document_info in self.index.get_documents_info(doc_ids)],
+            [postings for _, postings in block], terms, batch_contents)
+
+    def _disjunctive_candidates(self, heap: list[tuple[int, int, Posting]], posting_generators: list[Generator[Posting, None, None]], tombstones: Tombstones, trace: Optional[SearchTrace]) -> Generator[tuple[int, list[Posting]], None, None]:
+        """
+        Merge the posting lists, yielding every document that contains at least one of the terms.
+        The current posting of each list is kept in a min-heap by doc_id,
+        so finding the next document costs a logarithm of the number of lists instead of a scan of all of them.
+
+        # Parameters
+        - heap (list[tuple[int, int, Posting]]): The first posting of each non empty list, as (doc_id, list index, posting).
+        - posting_generators (list[Generator[Posting, None, None]]): The posting lists of the terms of the query.
+        - tombstones (Tombstones): The deleted documents, which are skipped.
+        - trace (Optional[SearchTrace]): If set, the counters are recorded in it.
+
+        # Yields
+        - tuple[int, list[Posting]]: The doc_id and the postings of the terms it contains, in increasing order of doc_id.
+        The postings are in the order of the terms in the query.
+        """
+        heapq.heapify(heap)
+        postings_scanned = 0
+        tombstones_skipped = 0
+        while len(heap) > 0:
+            lowest_doc_id = heap[0][0]
+            postings = []
+            # pop all the postings with the current doc_id and advance their lists,
+            # ties are broken by the list index so the postings come out in the order of the query
+            while len(heap) > 0 and heap[0][0] == lowest_doc_id:
+                i = heap[0][1]
+                postings.append(heap[0][2])
+                next_posting = next(posting_generators[i], None)
+                if next_posting is None:
+                    heapq.heappop(heap)
+                else:
+                    heapq.heapreplace(heap, (next_posting.doc_id, i, next_posting))
+            postings_scanned += len(postings)
+            # deleted documents are still in the posting lists until the index is compacted
+            if lowest_doc_id in tombstones:
+                tombstones_skipped += 1
+                continue
+            yield lowest_doc_id, postings
+        if trace is not None:
+            trace.count("postings_scanned", postings_scanned)
+            trace.count("tombstones_skipped", tombstones_skipped)
+
+    def _impact_candidates(self, terms: list[Term], posting_cursors: dict[int, PostingCursor], k: int, tombstones: Tombstones, trace: Optional[SearchTrace]) -> Generator[tuple[int, list[Posting]], None, None]:
+        """
+        Select the k documents with the highest sum of impacts, score-at-a-time.
+        The segments of all the impact ordered lists are added to an array of accumulators by decreasing impact,
+        so the largest contributions come first. Every time the impacts left to add halve,
+        the search stops if no document outside of the top k can reach the k-th one anymore,
+        or when the budget of the impact index is spent.
+
+        # Parameters
+        - terms (list[Term]): The terms of the query.
+        - posting_cursors (dict[int, PostingCursor]): A cursor on the posting list of each term_id.
+        - k (int): The number of documents to select.
+        - tombstones (Tombstones): The deleted documents, which are skipped.
+        - trace (Optional[SearchTrace]): If set, the counters are recorded in it.
+
+        # Yields
+        - tuple[int, list[Posting]]: The doc_id and the postings of the terms it contains, in increasing order of doc_id.
+        The postings are in the order of the terms in the query.
+        """
+        impact_index = self.impact_index
+        # the impacts and boundaries as lists, reading numpy scalars one at a time is slow
+        lists = [
+            (impacts.tolist(), boundaries.tolist(), doc_ids)
+            for impacts, boundaries, doc_ids in (segments for segments in impact_index.get_segments([term.term for term in terms]) if segments is not None)]
+        accumulators = np.zeros(impact_index.num_slots, dtype=np.int32)
+        deleted = np.fromiter((doc_id for doc_id in tombstones if doc_id < impact_index.num_slots), dtype=np.int64)
+        # the next segment of each list, as (-impact, list index, segment index)
+        heap = [(-impacts[0], i, 0) for i, (impacts, _, _) in enumerate(lists)]
+        heapq.heapify(heap)
+        # a document can still gain at most the impact of the next segment of each list
+        remaining = -sum(impact for impact, _, _ in heap)
+        next_check = remaining // 2
+        postings_scanned = 0
+        segments_scanned = 0
+        early_terminated = False
+        while len(heap) > 0:
+            if self.impact_budget is not None and postings_scanned >= self.impact_budget:
+                early_terminated = True
+                break
+            negative_impact, i, segment = heapq.heappop(heap)
+            impacts, boundaries, doc_ids = lists[i]
+            segment_doc_ids = doc_ids[boundaries[segment]:boundaries[segment + 1]]
+            # the doc_ids of a segment are distinct, so the fancy indexing adds the impact once to each of them
+            accumulators[segment_doc_ids] -= negative_impact
+            postings_scanned += len(segment_doc_ids)
+            segments_scanned += 1
+            remaining += negative_impact
+            if segment + 1 < len(impacts):
+                heapq.heappush(heap, (-impacts[segment + 1], i, segment + 1))
+                remaining += impacts[segment + 1]
+            if len(heap) > 0 and remaining <= next_check:
+                next_check = remaining // 2
+                accumulators[deleted] = 0
+                if k < len(accumulators):
+                    # the k + 1 largest accumulators, the first one is the best outside of the top k
+                    top = np.partition(accumulators, len(accumulators) - k - 1)[len(accumulators) - k - 1:]
+                    if top[1:].min() > top[0] + remaining:
+                        early_terminated = True
+                        break
+        accumulators[deleted] = 0
+        selected = np.flatnonzero(accumulators)
+        if len(selected) > k:
+            selected = selected[np.argpartition(accumulators[selected], len(selected) - k)[len(selected) - k:]]
+        if trace is not None:
+            trace.count("postings_scanned", postings_scanned)
+            trace.count("impact_segments", segments_scanned)
+            trace.count("early_terminations", int(early_terminated))
+        for doc_id in np.sort(selected).tolist():
+            postings = []
+            for term in terms:
+                posting = posting_cursors[term.id].next_geq(doc_id)
+                if posting is not None and posting.doc_id == doc_id:
+                    postings.append(posting)
+            # the impact index may be older than the index
+            if len(postings) > 0 and doc_id not in tombstones:
+                yield doc_id, postings
+
+    def _conjunctive_candidates(self, term_ids: list[int], posting_cursors: dict[int, PostingCursor], phrase: bool, tombstones: Tombstones, trace: Optional[SearchTrace]) -> Generator[tuple[int, list[Posting]], None, None]:
+        """
+        Intersect the posting lists, yielding every document that contains all the terms.
+        The cheapest list leads the intersection and the other cursors seek to its doc_id,
+        when a cursor skips past it the lead seeks to the doc_id of that cursor, so most postings are never read.
+
+        # Parameters
+        - term_ids (list[int]): The term_ids of the query, in the order of the query.
+        - posting_cursors (dict[int, PostingCursor]): A cursor on the posting list of each term_id.
+        - phrase (bool): Whether the terms must also appear one after the other in the same field.
+        - tombstones (Tombstones): The deleted documents, which are skipped.
+        - trace (Optional[SearchTrace]): If set, the counters are recorded in it.
+
+        # Yields
+        - tuple[int, list[Posting]]: The doc_id and a posting for each term of the query, in increasing order of doc_id.
+        """
+        if len(posting_cursors) == 0:
+            return
+        lead, *others = sorted(posting_cursors.values(), key=lambda cursor: cursor.cost)
+        postings_scanned = 0
+        tombstones_skipped = 0
+        phrases_rejected = 0
+        doc_id = lead.doc_id
+        while doc_id is not None:
+            postings_scanned += 1
+            for cursor in others:
+                cursor.next_geq(doc_id)
+                if cursor.doc_id is None:
+                    # a list is exhausted, no other document can contain all the terms
+                    doc_id = None
+                    break
+                postings_scanned += 1
+                if cursor.doc_id != doc_id:
+                    lead.next_geq(cursor.doc_id)
+                    doc_id = lead.doc_id
+                    break
+            else:
+                # deleted documents are still in the posting lists until the index is compacted
+                if doc_id in tombstones:
+                    tombstones_skipped += 1
+                elif phrase and not phrase_matches([posting_cursors[term_id].posting.get_positions() for term_id in term_ids]):
+                    phrases_rejected += 1
+                else:
+                    yield doc_id, [posting_cursors[term_id].posting for term_id in term_ids]
+                lead.next()
+                doc_id = lead.doc_id
+        if trace is not None:
+            trace.count("postings_scanned", postings_scanned)
+            trace.count("tombstones_skipped", tombstones_skipped)
+            if phrase:
+                trace.count("phrases_rejected", phrases_rejected)
 
     def get_run(self, queries: pd.DataFrame, verbose: bool = False, pyterrier_compatible: bool = False) -> pd.DataFrame:
         """
@@ -184,10 +726,10 @@ class Ir:
             for rank, doc in enumerate(self.search(query), start=0):
                 if pyterrier_compatible:
                     run.append(
-                        {"qid": query_id, "docid": doc.id, "docno": doc.id, "rank": rank, "score": doc.score, "query": query})
+                        {"qid": query_id, "docid": doc.id, "docno": doc.external_id, "rank": rank, "score": doc.score, "query": query})
                 else:
                     run.append(
-                        {"query_id": query_id, "Q0": "Q0", "doc_id": doc.id, "rank": rank, "score": doc.score, "run_id": self.__class__.__name__})
+                        {"query_id": query_id, "Q0": "Q0", "doc_id": doc.external_id, "rank": rank, "score": doc.score, "run_id": self.__class__.__name__})
 
         run = pd.DataFrame(run)
         return run
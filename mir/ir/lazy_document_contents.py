@@ -0,0 +1,31 @@
+from collections.abc import Callable
+from typing import Any
+
+from mir.ir.document_contents import DocumentContents
+
+
+class LazyDocumentContents(DocumentContents):
+    def __init__(self, id: int, load: Callable[[], dict[int, DocumentContents]], **kwargs):
+        """
+        The contents of a search result, loaded only when author, title or body are accessed.
+        All the results of a query share the same load function, so the first access loads all of them at once.
+
+        # Parameters
+        - id (int): The doc_id of the document.
+        - load (Callable[[], dict[int, DocumentContents]]): A function returning the contents of the results, by doc_id.
+        - kwargs: Other fields of the result, like the score.
+        """
+        self.__dict__.update(kwargs)
+        self.id = id
+        self._load = load
+
+    def __getattr__(self, name: str) -> Any:
+        # only called for the attributes that are not set yet
+        if name in ("author", "title", "body") and "_load" in self.__dict__:
+            contents = self._load()[self.id]
+            self.author = contents.author
+            self.title = contents.title
+            self.body = contents.body
+            del self._load
+            return self.__dict__[name]
+        raise AttributeError(f"{self.__class__.__name__!r} object has no attribute {name!r}")
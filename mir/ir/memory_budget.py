@@ -0,0 +1,107 @@
+from typing import Any
+
+import psutil
+
+# rough sizes in bytes of the python objects of the structures kept in memory, used to decide what fits in a budget
+POSTING_BYTES = 330
+TERM_BYTES = 300
+DOCUMENT_LENGTHS_BYTES = 12
+
+
+class MemoryBudget:
+    def __init__(self, total: int, connections: int = 1, posting_cache_fraction: float = 0.5, document_cache_fraction: float = 0.1):
+        """
+        A limit on the memory used by an index, shared between the structures kept resident and its caches.
+
+        # Parameters
+        - total (int): The budget in bytes.
+        - connections (int): The number of connections to the database that keep a page cache,
+        like the threads of a pool that share a read-only SqliteIndex.
+        - posting_cache_fraction (float): The fraction of the memory left by the resident structures
+        used to cache the posting lists of the most used terms.
+        - document_cache_fraction (float): The fraction of the memory left by the resident structures
+        used to cache the decompressed blocks of the DocumentStore.
+        """
+        assert total > 0, "The budget must be positive"
+        assert connections > 0, "At least one connection is needed"
+        assert posting_cache_fraction >= 0 and document_cache_fraction >= 0, "The fractions can't be negative"
+        assert posting_cache_fraction + document_cache_fraction <= 1, "The fractions can't add up to more than 1"
+        self.total = total
+        self.connections = connections
+        self.posting_cache_fraction = posting_cache_fraction
+        self.document_cache_fraction = document_cache_fraction
+
+    def split(self, parts: int) -> "MemoryBudget":
+        """
+        Get the budget of one of many indexes that share this budget, like the shards of a ShardedIndex.
+
+        # Parameters
+        - parts (int): The number of indexes.
+
+        # Returns
+        - MemoryBudget: The budget of each index.
+        """
+        return MemoryBudget(self.total // parts, self.connections, self.posting_cache_fraction, self.document_cache_fraction)
+
+    def allocate(self, resident: dict[str, int], posting_cache: bool = True, document_cache: bool = True) -> dict[str, Any]:
+        """
+        Decide which structures stay in memory and the size of the caches.
+        The structures are considered in the order of resident and each one is kept if it fits in what is left of the budget,
+        the others are read from the database when needed.
+        The memory that is left goes to the posting cache, to the document cache and to the page cache of the connections.
+        Nothing is mapped in memory: mapped pages count towards the memory of the process but aren't limited by any cache.
+
+        # Parameters
+        - resident (dict[str, int]): The estimated size in bytes of each structure that can be kept in memory, by name.
+        - posting_cache (bool): Whether the index can cache posting lists, its share goes to the page cache otherwise.
+        - document_cache (bool): Whether the index has a DocumentStore, its share goes to the page cache otherwise.
+
+        # Returns
+        - dict[str, Any]: The "resident" structures with their size, the names of the "paged" ones,
+        the bytes of the "posting_cache" and the "document_cache", the bytes of the "page_cache" of each connection
+        and the "mmap" size, always 0.
+        """
+        left = self.total
+        kept = {}
+        paged = []
+        for name, size in resident.items():
+            if size <= left:
+                kept[name] = size
+                left -= size
+            else:
+                paged.append(name)
+        posting_cache_size = int(left * self.posting_cache_fraction) if posting_cache else 0
+        document_cache_size = int(left * self.document_cache_fraction) if document_cache else 0
+        return {
+            "resident": kept,
+            "paged": paged,
+            "posting_cache": posting_cache_size,
+            "document_cache": document_cache_size,
+            "page_cache": (left - posting_cache_size - document_cache_size) // self.connections,
+            "mmap": 0,
+        }
+
+    def config(self) -> dict[str, Any]:
+        """
+        Get the parameters of the budget.
+
+        # Returns
+        - dict[str, Any]: The parameters, by name.
+        """
+        return {
+            "total": self.total,
+            "connections": self.connections,
+            "posting_cache_fraction": self.posting_cache_fraction,
+            "document_cache_fraction": self.document_cache_fraction,
+        }
+
+
+def process_memory_usage() -> dict[str, int]:
+    """
+    Get the memory actually used by the current process.
+
+    # Returns
+    - dict[str, int]: The resident set size "rss" and the virtual memory size "vms", in bytes.
+    """
+    memory_info = psutil.Process().memory_info()
+    return {"rss": memory_info.rss, "vms": memory_info.vms}
@@ -0,0 +1,105 @@
+from bisect import bisect_left
+
+POSITION_FIELDS = ("author", "title", "body")
+
+
+def encode_positions(positions: dict[str, list[int]]) -> bytes:
+    """
+    Compress the positions of a term in a document.
+    The positions of each field are delta encoded and written as varints, one field after the other.
+    The number of positions of each field is not stored, it's the number of occurrences of the posting.
+
+    # Parameters
+    - positions (dict[str, list[int]]): The sorted positions of the term in each field.
+
+    # Returns
+    - bytes: The compressed positions.
+    """
+    ret = bytearray()
+    for field in POSITION_FIELDS:
+        previous = 0
+        for position in positions.get(field, ()):
+            delta = position - previous
+            previous = position
+            while delta >= 0x80:
+                ret.append((delta & 0x7f) | 0x80)
+                delta >>= 7
+            ret.append(delta)
+    return bytes(ret)
+
+
+def decode_positions(data: bytes, occurrences: dict[str, int]) -> dict[str, list[int]]:
+    """
+    Decompress the positions encoded with encode_positions.
+
+    # Parameters
+    - data (bytes): The compressed positions.
+    - occurrences (dict[str, int]): The number of positions of each field.
+
+    # Returns
+    - dict[str, list[int]]: The positions of the term in each field.
+    """
+    ret = {}
+    i = 0
+    for field in POSITION_FIELDS:
+        positions = []
+        previous = 0
+        for _ in range(occurrences.get(field, 0)):
+            delta = 0
+            shift = 0
+            while True:
+                byte = data[i]
+                i += 1
+                delta |= (byte & 0x7f) << shift
+                shift += 7
+                if byte < 0x80:
+                    break
+            previous += delta
+            positions.append(previous)
+        ret[field] = positions
+    return ret
+
+
+def gallop(values: list[int], target: int, low: int = 0) -> int:
+    """
+    Find the index of the first value not lower than target, starting from low.
+    The step is doubled until the target is passed and then the last step is searched with a binary search,
+    so the cost is logarithmic in the distance from low instead of the length of the list.
+
+    # Parameters
+    - values (list[int]): The sorted values.
+    - target (int): The value to look for.
+    - low (int): The index where the search starts.
+
+    # Returns
+    - int: The index of the first value >= target, len(values) if there is none.
+    """
+    if low >= len(values) or values[low] >= target:
+        return low
+    step = 1
+    while low + step < len(values) and values[low + step] < target:
+        low += step
+        step *= 2
+    return bisect_left(values, target, low + 1, min(low + step, len(values)))
+
+
+def phrase_matches(positions: list[dict[str, list[int]]]) -> bool:
+    """
+    Check if the terms appear one after the other in the same field.
+
+    # Parameters
+    - positions (list[dict[str, list[int]]]): The positions of each term of the phrase, in the order of the phrase.
+
+    # Returns
+    - bool: True if there is at least one field where the phrase appears.
+    """
+    for field in POSITION_FIELDS:
+        starts = positions[0][field]
+        for offset, term_positions in enumerate(positions[1:], start=1):
+            if len(starts) == 0:
+                break
+            following = set(term_positions[field])
+            starts = [start for start in starts if start + offset in following]
+        if len(starts) > 0:
+            return True
+    return False
@@ -1,10 +1,25 @@
 from typing import Optional
 
+from mir.ir.positions import decode_positions
+
 class Posting:
-    def __init__(self, doc_id: int, term_id: int, occurrences: Optional[dict[str, int]] = None):
+    def __init__(self, doc_id: int, term_id: int, occurrences: Optional[dict[str, int]] = None, positions: Optional[bytes] = None):
         self.term_id = term_id
         self.doc_id = doc_id
         self.occurrences = occurrences if occurrences is not None else {"author": 0, "title": 0, "body": 0}
+        # compressed with encode_positions, None if the index does not store positions
+        self.positions = positions
+
+    def get_positions(self) -> dict[str, list[int]]:
+        """
+        Get the positions of the term in each field of the document.
+
+        # Returns
+        - dict[str, list[int]]: The positions of the term in each field.
+        """
+        if self.positions is None:
+            raise ValueError("The index does not store positions")
+        return decode_positions(self.positions, self.occurrences)
 
     def __repr__(self) -> str:
         return f"Posting(doc_id={self.doc_id}, term_id={self.term_id}, occurrences={self.occurrences})"
@@ -0,0 +1,78 @@
+from array import array
+from itertools import accumulate
+import struct
+import sys
+import zlib
+
+from mir.ir.posting import Posting
+
+POSTING_BLOCK_HEADER = struct.Struct("<IB")
+
+
+def _little_endian(values: array) -> array:
+    if sys.byteorder == "big":
+        values.byteswap()
+    return values
+
+
+def encode_posting_block(postings: list[Posting]) -> bytes:
+    """
+    Compress consecutive postings of a term.
+    The doc_ids are delta encoded, and the doc_ids, the occurrences of each field and the sizes of the positions
+    are stored as arrays of 32 bit integers, one array after the other, followed by the positions.
+    The whole block is compressed with zlib, which packs the small integers of the arrays.
+
+    # Parameters
+    - postings (list[Posting]): The postings of the block, sorted by doc_id.
+    Either all of them or none of them have positions.
+
+    # Returns
+    - bytes: The compressed block.
+    """
+    has_positions = len(postings) > 0 and postings[0].positions is not None
+    previous = 0
+    deltas = array("I")
+    for posting in postings:
+        deltas.append(posting.doc_id - previous)
+        previous = posting.doc_id
+    data = bytearray(POSTING_BLOCK_HEADER.pack(len(postings), has_positions))
+    data += _little_endian(deltas).tobytes()
+    for field in ("author", "title", "body"):
+        data += _little_endian(array("I", (posting.occurrences[field] for posting in postings))).tobytes()
+    if has_positions:
+        data += _little_endian(array("I", (len(posting.positions) for posting in postings))).tobytes()
+        for posting in postings:
+            data += posting.positions
+    return zlib.compress(bytes(data))
+
+
+def decode_posting_block(data: bytes, term_id: int) -> list[Posting]:
+    """
+    Decompress a block encoded with encode_posting_block.
+
+    # Parameters
+    - data (bytes): The compressed block.
+    - term_id (int): The term_id of the postings.
+
+    # Returns
+    - list[Posting]: The postings of the block, sorted by doc_id.
+    """
+    data = zlib.decompress(data)
+    count, has_positions = POSTING_BLOCK_HEADER.unpack_from(data)
+    offset = POSTING_BLOCK_HEADER.size
+    columns = []
+    for _ in range(5 if has_positions else 4):
+        column = array("I")
+        column.frombytes(data[offset:offset + 4 * count])
+        columns.append(_little_endian(column))
+        offset += 4 * count
+    doc_ids = accumulate(columns[0])
+    if not has_positions:
+        return [
+            Posting(doc_id, term_id, {"author": author, "title": title, "body": body})
+            for doc_id, author, title, body in zip(doc_ids, columns[1], columns[2], columns[3])]
+    ret = []
+    for doc_id, author, title, body, size in zip(doc_ids, *columns[1:]):
+        ret.append(Posting(doc_id, term_id, {"author": author, "title": title, "body": body}, data[offset:offset + size]))
+        offset += size
+    return ret
@@ -0,0 +1,102 @@
+from collections import OrderedDict
+import threading
+from typing import Any, Optional, Sized
+
+from mir.ir.posting import Posting
+
+
+class PostingListCache(Sized):
+    def __init__(self, capacity: int, max_entry_fraction: float = 0.25):
+        """
+        A least recently used cache of whole posting lists, limited by their estimated size in bytes.
+
+        # Parameters
+        - capacity (int): The maximum number of bytes of the cached posting lists.
+        - max_entry_fraction (float): The largest fraction of the capacity a single posting list can use,
+        longer lists are never cached so that a single query can't evict all the others.
+        """
+        assert capacity >= 0, "The capacity can't be negative"
+        assert 0 < max_entry_fraction <= 1, "max_entry_fraction must be in (0, 1]"
+        self.capacity = capacity
+        self.max_entry_fraction = max_entry_fraction
+        # the doc_ids, the postings and the size of the posting list of each term_id
+        self.entries: OrderedDict[int, tuple[list[int], list[Posting], int]] = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def admits(self, size: int) -> bool:
+        """
+        Check whether a posting list can be cached.
+
+        # Parameters
+        - size (int): The estimated size of the posting list in bytes.
+
+        # Returns
+        - bool: Whether the list is small enough.
+        """
+        return size <= self.capacity * self.max_entry_fraction
+
+    def get(self, term_id: int) -> Optional[tuple[list[int], list[Posting]]]:
+        """
+        Get the posting list of a term and mark it as recently used.
+
+        # Parameters
+        - term_id (int): The term_id.
+
+        # Returns
+        - Optional[tuple[list[int], list[Posting]]]: The doc_ids and the postings, None if the list is not in the cache.
+        """
+        with self.lock:
+            entry = self.entries.get(term_id)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.entries.move_to_end(term_id)
+            return entry[0], entry[1]
+
+    def put(self, term_id: int, doc_ids: list[int], postings: list[Posting], size: int) -> None:
+        """
+        Add the posting list of a term, evicting the least recently used ones until it fits.
+
+        # Parameters
+        - term_id (int): The term_id.
+        - doc_ids (list[int]): The sorted doc_ids of the postings.
+        - postings (list[Posting]): The postings, in the same order as doc_ids.
+        - size (int): The estimated size of the posting list in bytes.
+        """
+        if not self.admits(size):
+            return
+        with self.lock:
+            previous = self.entries.pop(term_id, None)
+            if previous is not None:
+                self.size -= previous[2]
+            self.entries[term_id] = (doc_ids, postings, size)
+            self.size += size
+            while self.size > self.capacity:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.size -= evicted_size
+
+    def clear(self) -> None:
+        """
+        Remove all the posting lists.
+        """
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+    def info(self) -> dict[str, Any]:
+        """
+        Get the usage of the cache.
+
+        # Returns
+        - dict[str, Any]: The number of cached posting lists "entries", their estimated "bytes", the "capacity",
+        and the "hits" and "misses" of get.
+        """
+        with self.lock:
+            return {"entries": len(self.entries), "bytes": self.size, "capacity": self.capacity, "hits": self.hits, "misses": self.misses}
+
+    def __len__(self) -> int:
+        return len(self.entries)
@@ -0,0 +1,152 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from collections.abc import Callable, Generator
+from typing import Optional
+
+from mir.ir.positions import gallop
+from mir.ir.posting import Posting
+
+
+class PostingCursor(ABC):
+    def __init__(self, cost: int, max_score: Optional[float] = None):
+        """
+        A cursor over a posting list sorted by doc_id, that can seek forward.
+        After creation the cursor is on the first posting of the list.
+
+        # Parameters
+        - cost (int): An estimate of the number of postings in the list, used to choose the order of the lists.
+        - max_score (Optional[float]): An upper bound of the score of any posting of the list, None if unknown.
+        """
+        self.cost = cost
+        self.max_score = max_score
+        self.posting: Optional[Posting] = None
+
+    @property
+    def doc_id(self) -> Optional[int]:
+        """
+        The doc_id of the current posting, None if the cursor is exhausted.
+        """
+        return self.posting.doc_id if self.posting is not None else None
+
+    @abstractmethod
+    def next(self) -> Optional[Posting]:
+        """
+        Move to the next posting.
+
+        # Returns
+        - Optional[Posting]: The new current posting, None if the cursor is exhausted.
+        """
+
+    def next_geq(self, doc_id: int) -> Optional[Posting]:
+        """
+        Move to the first posting with a doc_id greater than or equal to doc_id.
+        The cursor never moves backwards, if the current posting already satisfies the condition it stays there.
+
+        # Parameters
+        - doc_id (int): The doc_id to look for.
+
+        # Returns
+        - Optional[Posting]: The new current posting, None if the cursor is exhausted.
+        """
+        while self.posting is not None and self.posting.doc_id < doc_id:
+            self.next()
+        return self.posting
+
+
+class GeneratorPostingCursor(PostingCursor):
+    def __init__(self, postings: Generator[Posting, None, None], cost: int, max_score: Optional[float] = None):
+        """
+        A cursor over a generator of postings, seeking reads all the postings in between.
+
+        # Parameters
+        - postings (Generator[Posting, None, None]): The postings, sorted by doc_id.
+        - cost (int): An estimate of the number of postings.
+        - max_score (Optional[float]): An upper bound of the score of any posting of the list, None if unknown.
+        """
+        super().__init__(cost, max_score)
+        self.postings = postings
+        self.next()
+
+    def next(self) -> Optional[Posting]:
+        self.posting = next(self.postings, None)
+        return self.posting
+
+
+class ListPostingCursor(PostingCursor):
+    def __init__(self, doc_ids: list[int], postings: list[Posting], max_score: Optional[float] = None):
+        """
+        A cursor over a posting list in memory, seeking uses galloping search on the doc_ids.
+
+        # Parameters
+        - doc_ids (list[int]): The sorted doc_ids of the postings.
+        - postings (list[Posting]): The postings, in the same order as doc_ids.
+        - max_score (Optional[float]): An upper bound of the score of any posting of the list, None if unknown.
+        """
+        super().__init__(len(postings), max_score)
+        self.doc_ids = doc_ids
+        self.postings = postings
+        self.position = 0
+        self.posting = postings[0] if len(postings) > 0 else None
+
+    def next(self) -> Optional[Posting]:
+        if self.posting is not None:
+            self.position += 1
+            self.posting = self.postings[self.position] if self.position < len(self.postings) else None
+        return self.posting
+
+    def next_geq(self, doc_id: int) -> Optional[Posting]:
+        if self.posting is not None and self.posting.doc_id < doc_id:
+            self.position = gallop(self.doc_ids, doc_id, self.position)
+            self.posting = self.postings[self.position] if self.position < len(self.postings) else None
+        return self.posting
+
+
+class BlockPostingCursor(PostingCursor):
+    def __init__(self, fetch_block: Callable[[int, int], list[Posting]], cost: int, block_size: int = 256, max_score: Optional[float] = None):
+        """
+        A cursor that reads the posting list in blocks of consecutive postings.
+        Seeking inside the current block uses a binary search,
+        seeking past its end fetches a new block starting from the target doc_id, skipping all the postings in between.
+
+        # Parameters
+        - fetch_block (Callable[[int, int], list[Posting]]): A function returning at most the given number of postings
+        with a doc_id greater than or equal to the given one, sorted by doc_id.
+        - cost (int): An estimate of the number of postings.
+        - block_size (int): The number of postings fetched at once.
+        - max_score (Optional[float]): An upper bound of the score of any posting of the list, None if unknown.
+        """
+        super().__init__(cost, max_score)
+        self.fetch_block = fetch_block
+        self.block_size = block_size
+        self._load(0)
+
+    def _load(self, doc_id: int) -> None:
+        self.block: list[Posting] = self.fetch_block(doc_id, self.block_size)
+        self.block_doc_ids = [posting.doc_id for posting in self.block]
+        self.position = 0
+        self.posting = self.block[0] if len(self.block) > 0 else None
+
+    def next(self) -> Optional[Posting]:
+        if self.posting is None:
+            return None
+        self.position += 1
+        if self.position < len(self.block):
+            self.posting = self.block[self.position]
+        elif len(self.block) < self.block_size:
+            # the last block was shorter than requested, so the list is over
+            self.posting = None
+        else:
+            self._load(self.block_doc_ids[-1] + 1)
+        return self.posting
+
+    def next_geq(self, doc_id: int) -> Optional[Posting]:
+        if self.posting is None or self.posting.doc_id >= doc_id:
+            return self.posting
+        if doc_id <= self.block_doc_ids[-1]:
+            self.position = bisect_left(self.block_doc_ids, doc_id, self.position)
+            self.posting = self.block[self.position]
+        elif len(self.block) < self.block_size:
+            self.posting = None
+        else:
+            self._load(doc_id)
+        return self.posting
@@ -0,0 +1,80 @@
+from typing import Any, Optional
+
+from mir.ir.search_trace import SearchTrace
+from mir.ir.term import Term
+
+
+class QueryRewriter:
+    def __init__(self, max_document_fraction: Optional[float] = None, common_term_weight: float = 0.0, max_terms: Optional[int] = None):
+        """
+        Rewrite the terms of a query before the posting lists are opened.
+        Repeated terms are merged into a single term with a weight, the query_weight in the info of the Term,
+        which the scoring functions multiply with the contribution of the term.
+
+        # Parameters
+        - max_document_fraction (Optional[float]): The terms in more than this fraction of the documents are common,
+        their weight is multiplied by common_term_weight. If None no term is common.
+        - common_term_weight (float): The factor of the weight of the common terms, with 0 they are dropped.
+        If all the terms of a query are common they are all kept with their weight, the query would be empty otherwise.
+        - max_terms (Optional[int]): Keep only this many terms, the ones with the highest idf (the lowest document frequency).
+        If None all the terms are kept.
+        """
+        assert max_document_fraction is None or 0 < max_document_fraction <= 1, "max_document_fraction must be in (0, 1]"
+        assert common_term_weight >= 0, "common_term_weight can't be negative"
+        assert max_terms is None or max_terms > 0, "max_terms must be positive"
+        self.max_document_fraction = max_document_fraction
+        self.common_term_weight = common_term_weight
+        self.max_terms = max_terms
+
+    def config(self) -> dict[str, Any]:
+        """
+        Get the parameters of the rewriter.
+
+        # Returns
+        - dict[str, Any]: The parameters, by name.
+        """
+        return {
+            "max_document_fraction": self.max_document_fraction,
+            "common_term_weight": self.common_term_weight,
+            "max_terms": self.max_terms,
+        }
+
+    def rewrite(self, terms: list[Term], num_docs: int, trace: Optional[SearchTrace] = None, drop: bool = True) -> list[Term]:
+        """
+        Rewrite the terms of a query.
+
+        # Parameters
+        - terms (list[Term]): The terms of the query found in the index, in the order of the query, with their document_frequency.
+        - num_docs (int): The number of documents of the index.
+        - trace (Optional[SearchTrace]): If set, the configuration and the weights of the terms are added to its info
+        as query_rewriter, and the dropped terms are counted as terms_dropped.
+        - drop (bool): Whether terms can be dropped. If False, like for the queries that need every term,
+        the terms are only reweighted, a common term can be kept with a weight of 0 and max_terms is ignored.
+
+        # Returns
+        - list[Term]: New terms, each term once with its query_weight, in the order of their first occurrence.
+        """
+        weights: dict[int, float] = {}
+        unique_terms: dict[int, Term] = {}
+        for term in terms:
+            weights[term.id] = weights.get(term.id, 0) + term.info.get("query_weight", 1)
+            unique_terms.setdefault(term.id, term)
+
+        if self.max_document_fraction is not None:
+            max_document_frequency = self.max_document_fraction * num_docs
+            common = [term_id for term_id, term in unique_terms.items() if term.info["document_frequency"] > max_document_frequency]
+            if len(common) < len(unique_terms):
+                for term_id in common:
+                    weights[term_id] *= self.common_term_weight
+
+        kept = [term for term in unique_terms.values() if weights[term.id] > 0 or not drop]
+        if drop and self.max_terms is not None and len(kept) > self.max_terms:
+            # the sort is stable, so the terms with the same document frequency are kept in the order of the query
+            rarest = set(term.id for term in sorted(kept, key=lambda term: term.info["document_frequency"])[:self.max_terms])
+            kept = [term for term in kept if term.id in rarest]
+
+        ret = [Term(term.term, term.id, **{**term.info, "query_weight": weights[term.id]}) for term in kept]
+        if trace is not None:
+            trace.info["query_rewriter"] = {**self.config(), "weights": {term.term: term.info["query_weight"] for term in ret}}
+            trace.count("terms_dropped", len(unique_terms) - len(ret))
+        return ret
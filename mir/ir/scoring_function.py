@@ -1,12 +1,75 @@
 from typing import Any, Callable, Optional, Protocol
 
+import numpy as np
+
 from mir.ir.document_info import DocumentInfo
 from mir.ir.posting import Posting
 from mir.ir.term import Term
 
 
+class ScoringBatch:
+    def __init__(self, doc_ids: np.ndarray, tf: np.ndarray, lengths: np.ndarray, contents: Optional[list[str]] = None):
+        """
+        Many documents to score for a query, in columnar form.
+
+        # Parameters
+        - doc_ids (np.ndarray): The doc_ids of the documents.
+        - tf (np.ndarray): The occurrences of the query terms in the documents, of shape (documents, terms, 3),
+        with the terms in the order of the query and the fields in the order of DocumentInfo.lengths (author, title, body).
+        - lengths (np.ndarray): The field lengths of the documents, of shape (documents, 3).
+        - contents (Optional[list[str]]): The bodies of the documents, only for the scoring functions with needs_contents.
+        """
+        self.doc_ids = doc_ids
+        self.tf = tf
+        self.lengths = lengths
+        self.contents = contents
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+    @staticmethod
+    def from_postings(doc_ids: list[int], lengths: list[list[int]], postings: list[list[Posting]], query: list[Term], contents: Optional[list[str]] = None) -> "ScoringBatch":
+        """
+        Build a batch from the postings of the documents.
+
+        # Parameters
+        - doc_ids (list[int]): The doc_ids of the documents.
+        - lengths (list[list[int]]): The field lengths of each document.
+        - postings (list[list[Posting]]): The postings of each document for the terms of the query.
+        - query (list[Term]): The query terms, the columns of the term frequencies.
+        - contents (Optional[list[str]]): The bodies of the documents.
+
+        # Returns
+        - ScoringBatch: The batch.
+        """
+        columns: dict[int, list[int]] = {}
+        for column, term in enumerate(query):
+            columns.setdefault(term.id, []).append(column)
+        rows = []
+        term_columns = []
+        occurrences = []
+        for row, document_postings in enumerate(postings):
+            for posting in document_postings:
+                # a term repeated in the query has a column for each occurrence
+                for column in columns.get(posting.term_id, ()):
+                    rows.append(row)
+                    term_columns.append(column)
+                    occurrences.append(posting.occurrences)
+        tf = np.zeros((len(doc_ids), len(query), 3))
+        for field_index, field in enumerate(("author", "title", "body")):
+            tf[rows, term_columns, field_index] = [posting_occurrences.get(field, 0) for posting_occurrences in occurrences]
+        return ScoringBatch(
+            np.array(doc_ids, dtype=np.int64), tf, np.array(lengths, dtype=np.float64).reshape(len(doc_ids), 3), contents)
+
+
 class ScoringFunction(Protocol):
-    batched_call: Optional[Callable[["ScoringFunction",list[str],str], list[float]]] = None
+    # scores a list of document contents for a query, or for one query per document if a list of queries is given
+    batched_call: Optional[Callable[["ScoringFunction",list[str],str|list[str]], list[float]]] = None
+    # scores a ScoringBatch for the query terms, with the same keyword arguments as __call__
+    # and the text of the query as query_content, returning an array with the score of each document
+    columnar_call: Optional[Callable[..., np.ndarray]] = None
+    # whether columnar_call needs the contents of the documents
+    needs_contents: bool = False
     def __call__(self, document_info: DocumentInfo, postings: list[Posting], query: list[Term], **kwargs: dict[str, Any]) -> float:
         """
         Score a document based on the postings and the query.
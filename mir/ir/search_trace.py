@@ -0,0 +1,164 @@
+from contextlib import contextmanager
+import math
+import threading
+import time
+from typing import Any, Generator, Optional
+
+
+class SearchTrace:
+    def __init__(self, query: str):
+        """
+        Timers and counters of the stages of a single query.
+
+        # Parameters
+        - query (str): The query being traced.
+        """
+        self.query = query
+        self.timings: dict[str, float] = {}
+        self.counters: dict[str, int] = {}
+        self.info: dict[str, Any] = {}
+
+    @contextmanager
+    def stage(self, name: str) -> Generator[None, None, None]:
+        """
+        Time a stage, the time is added to the one of previous stages with the same name.
+
+        # Parameters
+        - name (str): The name of the stage.
+        """
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start_time)
+
+    def add_time(self, name: str, seconds: float):
+        """
+        Add time to a stage.
+
+        # Parameters
+        - name (str): The name of the stage.
+        - seconds (float): The time to add.
+        """
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def count(self, name: str, n: int = 1):
+        """
+        Increment a counter.
+
+        # Parameters
+        - name (str): The name of the counter.
+        - n (int): The increment.
+        """
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def total_time(self) -> float:
+        """
+        Get the time spent in all the stages.
+
+        # Returns
+        - float: The time in seconds.
+        """
+        return sum(self.timings.values())
+
+    def __repr__(self) -> str:
+        timings = ", ".join(f"{name}={seconds * 1000:.3f}ms" for name, seconds in self.timings.items())
+        counters = ", ".join(f"{name}={value}" for name, value in self.counters.items())
+        return f"SearchTrace(query={self.query!r}, timings=[{timings}], counters=[{counters}])"
+
+
+class Histogram:
+    def __init__(self):
+        """
+        A histogram with logarithmic buckets, each bucket covers values within a factor of 2.
+        """
+        self.buckets: dict[int, int] = {}
+        self.count = 0
+        self.total = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def add(self, value: float):
+        """
+        Add a value to the histogram.
+
+        # Parameters
+        - value (float): The value to add.
+        """
+        bucket = math.frexp(value)[1] if value > 0 else -1074
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+
+    def percentile(self, p: float) -> float:
+        """
+        Estimate a percentile with the upper bound of the bucket that contains it.
+
+        # Parameters
+        - p (float): The percentile, between 0 and 1.
+
+        # Returns
+        - float: The estimated value.
+        """
+        if self.count == 0:
+            return 0.0
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= p * self.count:
+                return min(math.ldexp(1.0, bucket), self.max)
+        return self.max
+
+    def summary(self) -> dict[str, float]:
+        """
+        Get the count, mean, min, max and the estimated percentiles of the values.
+        """
+        return {
+            "count": self.count,
+            "mean": self.total / self.count if self.count > 0 else 0.0,
+            "min": self.min if self.count > 0 else 0.0,
+            "p50": self.percentile(0.5),
+            "p90": self.percentile(0.9),
+            "p99": self.percentile(0.99),
+            "max": self.max if self.count > 0 else 0.0,
+        }
+
+
+class SearchProfiler:
+    def __init__(self):
+        """
+        Aggregate the traces of many queries in histograms, one per stage and counter.
+        """
+        self.timings: dict[str, Histogram] = {}
+        self.counters: dict[str, Histogram] = {}
+        self.total = Histogram()
+        self.last_trace: Optional[SearchTrace] = None
+        self.lock = threading.Lock()
+
+    def record(self, trace: SearchTrace):
+        """
+        Add a trace to the histograms.
+
+        # Parameters
+        - trace (SearchTrace): The trace of a query.
+        """
+        with self.lock:
+            for name, seconds in trace.timings.items():
+                self.timings.setdefault(name, Histogram()).add(seconds)
+            for name, value in trace.counters.items():
+                self.counters.setdefault(name, Histogram()).add(value)
+            self.total.add(trace.total_time())
+            self.last_trace = trace
+
+    def summary(self) -> dict[str, dict[str, dict[str, float]]]:
+        """
+        Get the summary of the histogram of each stage (in seconds) and counter.
+        """
+        with self.lock:
+            return {
+                "total": {"search": self.total.summary()},
+                "timings": {name: histogram.summary() for name, histogram in self.timings.items()},
+                "counters": {name: histogram.summary() for name, histogram in self.counters.items()},
+            }
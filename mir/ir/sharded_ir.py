@@ -0,0 +1,171 @@
+import heapq
+import itertools
+import multiprocessing
+import time
+from multiprocessing.connection import Connection
+from typing import Optional
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.sharded_index import GlobalStatisticsView, ShardedIndex
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir, QueryMode
+from mir.ir.memory_budget import MemoryBudget
+from mir.ir.posting import Posting
+from mir.ir.scoring_function import ScoringFunction
+from mir.ir.search_trace import SearchTrace
+from mir.ir.term import Term
+from mir.ir.tokenizer import Tokenizer
+from mir.utils.sized_generator import SizedGenerator
+
+
+def shard_worker(path: str, tokenizer: Tokenizer, scoring_functions: list[tuple[int, ScoringFunction]], connection: Connection, memory_budget: Optional[MemoryBudget] = None):
+    """
+    Serve the queries for a single shard until None is received.
+    Only the first stage of the cascade runs in the shard, the later ones run once on the merged results.
+
+    # Parameters
+    - path (str): The path of the shard.
+    - tokenizer (Tokenizer): The tokenizer to use.
+    - scoring_functions (list[tuple[int, ScoringFunction]]): The first scoring function, with its k.
+    - connection (Connection): The connection used to receive the queries and send the results.
+    - memory_budget (Optional[MemoryBudget]): The memory budget of the shard.
+    """
+    index = GlobalStatisticsView(SqliteIndex(path, memory_budget=memory_budget))
+    ir = Ir(index, tokenizer, scoring_functions)
+    while (message := connection.recv()) is not None:
+        query, mode, global_info, term_statistics, query_rewriter = message
+        try:
+            index.set_statistics(global_info, term_statistics)
+            # the view has all the terms of the collection, so every shard rewrites the query in the same way
+            ir.query_rewriter = query_rewriter
+            ranking, terms, postings_cache = ir._first_stage(query, None, mode, {})
+            connection.send((ranking, terms, postings_cache))
+        except Exception as e:
+            connection.send(e)
+
+
+class ShardedIr(Ir):
+    def __init__(self, index: ShardedIndex, tokenizer: Optional[Tokenizer] = None, scoring_functions: Optional[list[tuple[int, ScoringFunction]]] = None):
+        """
+        Create an IR system that runs the queries on every shard of a ShardedIndex in parallel,
+        each shard is served by a worker process.
+        The scores are computed using the statistics of the whole collection
+        and the top k results of each shard are merged.
+        The workers are started on the first query, call close to stop them.
+
+        # Parameters
+        - index (ShardedIndex): The sharded index to use.
+        - tokenizer (Tokenizer): The tokenizer to use. If None, a DefaultTokenizer is used.
+        - scoring_functions (Optional[list[tuple[int, ScoringFunction]]]): A list of scoring functions to use, with their respective top_k results to keep.
+        If None CountScoringFunction is used.
+        """
+        super().__init__(index, tokenizer, scoring_functions)
+        self.index: ShardedIndex = index
+        self.workers: list[tuple[multiprocessing.Process, Connection]] = []
+
+    def start(self) -> None:
+        """
+        Start a worker process for each shard.
+        """
+        if len(self.workers) > 0:
+            return
+        for path in self.index.shard_paths:
+            connection, worker_connection = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=shard_worker,
+                args=(path, self.tokenizer, self.scoring_functions[:1], worker_connection, self.index.shard_memory_budget()),
+                daemon=True)
+            process.start()
+            self.workers.append((process, connection))
+
+    def close(self) -> None:
+        """
+        Stop the worker processes.
+        """
+        for process, connection in self.workers:
+            connection.send(None)
+            process.join()
+            connection.close()
+        self.workers = []
+
+    def __enter__(self) -> "ShardedIr":
+        self.start()
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def index_document(self, doc: DocumentContents) -> None:
+        # the workers cache the state of their shard, so they are restarted after any change
+        self.close()
+        super().index_document(doc)
+
+    def bulk_index_documents(self, docs: SizedGenerator[DocumentContents, None, None], verbose: bool = False) -> None:
+        self.close()
+        super().bulk_index_documents(docs, verbose)
+
+    def delete_document(self, doc_id: int) -> None:
+        self.close()
+        super().delete_document(doc_id)
+
+    def update_document(self, doc_id: int, doc: DocumentContents) -> None:
+        self.close()
+        super().update_document(doc_id, doc)
+
+    def compact(self) -> None:
+        self.close()
+        super().compact()
+
+    def rank(self, query: str, trace: Optional[SearchTrace] = None, mode: QueryMode = "or", contents: Optional[dict[int, DocumentContents]] = None) -> list[tuple[float, int]]:
+        if mode == "impact":
+            raise ValueError("The impact mode is not supported by sharded indexes")
+        self.start()
+        owned_trace = trace is None and self.profiler is not None
+        if owned_trace:
+            trace = SearchTrace(query)
+        try:
+            tracing = trace is not None
+            if tracing:
+                start_time = time.perf_counter()
+            terms = [term.text for term in self.tokenizer.tokenize_query(query)]
+            global_info = self.index.get_global_info()
+            term_statistics = self.index.get_term_statistics(terms)
+            if tracing:
+                if self.query_rewriter is not None and mode != "phrase":
+                    trace.info["query_rewriter"] = self.query_rewriter.config()
+                trace.add_time("global_statistics", time.perf_counter() - start_time)
+                start_time = time.perf_counter()
+            # scatter
+            for _, connection in self.workers:
+                connection.send((query, mode, global_info, term_statistics, self.query_rewriter))
+            # gather
+            shard_results = [connection.recv() for _, connection in self.workers]
+            for result in shard_results:
+                if isinstance(result, Exception):
+                    raise result
+            if tracing:
+                trace.add_time("scatter_gather", time.perf_counter() - start_time)
+                start_time = time.perf_counter()
+            # every shard returns its first stage results sorted by decreasing score and doc_id, like a single index
+            merged = heapq.merge(*(ranking for ranking, _, _ in shard_results), reverse=True)
+            ranking = list(itertools.islice(merged, self.scoring_functions[0][0]))
+            # the shards have the same terms but different term_ids,
+            # so the terms and the postings of the merged results are renumbered with the position of the term
+            terms = [Term(term.term, i, **term.info) for i, term in enumerate(shard_results[0][1])]
+            positions = {term.term: term.id for term in terms}
+            postings_cache: dict[int, list[Posting]] = {}
+            selected = set(doc_id for _, doc_id in ranking)
+            for _, shard_terms, shard_postings in shard_results:
+                term_positions = {term.id: positions[term.term] for term in shard_terms}
+                for doc_id, postings in shard_postings.items():
+                    if doc_id in selected:
+                        postings_cache[doc_id] = [
+                            Posting(posting.doc_id, term_positions[posting.term_id], posting.occurrences, posting.positions)
+                            for posting in postings]
+            if tracing:
+                trace.add_time("shard_merge", time.perf_counter() - start_time)
+                trace.count("shards", len(shard_results))
+            return self._rerank(query, terms, ranking, postings_cache, contents if contents is not None else {}, trace)
+        finally:
+            if owned_trace:
+                self.profiler.record(trace)
@@ -1,5 +1,44 @@
+from collections.abc import Iterable, Mapping
+from typing import Optional
+
+from mir.ir.posting import Posting
+
+
 class Term:
     def __init__(self, term: str, id: int, **kwargs):
         self.term = term
         self.id = id
         self.info = kwargs
+
+
+def term_statistics(postings: Iterable[Posting], document_lengths: Mapping[int, int]) -> dict[str, Optional[int]]:
+    """
+    Compute the statistics of a term that the indexes keep in the info of a Term from its postings.
+    The indexes update them while documents are indexed, this is for imported postings and for recomputing them.
+
+    # Parameters
+    - postings (Iterable[Posting]): The postings of the term, of the documents that are not deleted.
+    - document_lengths (Mapping[int, int]): The length of each document, all the fields added together.
+
+    # Returns
+    - dict[str, Optional[int]]: The document_frequency, the collection_frequency (also for each field,
+    as collection_frequency_author, collection_frequency_title and collection_frequency_body),
+    the max_tf and the min_document_length (None without postings).
+    """
+    statistics = {
+        "document_frequency": 0, "collection_frequency": 0,
+        "collection_frequency_author": 0, "collection_frequency_title": 0, "collection_frequency_body": 0,
+        "max_tf": 0, "min_document_length": None}
+    for posting in postings:
+        tf = 0
+        for field in ("author", "title", "body"):
+            occurrences = posting.occurrences.get(field, 0)
+            statistics[f"collection_frequency_{field}"] += occurrences
+            tf += occurrences
+        statistics["document_frequency"] += 1
+        statistics["collection_frequency"] += tf
+        statistics["max_tf"] = max(statistics["max_tf"], tf)
+        document_length = document_lengths[posting.doc_id]
+        if statistics["min_document_length"] is None or document_length < statistics["min_document_length"]:
+            statistics["min_document_length"] = document_length
+    return statistics
@@ -0,0 +1,76 @@
+from typing import Iterable, Iterator, Optional, Sized
+
+
+class Tombstones(Iterable[int], Sized):
+    def __init__(self, doc_ids: Optional[Iterable[int]] = None):
+        """
+        Create a bitmap of deleted doc_ids.
+
+        # Parameters
+        - doc_ids (Optional[Iterable[int]]): The doc_ids to mark as deleted.
+        """
+        self.bitmap = bytearray()
+        self.count = 0
+        if doc_ids is not None:
+            for doc_id in doc_ids:
+                self.add(doc_id)
+
+    def add(self, doc_id: int) -> bool:
+        """
+        Mark a doc_id as deleted.
+
+        # Parameters
+        - doc_id (int): The doc_id to mark.
+
+        # Returns
+        - bool: Whether the doc_id was not already marked.
+        """
+        byte, bit = doc_id >> 3, 1 << (doc_id & 7)
+        if byte >= len(self.bitmap):
+            self.bitmap.extend(bytes(max(byte + 1 - len(self.bitmap), len(self.bitmap))))
+        if self.bitmap[byte] & bit:
+            return False
+        self.bitmap[byte] |= bit
+        self.count += 1
+        return True
+
+    def discard(self, doc_id: int) -> bool:
+        """
+        Unmark a doc_id.
+
+        # Parameters
+        - doc_id (int): The doc_id to unmark.
+
+        # Returns
+        - bool: Whether the doc_id was marked.
+        """
+        if doc_id not in self:
+            return False
+        self.bitmap[doc_id >> 3] &= ~(1 << (doc_id & 7)) & 0xFF
+        self.count -= 1
+        return True
+
+    def clear(self):
+        """
+        Unmark all the doc_ids.
+        """
+        self.bitmap = bytearray()
+        self.count = 0
+
+    def __contains__(self, doc_id: int) -> bool:
+        byte = doc_id >> 3
+        return byte < len(self.bitmap) and bool(self.bitmap[byte] & (1 << (doc_id & 7)))
+
+    def __iter__(self) -> Iterator[int]:
+        for byte_index, byte in enumerate(self.bitmap):
+            if byte == 0:
+                continue
+            for bit in range(8):
+                if byte & (1 << bit):
+                    yield (byte_index << 3) | bit
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __bool__(self) -> bool:
+        return self.count > 0
@@ -0,0 +1,388 @@
+import argparse
+from collections.abc import Callable, Generator
+import gc
+import json
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from typing import Any, Optional
+
+import pandas as pd
+import psutil
+from tqdm.auto import tqdm
+
+from mir import DATA_DIR, PROJECT_DIR
+from mir.ir.doc_reordering import graph_bisection_order, log_gap_bits
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impact_index import ImpactIndex
+from mir.ir.impls.bm25f_scoring import BM25FScoringFunction
+from mir.ir.impls.bm25plus_scoring import BM25PlusScoringFunction
+from mir.ir.impls.count_scoring_function import CountScoringFunction
+from mir.ir.impls.dfree_scoring import DFReeScoringFunction
+from mir.ir.impls.dirichlet_scoring import DirichletScoringFunction
+from mir.ir.impls.default_index import DefaultIndex
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.index import Index
+from mir.ir.index_converter import convert_index, lexicographic_order
+from mir.ir.ir import Ir, QueryMode
+from mir.ir.memory_budget import MemoryBudget
+from mir.ir.query_rewriter import QueryRewriter
+from mir.ir.scoring_function import ScoringFunction
+from mir.utils.dataset import msmarco_collection_to_contents
+from mir.utils.sized_generator import SizedGenerator
+from mir.utils.synthetic import SyntheticCollection
+
+
+def synthetic_dataset(num_docs: int, num_queries: int, seed: int) -> tuple[Callable[[], SizedGenerator[DocumentContents, None, None]], pd.DataFrame]:
+    """
+    Generate a synthetic collection and query log.
+
+    # Parameters
+    - num_docs (int): The number of documents.
+    - num_queries (int): The number of queries.
+    - seed (int): The seed of the random generator.
+
+    # Returns
+    - tuple[Callable[[], SizedGenerator[DocumentContents, None, None]], pd.DataFrame]: A function returning
+    the documents and the queries, with the columns "query_id" and "text".
+    """
+    collection = SyntheticCollection(num_docs, seed=seed)
+    return collection.documents, collection.queries(num_queries)
+
+
+def msmarco_sample(num_docs: int, num_queries: int, seed: int) -> tuple[Callable[[], SizedGenerator[DocumentContents, None, None]], pd.DataFrame]:
+    """
+    Take the first documents of the MS MARCO collection and a random sample of the 2019 test queries.
+    The dataset must be already downloaded in the data directory.
+
+    # Parameters
+    - num_docs (int): The number of documents.
+    - num_queries (int): The number of queries.
+    - seed (int): The seed of the random generator.
+
+    # Returns
+    - tuple[Callable[[], SizedGenerator[DocumentContents, None, None]], pd.DataFrame]: A function returning
+    the documents and the queries, with the columns "query_id" and "text".
+    """
+    collection_path = f"{DATA_DIR}/msmarco/collection.tsv"
+    queries_path = f"{DATA_DIR}/msmarco/msmarco-test2019-queries.tsv"
+    if not os.path.exists(collection_path) or not os.path.exists(queries_path):
+        raise FileNotFoundError("The MS MARCO dataset was not found, download it with mir.utils.dataset.get_msmarco_dataset")
+    def docs() -> SizedGenerator[DocumentContents, None, None]:
+        collection = msmarco_collection_to_contents(collection_path)
+        def inner() -> Generator[DocumentContents, None, None]:
+            for _, doc in zip(range(num_docs), collection):
+                yield doc
+        return SizedGenerator(inner(), min(num_docs, len(collection)))
+    queries = pd.read_csv(queries_path, sep='\t', header=None, names=['query_id', 'text'], dtype={'query_id': int, 'text': str})
+    queries = queries.sample(n=min(num_queries, len(queries)), random_state=seed)
+    return docs, queries
+
+
+DATASETS: dict[str, Callable[[int, int, int], tuple[Callable[[], SizedGenerator[DocumentContents, None, None]], pd.DataFrame]]] = {
+    "synthetic": synthetic_dataset,
+    "msmarco": msmarco_sample,
+}
+
+BACKENDS: dict[str, Callable[[str], Index]] = {
+    "default": lambda directory: DefaultIndex(f"{directory}/index.pkl"),
+    "sqlite": lambda directory: SqliteIndex(f"{directory}/index.db"),
+    "sqlite-blocks": lambda directory: SqliteIndex(f"{directory}/index.db", posting_blocks=True),
+}
+
+CASCADES: dict[str, Callable[[], list[tuple[int, ScoringFunction]]]] = {
+    "count": lambda: [(100, CountScoringFunction())],
+    "bm25f": lambda: [(100, BM25FScoringFunction(1.2, 0.8))],
+    "bm25plus": lambda: [(100, BM25PlusScoringFunction(1.2, 0.8))],
+    "bm25f-dfree": lambda: [(100, BM25FScoringFunction(1.2, 0.8)), (100, DFReeScoringFunction())],
+    "dirichlet": lambda: [(100, DirichletScoringFunction())],
+}
+
+
+REORDERINGS: dict[str, Callable[[Index], list[int]]] = {
+    "lexicographic": lexicographic_order,
+    "bisection": graph_bisection_order,
+}
+
+
+def directory_size(directory: str) -> int:
+    return sum(os.path.getsize(os.path.join(directory, file)) for file in os.listdir(directory))
+
+
+def latency_summary(latencies: list[float]) -> dict[str, float]:
+    latencies = sorted(latencies)
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+    return {
+        "mean": sum(latencies) / len(latencies),
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "p99": percentile(0.99),
+        "max": latencies[-1],
+    }
+
+
+def benchmark_backend(backend: str, cascades: list[str], docs: Callable[[], SizedGenerator[DocumentContents, None, None]], queries: pd.DataFrame, warmup: int, verbose: bool, reorder: str = "none", mode: QueryMode = "or", query_rewriter: Optional[QueryRewriter] = None, memory_budget: Optional[MemoryBudget] = None) -> list[dict[str, Any]]:
+    """
+    Build an index with a backend and run the queries with every cascade.
+    If reorder is one of REORDERINGS, the index is then renumbered into a new index of the same backend,
+    which is measured and queried instead.
+    In "impact" mode an impact index is built for each cascade, with the parameters of its first stage if it is BM25F,
+    and the overlap of the results with the "or" mode is measured after the timed queries.
+    With a query_rewriter the overlap of the results with the ones of the queries that are not rewritten is measured too.
+    With a memory_budget a SqliteIndex is opened again as read-only with the budget before the queries.
+    The memory of the process and of the index is measured after the queries of each cascade.
+
+    # Returns
+    - list[dict[str, Any]]: One result per cascade, all with the same indexing and size measures.
+    """
+    process = psutil.Process()
+    tokenizer = DefaultTokenizer()
+    with tempfile.TemporaryDirectory() as directory:
+        gc.collect()
+        rss_before = process.memory_info().rss
+        index = BACKENDS[backend](directory)
+        documents = docs()
+        num_docs = len(documents)
+        start_time = time.perf_counter()
+        index.bulk_index_documents(documents, tokenizer, verbose=verbose)
+        indexing_time = time.perf_counter() - start_time
+        gc.collect()
+        indexing = {
+            "documents": num_docs,
+            "seconds": indexing_time,
+            "docs_per_second": num_docs / indexing_time,
+        }
+        ram_bytes = process.memory_info().rss - rss_before
+        reordering = None
+        if reorder != "none":
+            gap_bits_before = log_gap_bits(index)
+            start_time = time.perf_counter()
+            doc_order = REORDERINGS[reorder](index)
+            reordered_directory = f"{directory}/reordered"
+            os.mkdir(reordered_directory)
+            reordered = BACKENDS[backend](reordered_directory)
+            convert_index(index, reordered, doc_order, verbose=verbose)
+            del index
+            index = reordered
+            reordering = {
+                "method": reorder,
+                "seconds": time.perf_counter() - start_time,
+                "gap_bits_before": gap_bits_before,
+                "gap_bits_after": log_gap_bits(index),
+            }
+            directory = reordered_directory
+        size = {
+            "disk_bytes": directory_size(directory),
+            "ram_bytes": ram_bytes,
+        }
+        if memory_budget is not None and isinstance(index, SqliteIndex):
+            index.close()
+            index = SqliteIndex(index.path, read_only=True, memory_budget=memory_budget)
+
+        results = []
+        for cascade in cascades:
+            ir = Ir(index, tokenizer, CASCADES[cascade]())
+            impacts = None
+            if mode == "impact":
+                first_stage = ir.scoring_functions[0][1]
+                start_time = time.perf_counter()
+                impact_index = ImpactIndex.build(index, first_stage if isinstance(first_stage, BM25FScoringFunction) else None, verbose=verbose)
+                impacts = {"seconds": time.perf_counter() - start_time}
+                ir.enable_impacts(impact_index)
+            if query_rewriter is not None:
+                ir.enable_query_rewriting(query_rewriter)
+            texts = list(queries["text"])
+            for text in texts[:warmup]:
+                ir.rank(text, mode=mode)
+            latencies = []
+            num_results = 0
+            start_time = time.perf_counter()
+            for text in tqdm(texts, desc=f"Running queries ({backend}, {cascade})", disable=not verbose):
+                query_start_time = time.perf_counter()
+                num_results += len(ir.rank(text, mode=mode))
+                latencies.append(time.perf_counter() - query_start_time)
+            total_time = time.perf_counter() - start_time
+            if impacts is not None:
+                impacts["overlap"] = results_overlap(ir, texts, mode)
+            rewriting = None
+            if query_rewriter is not None:
+                rewriting = {**query_rewriter.config(), "overlap": results_overlap(ir, texts, mode)}
+            results.append({
+                "backend": backend,
+                "cascade": cascade,
+                "indexing": indexing,
+                "reordering": reordering,
+                "mode": mode,
+                "impacts": impacts,
+                "query_rewriting": rewriting,
+                "size": size,
+                "memory": ir.memory_usage(),
+                "queries": {
+                    "count": len(texts),
+                    "qps": len(texts) / total_time,
+                    "avg_results": num_results / len(texts),
+                    "latency": latency_summary(latencies),
+                },
+            })
+        del index
+        return results
+
+
+def results_overlap(ir: Ir, texts: list[str], mode: QueryMode) -> float:
+    """
+    Measure the fraction of the results of the "or" mode without query rewriting that are also found in a mode,
+    with the impacts and the query rewriter of the IR system.
+    """
+    query_rewriter = ir.query_rewriter
+    found = 0
+    expected = 0
+    for text in texts:
+        ir.disable_query_rewriting()
+        reference = set(doc_id for _, doc_id in ir.rank(text))
+        if query_rewriter is not None:
+            ir.enable_query_rewriting(query_rewriter)
+        found += len(reference & set(doc_id for _, doc_id in ir.rank(text, mode=mode)))
+        expected += len(reference)
+    return found / expected if expected > 0 else 1.0
+
+
+def environment_info() -> dict[str, Any]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], cwd=PROJECT_DIR, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "total_memory": psutil.virtual_memory().total,
+        "commit": commit,
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+    }
+
+
+def run_benchmark(dataset: str, backends: list[str], cascades: list[str], num_docs: int, num_queries: int, seed: int = 42, warmup: int = 10, verbose: bool = False, reorder: str = "none", mode: QueryMode = "or", query_rewriter: Optional[QueryRewriter] = None, memory_budget: Optional[MemoryBudget] = None) -> dict[str, Any]:
+    """
+    Run the benchmark for every backend and cascade on a dataset.
+
+    # Parameters
+    - dataset (str): The dataset, one of DATASETS.
+    - backends (list[str]): The index backends, from BACKENDS.
+    - cascades (list[str]): The scoring cascades, from CASCADES.
+    - num_docs (int): The number of documents to index.
+    - num_queries (int): The number of queries to run.
+    - seed (int): The seed used to generate or sample the data.
+    - warmup (int): The number of queries run before measuring.
+    - verbose (bool): Whether to show progress bars.
+    - reorder (str): "none", or the method from REORDERINGS used to renumber the documents after indexing.
+    - mode (QueryMode): The query mode of the queries.
+    - query_rewriter (Optional[QueryRewriter]): If set, the queries are rewritten with it.
+    - memory_budget (Optional[MemoryBudget]): If set, the SqliteIndex backends are queried read-only with this budget.
+
+    # Returns
+    - dict[str, Any]: The environment, the configuration and the results, ready to be saved as JSON.
+    """
+    docs, queries = DATASETS[dataset](num_docs, num_queries, seed)
+    results = []
+    for backend in backends:
+        for result in benchmark_backend(backend, cascades, docs, queries, warmup, verbose, reorder, mode, query_rewriter, memory_budget):
+            result["dataset"] = dataset
+            results.append(result)
+    return {
+        "environment": environment_info(),
+        "config": {
+            "dataset": dataset,
+            "num_docs": num_docs,
+            "num_queries": num_queries,
+            "seed": seed,
+            "warmup": warmup,
+            "reorder": reorder,
+            "mode": mode,
+            "query_rewriter": query_rewriter.config() if query_rewriter is not None else None,
+            "memory_budget": memory_budget.config() if memory_budget is not None else None,
+        },
+        "results": results,
+    }
+
+
+def compare_benchmarks(baseline: dict[str, Any], current: dict[str, Any], threshold: float = 0.1) -> list[str]:
+    """
+    Compare two benchmark runs.
+
+    # Parameters
+    - baseline (dict[str, Any]): The reference run.
+    - current (dict[str, Any]): The new run.
+    - threshold (float): The relative change above which a measure is reported as a regression.
+
+    # Returns
+    - list[str]: A line for every measure of every workload present in both runs.
+    """
+    # (name, getter, whether higher is better)
+    measures: list[tuple[str, Callable[[dict[str, Any]], float], bool]] = [
+        ("docs/s", lambda r: r["indexing"]["docs_per_second"], True),
+        ("disk", lambda r: r["size"]["disk_bytes"], False),
+        ("ram", lambda r: r["size"]["ram_bytes"], False),
+        ("qps", lambda r: r["queries"]["qps"], True),
+        ("p50", lambda r: r["queries"]["latency"]["p50"], False),
+        ("p99", lambda r: r["queries"]["latency"]["p99"], False),
+    ]
+    def key(result: dict[str, Any]) -> tuple[str, str, str]:
+        return result["dataset"], result["backend"], result["cascade"]
+    baseline_results = {key(result): result for result in baseline["results"]}
+    lines = []
+    if baseline["config"] != current["config"]:
+        lines.append(f"WARNING: the configurations differ, {baseline['config']} != {current['config']}")
+    for result in current["results"]:
+        old = baseline_results.get(key(result))
+        if old is None:
+            continue
+        for name, getter, higher_is_better in measures:
+            old_value, new_value = getter(old), getter(result)
+            change = (new_value - old_value) / old_value if old_value != 0 else 0.0
+            regression = -change > threshold if higher_is_better else change > threshold
+            lines.append(
+                f"{'/'.join(key(result))} {name}: {old_value:.6g} -> {new_value:.6g} "
+                f"({change:+.1%}){' REGRESSION' if regression else ''}")
+    return lines
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark indexing and query throughput")
+    parser.add_argument("--dataset", type=str, default="synthetic", choices=list(DATASETS))
+    parser.add_argument("--backends", type=str, nargs="+", default=list(BACKENDS), choices=list(BACKENDS))
+    parser.add_argument("--cascades", type=str, nargs="+", default=list(CASCADES), choices=list(CASCADES))
+    parser.add_argument("--num-docs", type=int, default=10000)
+    parser.add_argument("--num-queries", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--reorder", type=str, default="none", choices=["none", *REORDERINGS], help="Renumber the documents after indexing")
+    parser.add_argument("--mode", type=str, default="or", choices=["or", "and", "impact"], help="The query mode, impact builds an impact index first")
+    parser.add_argument("--max-document-fraction", type=float, default=None, help="Rewrite the queries, down-weighting the terms in more than this fraction of the documents")
+    parser.add_argument("--common-term-weight", type=float, default=0.0, help="The weight factor of the common terms, 0 drops them")
+    parser.add_argument("--max-terms", type=int, default=None, help="Rewrite the queries, keeping only this many terms with the highest idf")
+    parser.add_argument("--memory-budget", type=int, default=None, help="Query the SQLite backends read-only with this many MiB of memory")
+    parser.add_argument("--output", type=str, default=None, help="Save the results to this JSON file")
+    parser.add_argument("--compare", type=str, default=None, help="Compare the results with a previous JSON file")
+    parser.add_argument("--threshold", type=float, default=0.1, help="Relative change reported as a regression")
+    args = parser.parse_args()
+
+    query_rewriter = None
+    if args.max_document_fraction is not None or args.max_terms is not None:
+        query_rewriter = QueryRewriter(args.max_document_fraction, args.common_term_weight, args.max_terms)
+    report = run_benchmark(
+        args.dataset, args.backends, args.cascades, args.num_docs, args.num_queries, args.seed, args.warmup,
+        verbose=True, reorder=args.reorder, mode=args.mode, query_rewriter=query_rewriter,
+        memory_budget=MemoryBudget(args.memory_budget * 1024 * 1024) if args.memory_budget is not None else None)
+    print(json.dumps(report["results"], indent=4))
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=4)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for line in compare_benchmarks(baseline, report, args.threshold):
+            print(line)
@@ -0,0 +1,49 @@
+import argparse
+import os
+
+from mir.ir.doc_reordering import graph_bisection_order
+from mir.ir.impls.default_index import DefaultIndex
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.index import Index
+from mir.ir.index_converter import convert_index, lexicographic_order
+
+
+def open_index(path: str, backend: str, positions: bool = False, separate_contents: bool = False) -> Index:
+    match backend:
+        case "default":
+            return DefaultIndex(path, positions=positions, separate_contents=separate_contents)
+        case "sqlite":
+            return SqliteIndex(path, positions=positions, separate_contents=separate_contents)
+        case "sqlite-blocks":
+            return SqliteIndex(path, positions=positions, separate_contents=separate_contents, posting_blocks=True)
+        case _:
+            raise ValueError(f"Unknown backend {backend}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Copy an index into another backend without tokenizing the documents again")
+    parser.add_argument("source", type=str, help="Path of the index to convert")
+    parser.add_argument("target", type=str, help="Path of the new index, it must not exist")
+    parser.add_argument("--source-backend", type=str, default=None, choices=["default", "sqlite"], help="Guessed from the extension if not set")
+    parser.add_argument("--target-backend", type=str, default="sqlite-blocks", choices=["default", "sqlite", "sqlite-blocks"])
+    parser.add_argument("--positions", action="store_true", help="Keep the positions of the terms, the source must have them")
+    parser.add_argument("--separate-contents", action="store_true", help="Store the contents in a separate document store")
+    parser.add_argument("--reorder", type=str, default="none", choices=["none", "lexicographic", "bisection"], help="Renumber the documents in this order")
+    args = parser.parse_args()
+
+    if os.path.exists(args.target):
+        raise FileExistsError(f"{args.target} already exists")
+    source_backend = args.source_backend
+    if source_backend is None:
+        source_backend = "sqlite" if args.source.endswith(".db") else "default"
+    source = SqliteIndex(args.source, read_only=True) if source_backend == "sqlite" else DefaultIndex(args.source)
+    target = open_index(args.target, args.target_backend, args.positions, args.separate_contents)
+    match args.reorder:
+        case "lexicographic":
+            doc_order = lexicographic_order(source, verbose=True)
+        case "bisection":
+            doc_order = graph_bisection_order(source, verbose=True)
+        case _:
+            doc_order = None
+    convert_index(source, target, doc_order, verbose=True)
+    print(f"Converted {len(target)} documents to {args.target}")
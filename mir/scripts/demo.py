@@ -10,7 +10,7 @@ from mir.ir.impls.bm25f_scoring import BM25FScoringFunction
 from mir.ir.impls.neural_scoring_function import NeuralScoringFunction
 from mir.ir.impls.sqlite_index import SqliteIndex
 from mir.ir.ir import Ir
-from mir.utils.dataset import get_msmarco_dataset, msmarco_dataset_to_contents
+from mir.utils.dataset import get_msmarco_dataset, msmarco_collection_to_contents
 from mir.utils.download_and_extract import download_and_extract
 
 
@@ -26,9 +26,8 @@ download_and_extract(msmarco_sqlite_index_url, f"{DATA_DIR}/msmarco-sqlite-index
 
 indexer = pt.terrier.IterDictIndexer(f"{DATA_DIR}/msmarco-pyterrier-index")
 if not os.path.exists(index_path):
-    dataset = pd.read_csv(dataset_csv, sep='\t', header=None, names=['docno', 'text'], dtype={'docno': str, 'text': str})
-    indexref = indexer.index(tqdm(dataset.to_dict(orient='records'), desc="Indexing"))
-    del dataset
+    dataset = msmarco_collection_to_contents(dataset_csv)
+    indexref = indexer.index(tqdm(({'docno': str(doc.doc_id), 'text': doc.body} for doc in dataset), desc="Indexing", total=len(dataset)))
 else:
     indexref = pt.IndexRef.of(index_path)
 index = IndexFactory.of(indexref)
@@ -51,9 +50,10 @@ my_ir = Ir(SqliteIndex(f"{DATA_DIR}/msmarco-sqlite-index.db"), scoring_functions
     (100, BM25FScoringFunction(1.2, 0.8)),
     (10, NeuralScoringFunction())
 ])
-if len(my_ir.index) == 0:
-    dataset = pd.read_csv(dataset_csv, sep='\t', header=None, names=['docno', 'text'], dtype={'docno': str, 'text': str})
-    sized_generator = msmarco_dataset_to_contents(dataset)
+checkpoint = my_ir.index.get_checkpoint()
+if len(my_ir.index) == 0 or (checkpoint is not None and not checkpoint["completed"]):
+    # an interrupted build skips the documents committed before the last checkpoint
+    sized_generator = msmarco_collection_to_contents(dataset_csv)
     my_ir.bulk_index_documents(sized_generator, verbose=True)
 
 my_topics = pd.read_csv(topics_path, sep='\t', header=None, names=['query_id', 'text'], dtype={'query_id': int, 'text': str})
@@ -9,25 +9,43 @@ from tqdm.auto import tqdm
 
 from mir import DATA_DIR
 from mir.ir.impls.bm25f_scoring import BM25FScoringFunction
+from mir.ir.impls.bm25plus_scoring import BM25PlusScoringFunction
+from mir.ir.impls.dfree_scoring import DFReeScoringFunction
+from mir.ir.impls.dirichlet_scoring import DirichletScoringFunction
 from mir.ir.impls.neural_scoring_function import NeuralScoringFunction
 from mir.ir.impls.sqlite_index import SqliteIndex
 from mir.ir.ir import Ir
-from mir.utils.dataset import get_msmarco_dataset, msmarco_dataset_to_contents
+from mir.utils.dataset import get_msmarco_dataset, msmarco_collection_to_contents
 
 
-def evaluate_ir(mode: Literal["validation", "test"] = "validation"):
-    get_msmarco_dataset()
-    dataset_csv = f"{DATA_DIR}/msmarco/collection.tsv"
+def pyterrier_runs(dataset_csv: str, topics: pd.DataFrame) -> dict[str, pd.DataFrame]:
     indexer = pt.terrier.IterDictIndexer(f"{DATA_DIR}/msmarco-pyterrier-index")
     index_path = f"{DATA_DIR}/msmarco-pyterrier-index/data.properties"
     if not os.path.exists(index_path):
-        dataset = pd.read_csv(dataset_csv, sep='\t', header=None, names=['docno', 'text'], dtype={'docno': str, 'text': str})
-        indexref = indexer.index(tqdm(dataset.to_dict(orient='records'), desc="Indexing"))
-        del dataset
+        dataset = msmarco_collection_to_contents(dataset_csv)
+        indexref = indexer.index(tqdm(({'docno': str(doc.doc_id), 'text': doc.body} for doc in dataset), desc="Indexing", total=len(dataset)))
     else:
         indexref = pt.IndexRef.of(index_path)
     index = IndexFactory.of(indexref)
-    
+
+    bm25 = pt.terrier.Retriever(index, wmodel="BM25")
+    dfree = pt.terrier.Retriever(index, wmodel="DFRee")
+    pyterrier_models = {
+        "PyTerrier BM25": bm25 % 100,
+        "PyTerrier BM25+DFRee": (bm25 % 100) >> dfree
+    }
+    runs = {}
+    for model_name, model in pyterrier_models.items():
+        print(f"Running {model_name}")
+        runs[model_name] = model.transform(topics)
+        print(runs[model_name])
+    return runs
+
+
+def evaluate_ir(mode: Literal["validation", "test"] = "validation", pyterrier_baselines: bool = False):
+    get_msmarco_dataset()
+    dataset_csv = f"{DATA_DIR}/msmarco/collection.tsv"
+
     if mode == "validation":
         topics_path = f"{DATA_DIR}/msmarco/msmarco-test2019-queries.tsv"
         qrels_path = f"{DATA_DIR}/msmarco/2019qrels-pass.txt"
@@ -48,40 +66,33 @@ def evaluate_ir(mode: Literal["validation", "test"] = "validation"):
 
 
     my_index = SqliteIndex(f"{DATA_DIR}/msmarco-sqlite-index.db")
-    if len(my_index) == 0:
-        dataset = pd.read_csv(dataset_csv, sep='\t', header=None, names=['docno', 'text'], dtype={'docno': str, 'text': str})
-        sized_generator = msmarco_dataset_to_contents(dataset)
+    checkpoint = my_index.get_checkpoint()
+    if len(my_index) == 0 or (checkpoint is not None and not checkpoint["completed"]):
+        # an interrupted build skips the documents committed before the last checkpoint
+        sized_generator = msmarco_collection_to_contents(dataset_csv)
         my_index.bulk_index_documents(sized_generator, verbose=True)
 
-    my_bm25 = Ir(my_index, scoring_functions=[
-        (100, BM25FScoringFunction(1.2, 0.8))
-    ])
-
-    my_neural_scoring = Ir(my_index, scoring_functions=[
-        (100, BM25FScoringFunction(1.2, 0.8)),
-        (10, NeuralScoringFunction())
-    ])
+    # the lexical models use the statistics of the index, so they run on the same index as BM25F
+    my_models = {
+        "Our BM25": [(100, BM25FScoringFunction(1.2, 0.8))],
+        "Our BM25+LtR": [(100, BM25FScoringFunction(1.2, 0.8)), (10, NeuralScoringFunction())],
+        "Our BM25+": [(100, BM25PlusScoringFunction(1.2, 0.8))],
+        "Our BM25+DFRee": [(100, BM25FScoringFunction(1.2, 0.8)), (100, DFReeScoringFunction())],
+        "Our Dirichlet LM": [(100, DirichletScoringFunction())],
+    }
 
     my_topics = pd.read_csv(topics_path, sep='\t', header=None, names=['query_id', 'text'], dtype={'query_id': int, 'text': str})
-    my_bm25_run = my_bm25.get_run(my_topics, verbose=True, pyterrier_compatible=True)
-    my_neural_scoring_run = my_neural_scoring.get_run(my_topics, verbose=True, pyterrier_compatible=True)
-    print(my_bm25_run)
-    print(my_neural_scoring_run)
+    runs = {}
+    for model_name, scoring_functions in my_models.items():
+        print(f"Running {model_name}")
+        runs[model_name] = Ir(my_index, scoring_functions=scoring_functions).get_run(my_topics, verbose=True, pyterrier_compatible=True)
+        print(runs[model_name])
 
-    bm25 = pt.terrier.Retriever(index, wmodel="BM25")
-    dfree = pt.terrier.Retriever(index, wmodel="DFRee")
-    pyterrier_models = {
-        "BM25": bm25 % 100,
-        "BM25+DFRee": (bm25 % 100) >> dfree
-    }
-    pyterrier_runs = {}
-    for model_name, model in pyterrier_models.items():
-        print(f"Running PyTerrier {model_name}")
-        pyterrier_runs[model_name] = model.transform(topics)
-        print(pyterrier_runs[model_name])
+    if pyterrier_baselines:
+        runs.update(pyterrier_runs(dataset_csv, topics))
 
-    test_runs = [my_bm25_run, my_neural_scoring_run, *pyterrier_runs.values()]
-    names = ["Our BM25", "Our BM25+LtR", *pyterrier_models.keys()]
+    test_runs = list(runs.values())
+    names = list(runs.keys())
 
     metrics = ["map", "ndcg", "recip_rank", "P.10", "recall.10", ]
     res = pt.Experiment(test_runs, topics, qrels, metrics, names=names)
@@ -91,5 +102,6 @@ def evaluate_ir(mode: Literal["validation", "test"] = "validation"):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--mode", type=str, default="validation", choices=["validation", "test"])
+    parser.add_argument("--pyterrier-baselines", action="store_true", help="Also build a Terrier index and run its BM25 and DFRee")
     args = parser.parse_args()
-    evaluate_ir(args.mode)
\ No newline at end of file
+    evaluate_ir(args.mode, args.pyterrier_baselines)
\ No newline at end of file
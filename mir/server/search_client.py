@@ -0,0 +1,107 @@
+import http.client
+import json
+import socket
+from typing import Any, Optional
+
+from mir.ir.document_contents import DocumentContents
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, socket_path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.socket_path)
+
+
+class SearchClient:
+    def __init__(self, host: str = "127.0.0.1", port: int = 8080, socket_path: Optional[str] = None, timeout: Optional[float] = None):
+        """
+        Create a client for a SearchServer, the connection is kept open between requests.
+        A client must not be shared between threads.
+
+        # Parameters
+        - host (str): The host of the server.
+        - port (int): The port of the server.
+        - socket_path (Optional[str]): If set, connect to this unix socket instead of host and port.
+        - timeout (Optional[float]): The timeout of the requests in seconds.
+        """
+        if socket_path is not None:
+            self.connection = UnixHTTPConnection(socket_path, timeout)
+        else:
+            self.connection = http.client.HTTPConnection(host, port, timeout=timeout)
+
+    def _request(self, method: str, path: str, body: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        self.connection.request(method, path, data, headers)
+        response = self.connection.getresponse()
+        ret = json.loads(response.read())
+        if response.status != 200:
+            raise RuntimeError(f"Request to {path} failed with status {response.status}: {ret.get('error')}")
+        return ret
+
+    def search(self, query: str, k: Optional[int] = None, mode: str = "or") -> list[DocumentContents]:
+        """
+        Search for documents based on a query, like Ir.search.
+
+        # Parameters
+        - query (str): The query to search for.
+        - k (Optional[int]): The maximum number of results. If None, all the results are returned.
+        - mode (str): "or" to match any term of the query, "and" to match all of them, "phrase" to match the exact phrase.
+
+        # Returns
+        - list[DocumentContents]: The documents that match the query, in decreasing order of score.
+        They have an id, an external_id and a score attribute.
+        """
+        response = self._request("POST", "/search", {"query": query, "k": k, "mode": mode, "contents": True})
+        ret = []
+        for result in response["results"]:
+            doc = DocumentContents(result["author"], result["title"], result["body"])
+            doc.add_field("id", result["id"])
+            doc.add_field("external_id", result["external_id"])
+            doc.set_score(result["score"])
+            ret.append(doc)
+        return ret
+
+    def rank(self, query: str, k: Optional[int] = None, mode: str = "or") -> list[tuple[float, int]]:
+        """
+        Rank the documents for a query without transferring their contents, like Ir.rank.
+
+        # Parameters
+        - query (str): The query to search for.
+        - k (Optional[int]): The maximum number of results. If None, all the results are returned.
+        - mode (str): "or" to match any term of the query, "and" to match all of them, "phrase" to match the exact phrase.
+
+        # Returns
+        - list[tuple[float, int]]: The scores and doc_ids of the results, in decreasing order of score.
+        """
+        response = self._request("POST", "/search", {"query": query, "k": k, "mode": mode, "contents": False})
+        return [(result["score"], result["id"]) for result in response["results"]]
+
+    def health(self) -> dict[str, Any]:
+        """
+        Get the status of the server.
+        """
+        return self._request("GET", "/health")
+
+    def metrics(self) -> dict[str, Any]:
+        """
+        Get the latency and batching metrics of the server.
+        """
+        return self._request("GET", "/metrics")
+
+    def close(self):
+        """
+        Close the connection.
+        """
+        self.connection.close()
+
+    def __enter__(self) -> "SearchClient":
+        return self
+
+    def __exit__(self, *_):
+        self.close()
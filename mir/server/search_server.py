@@ -0,0 +1,453 @@
+import argparse
+from collections import deque
+from collections.abc import Callable, Generator
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from typing import Any, Optional
+
+from mir.ir.document_cache import DocumentCache
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.bm25f_scoring import BM25FScoringFunction
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.index import Index
+from mir.ir.ir import Ir
+from mir.ir.memory_budget import MemoryBudget, process_memory_usage
+from mir.ir.scoring_function import ScoringFunction
+from mir.ir.search_trace import SearchProfiler
+from mir.ir.tokenizer import Tokenizer
+
+
+class RerankBatcher:
+    def __init__(self, scoring_function: ScoringFunction, max_batch_size: int = 64, max_wait: float = 0.005):
+        """
+        Collect the batched calls of concurrent requests to a scoring function
+        and run them as a single batch.
+
+        # Parameters
+        - scoring_function (ScoringFunction): The scoring function to batch, it must have a batched_call.
+        - max_batch_size (int): The maximum number of documents in a batch.
+        - max_wait (float): The maximum time in seconds to wait for other requests before running a batch.
+        """
+        assert scoring_function.batched_call is not None, "The scoring function must support batched calls"
+        self.scoring_function = scoring_function
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.requests: queue.Queue[Optional[dict[str, Any]]] = queue.Queue()
+        self.num_batches = 0
+        self.num_requests = 0
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def submit(self, document_contents: list[str], query_contents: str) -> list[float]:
+        """
+        Score documents for a query, waiting for the batch containing them to be run.
+
+        # Parameters
+        - document_contents (list[str]): The contents of the documents.
+        - query_contents (str): The query.
+
+        # Returns
+        - list[float]: The score of each document.
+        """
+        request = {"documents": document_contents, "query": query_contents, "done": threading.Event()}
+        self.requests.put(request)
+        request["done"].wait()
+        if "error" in request:
+            raise request["error"]
+        return request["scores"]
+
+    def close(self):
+        """
+        Stop the batching thread.
+        """
+        self.requests.put(None)
+        self.thread.join()
+
+    def _run(self):
+        while (request := self.requests.get()) is not None:
+            batch = [request]
+            batch_size = len(request["documents"])
+            deadline = time.perf_counter() + self.max_wait
+            while batch_size < self.max_batch_size:
+                try:
+                    request = self.requests.get(timeout=max(0.0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if request is None:
+                    self.requests.put(None)
+                    break
+                batch.append(request)
+                batch_size += len(request["documents"])
+            documents = [document for request in batch for document in request["documents"]]
+            queries = [request["query"] for request in batch for _ in request["documents"]]
+            try:
+                scores = self.scoring_function.batched_call(documents, queries) if documents else []
+            except Exception as e:
+                for request in batch:
+                    request["error"] = e
+            else:
+                offset = 0
+                for request in batch:
+                    request["scores"] = scores[offset:offset + len(request["documents"])]
+                    offset += len(request["documents"])
+            self.num_batches += 1
+            self.num_requests += len(batch)
+            for request in batch:
+                request["done"].set()
+
+
+class BatchedScoringFunction(ScoringFunction):
+    def __init__(self, batcher: RerankBatcher):
+        """
+        A scoring function whose batched calls are merged with the ones of concurrent requests.
+
+        # Parameters
+        - batcher (RerankBatcher): The batcher shared by the requests.
+        """
+        self.batcher = batcher
+
+    def __call__(self, document_info, postings, query, **kwargs):
+        return self.batcher.scoring_function(document_info, postings, query, **kwargs)
+
+    def batched_call(self, document_contents: list[str], query_contents: str) -> list[float]:
+        return self.batcher.submit(document_contents, query_contents)
+
+
+class LatencyMetrics:
+    def __init__(self, window: int = 10000):
+        """
+        Keep track of the latency of the last requests for each endpoint.
+
+        # Parameters
+        - window (int): The number of requests per endpoint used to compute the percentiles.
+        """
+        self.window = window
+        self.latencies: dict[str, deque[float]] = {}
+        self.counts: dict[str, int] = {}
+        self.errors: dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def record(self, endpoint: str, latency: float, error: bool = False):
+        """
+        Record the latency of a request.
+
+        # Parameters
+        - endpoint (str): The endpoint of the request.
+        - latency (float): The latency in seconds.
+        - error (bool): Whether the request failed.
+        """
+        with self.lock:
+            self.latencies.setdefault(endpoint, deque(maxlen=self.window)).append(latency)
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+            self.errors[endpoint] = self.errors.get(endpoint, 0) + int(error)
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """
+        Get the request count, error count, mean and percentiles of the latency (in seconds) of each endpoint.
+
+        # Returns
+        - dict[str, dict[str, float]]: The metrics of each endpoint.
+        """
+        with self.lock:
+            ret = {}
+            for endpoint, latencies in self.latencies.items():
+                latencies = sorted(latencies)
+                def percentile(p: float) -> float:
+                    return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+                ret[endpoint] = {
+                    "count": self.counts[endpoint],
+                    "errors": self.errors[endpoint],
+                    "mean": sum(latencies) / len(latencies),
+                    "p50": percentile(0.5),
+                    "p95": percentile(0.95),
+                    "p99": percentile(0.99),
+                    "max": latencies[-1],
+                }
+            return ret
+
+
+class IrPool:
+    def __init__(self, index_factory: Callable[[], Index], tokenizer: Tokenizer, scoring_functions: list[tuple[int, ScoringFunction]], size: int, profiler: Optional[SearchProfiler] = None, content_cache: Optional[DocumentCache] = None):
+        """
+        A pool of IR systems, each with its own index connection, sharing the tokenizer and the scoring functions.
+
+        # Parameters
+        - index_factory (Callable[[], Index]): A function that opens a new connection to the index.
+        - tokenizer (Tokenizer): The tokenizer to use.
+        - scoring_functions (list[tuple[int, ScoringFunction]]): The scoring functions to use.
+        - size (int): The number of IR systems in the pool.
+        - profiler (Optional[SearchProfiler]): If set, the traces of all the queries are recorded in it.
+        - content_cache (Optional[DocumentCache]): If set, the cache of document contents shared by the IR systems.
+        """
+        self.irs: queue.Queue[Ir] = queue.Queue()
+        for _ in range(size):
+            ir = Ir(index_factory(), tokenizer, scoring_functions)
+            ir.profiler = profiler
+            ir.content_cache = content_cache
+            self.irs.put(ir)
+
+    @contextmanager
+    def acquire(self) -> Generator[Ir, None, None]:
+        """
+        Borrow an IR system from the pool, waiting until one is available.
+        """
+        ir = self.irs.get()
+        try:
+            yield ir
+        finally:
+            self.irs.put(ir)
+
+
+class UnixHTTPServer(socketserver.ThreadingUnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        request, _ = super().get_request()
+        # BaseHTTPRequestHandler expects a (host, port) address
+        return request, ("unix", 0)
+
+
+class SearchServer:
+    def __init__(
+            self,
+            index_factory: Callable[[], Index],
+            tokenizer: Optional[Tokenizer] = None,
+            scoring_functions: Optional[list[tuple[int, ScoringFunction]]] = None,
+            pool_size: Optional[int] = None,
+            max_batch_size: int = 64,
+            max_batch_wait: float = 0.005,
+            profile: bool = False,
+            content_cache_size: int = 0):
+        """
+        Create a search server, the index and the scoring functions are loaded once and shared by all the requests.
+        The scoring functions with a batched call are batched across concurrent requests.
+
+        # Parameters
+        - index_factory (Callable[[], Index]): A function that opens a new connection to the index, called pool_size times.
+        - tokenizer (Optional[Tokenizer]): The tokenizer to use. If None, a DefaultTokenizer is used.
+        - scoring_functions (Optional[list[tuple[int, ScoringFunction]]]): The scoring functions to use, like in Ir.
+        If None BM25FScoringFunction is used.
+        - pool_size (Optional[int]): The number of queries that can be processed in parallel. If None, the number of cpus is used.
+        - max_batch_size (int): The maximum number of documents in a batch of the batched scoring functions.
+        - max_batch_wait (float): The maximum time in seconds to wait for other requests before running a batch.
+        - profile (bool): Whether to record the per-stage timers and counters of the queries, reported by /metrics.
+        - content_cache_size (int): The number of documents whose contents are cached in memory, 0 to disable the cache.
+        """
+        tokenizer = tokenizer if tokenizer is not None else DefaultTokenizer()
+        scoring_functions = scoring_functions if scoring_functions is not None else [(100, BM25FScoringFunction())]
+        self.batchers: list[RerankBatcher] = []
+        pooled_scoring_functions = []
+        for k, scoring_function in scoring_functions:
+            if scoring_function.batched_call is not None:
+                batcher = RerankBatcher(scoring_function, max_batch_size, max_batch_wait)
+                self.batchers.append(batcher)
+                scoring_function = BatchedScoringFunction(batcher)
+            pooled_scoring_functions.append((k, scoring_function))
+        pool_size = pool_size if pool_size is not None else os.cpu_count()
+        self.profiler = SearchProfiler() if profile else None
+        self.content_cache = DocumentCache(content_cache_size) if content_cache_size > 0 else None
+        self.pool = IrPool(index_factory, tokenizer, pooled_scoring_functions, pool_size, self.profiler, self.content_cache)
+        with self.pool.acquire() as ir:
+            self.num_docs = len(ir)
+            self.index = ir.index
+        self.metrics = LatencyMetrics()
+        self.start_time = time.time()
+        self.http_server: Optional[socketserver.BaseServer] = None
+
+    def search(self, request: dict[str, Any]) -> dict[str, Any]:
+        """
+        Run a search request.
+
+        # Parameters
+        - request (dict[str, Any]): The request, with the "query" to run, optionally the number of results "k",
+        the query "mode" (default "or", see Ir.rank) and whether to include the "contents" of the documents (default True).
+
+        # Returns
+        - dict[str, Any]: The response, with the "results" in decreasing order of score.
+        """
+        query = request["query"]
+        k = request.get("k")
+        with self.pool.acquire() as ir:
+            # the documents loaded by the rerankers are not loaded again
+            contents: dict[int, DocumentContents] = {}
+            ranking = ir.rank(query, mode=request.get("mode", "or"), contents=contents)[:k]
+            external_ids = ir.index.get_external_ids([doc_id for _, doc_id in ranking])
+            results = [
+                {"id": doc_id, "external_id": external_id, "score": score}
+                for (score, doc_id), external_id in zip(ranking, external_ids)]
+            if request.get("contents", True):
+                documents = ir.get_documents_contents([doc_id for _, doc_id in ranking], contents)
+                for result, document in zip(results, documents):
+                    result.update(author=document.author, title=document.title, body=document.body)
+        return {"results": results}
+
+    def health(self) -> dict[str, Any]:
+        """
+        Get the status of the server.
+        """
+        return {
+            "status": "ok",
+            "num_docs": self.num_docs,
+            "uptime": time.time() - self.start_time,
+            "available_connections": self.pool.irs.qsize(),
+        }
+
+    def get_metrics(self) -> dict[str, Any]:
+        """
+        Get the latency of each endpoint, the batching statistics, and the memory of the process and the caches.
+        """
+        return {
+            "latency": self.metrics.summary(),
+            "profile": self.profiler.summary() if self.profiler is not None else None,
+            "content_cache": self.content_cache.info() if self.content_cache is not None else None,
+            "memory": {
+                "process": process_memory_usage(),
+                "index": self.index.memory_usage(),
+            },
+            "batches": [
+                {
+                    "scoring_function": batcher.scoring_function.__class__.__name__,
+                    "batches": batcher.num_batches,
+                    "requests": batcher.num_requests,
+                } for batcher in self.batchers
+            ]
+        }
+
+    def _handler(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class SearchRequestHandler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _respond(self, endpoint: str, start_time: float, status: int, body: dict[str, Any]):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+                server.metrics.record(endpoint, time.perf_counter() - start_time, error=status != 200)
+
+            def do_GET(self):
+                start_time = time.perf_counter()
+                if self.path == "/health":
+                    self._respond("health", start_time, 200, server.health())
+                elif self.path == "/metrics":
+                    self._respond("metrics", start_time, 200, server.get_metrics())
+                else:
+                    self._respond("unknown", start_time, 404, {"error": f"Unknown endpoint {self.path}"})
+
+            def do_POST(self):
+                start_time = time.perf_counter()
+                if self.path != "/search":
+                    self._respond("unknown", start_time, 404, {"error": f"Unknown endpoint {self.path}"})
+                    return
+                try:
+                    length = int(self.headers.get("Content-Length", 0))
+                    request = json.loads(self.rfile.read(length))
+                    response = server.search(request)
+                except (KeyError, ValueError) as e:
+                    self._respond("search", start_time, 400, {"error": repr(e)})
+                except Exception as e:
+                    self._respond("search", start_time, 500, {"error": repr(e)})
+                else:
+                    self._respond("search", start_time, 200, response)
+
+            def log_message(self, format, *args):
+                pass
+
+        return SearchRequestHandler
+
+    def serve(self, host: str = "127.0.0.1", port: int = 8080, socket_path: Optional[str] = None):
+        """
+        Serve requests until shutdown is called.
+
+        # Parameters
+        - host (str): The host to listen on.
+        - port (int): The port to listen on.
+        - socket_path (Optional[str]): If set, listen on this unix socket instead of host and port.
+        """
+        if socket_path is not None:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+            self.http_server = UnixHTTPServer(socket_path, self._handler())
+        else:
+            self.http_server = ThreadingHTTPServer((host, port), self._handler())
+        try:
+            self.http_server.serve_forever()
+        finally:
+            self.http_server.server_close()
+            if socket_path is not None and os.path.exists(socket_path):
+                os.remove(socket_path)
+
+    def shutdown(self):
+        """
+        Stop serving requests and stop the batching threads.
+        """
+        if self.http_server is not None:
+            self.http_server.shutdown()
+        for batcher in self.batchers:
+            batcher.close()
+
+
+def read_only_sqlite_index(path: str, cache_size: Optional[int] = None, mmap_size: Optional[int] = None, memory_budget: Optional[MemoryBudget] = None) -> SqliteIndex:
+    """
+    Open a SqliteIndex that can't modify the database, with a connection for each thread that uses it.
+
+    # Parameters
+    - path (str): The path of the index.
+    - cache_size (Optional[int]): The size in bytes of the page cache of each connection, the SqliteIndex default if None.
+    - mmap_size (Optional[int]): The maximum number of bytes mapped in memory, the SqliteIndex default if None.
+    - memory_budget (Optional[MemoryBudget]): If set, it replaces cache_size and mmap_size (see SqliteIndex).
+
+    # Returns
+    - SqliteIndex: The index.
+    """
+    return SqliteIndex(path, read_only=True, cache_size=cache_size, mmap_size=mmap_size, memory_budget=memory_budget)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serve an index over HTTP")
+    parser.add_argument("--index", type=str, required=True, help="Path of the SqliteIndex to serve")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--socket", type=str, default=None, help="Listen on a unix socket instead of host and port")
+    parser.add_argument("--pool-size", type=int, default=None, help="Number of queries processed in parallel")
+    parser.add_argument("--bm25-k", type=int, default=100, help="Number of results of the BM25F stage")
+    parser.add_argument("--neural-k", type=int, default=10, help="Number of results reranked by the neural stage, 0 to disable it")
+    parser.add_argument("--profile", action="store_true", help="Report the per-stage timers of the queries in /metrics")
+    parser.add_argument("--content-cache", type=int, default=0, help="Number of documents whose contents are cached in memory")
+    parser.add_argument("--sqlite-cache", type=int, default=None, help="MiB of SQLite page cache for each connection")
+    parser.add_argument("--sqlite-mmap", type=int, default=None, help="MiB of the index mapped in memory")
+    parser.add_argument("--memory-budget", type=int, default=None, help="MiB of memory for the index and its caches, replaces --sqlite-cache and --sqlite-mmap")
+    args = parser.parse_args()
+
+    scoring_functions: list[tuple[int, ScoringFunction]] = [(args.bm25_k, BM25FScoringFunction(1.2, 0.8))]
+    if args.neural_k > 0:
+        from mir.ir.impls.neural_scoring_function import NeuralScoringFunction
+        scoring_functions.append((args.neural_k, NeuralScoringFunction()))
+    # the index opens a connection for each thread, so the whole pool can share it
+    if args.memory_budget is not None:
+        if args.sqlite_cache is not None or args.sqlite_mmap is not None:
+            parser.error("--memory-budget can't be used with --sqlite-cache or --sqlite-mmap")
+        index = read_only_sqlite_index(
+            args.index,
+            memory_budget=MemoryBudget(args.memory_budget * 1024 * 1024, args.pool_size if args.pool_size is not None else os.cpu_count()))
+    else:
+        index = read_only_sqlite_index(
+            args.index,
+            args.sqlite_cache * 1024 * 1024 if args.sqlite_cache is not None else None,
+            args.sqlite_mmap * 1024 * 1024 if args.sqlite_mmap is not None else None)
+    server = SearchServer(lambda: index, scoring_functions=scoring_functions, pool_size=args.pool_size, profile=args.profile, content_cache_size=args.content_cache)
+    print(f"Serving {server.num_docs} documents on {args.socket if args.socket is not None else f'http://{args.host}:{args.port}'}")
+    try:
+        server.serve(args.host, args.port, args.socket)
+    except KeyboardInterrupt:
+        pass
@@ -1,9 +1,13 @@
 import math
+import random
 import unittest
 from unittest.mock import MagicMock
 from typing import List, Dict, Literal
+
+import numpy as np
+
 from mir.ir.document_info import DocumentInfo
-from mir.ir.impls.bm25f_scoring import BM25FScoringFunction
+from mir.ir.impls.bm25f_scoring import BM25F_FIELD_INDICES, BM25FScoringFunction
 from mir.ir.posting import Posting
 from mir.ir.term import Term
 
@@ -53,6 +57,31 @@ class TestBM25FScoringFunction(unittest.TestCase):
         # Expected result (replace with the actual expected value after computation)
         self.assertAlmostEqual(score, self.expected_value, places=4)
 
+    def test_plan_reused(self):
+        global_info = self.index_mock.get_global_info()
+        self.assertEqual(self.bm25f(self.document, self.postings, self.query, **global_info), self.bm25f(self.document, self.postings, self.query, **global_info))
+        # a new query gets a new plan
+        score = self.bm25f(self.document, self.postings, self.query[:1], **global_info)
+        self.assertEqual(score, self.bm25f.score(self.bm25f.prepare(self.query[:1], **global_info), self.document, self.postings[:1]))
+
+    def test_batch_identical(self):
+        rng = random.Random(0)
+        documents = [DocumentInfo(id=i, lengths=[rng.randint(0, 5), rng.randint(0, 20), rng.randint(1, 500)]) for i in range(200)]
+        postings = [
+            [Posting(term_id=term.id, doc_id=i, occurrences={field: rng.choice([0, 0, 1, 2, 7]) for field in ("author", "title", "body")})
+             for term in self.query if rng.random() < 0.7]
+            for i in range(len(documents))]
+        global_info = self.index_mock.get_global_info()
+        for bm25f in [self.bm25f, BM25FScoringFunction()]:
+            plan = bm25f.prepare(self.query, **global_info)
+            tf = np.zeros((len(documents), len(self.query), 3))
+            for i, document_postings in enumerate(postings):
+                for posting in document_postings:
+                    for field, field_index in BM25F_FIELD_INDICES.items():
+                        tf[i, plan.term_ids.index(posting.term_id), field_index] = posting.occurrences[field]
+            scores = bm25f.score_batch(plan, tf, np.array([document.lengths for document in documents]))
+            self.assertEqual(scores.tolist(), [bm25f(document, p, self.query, **global_info) for document, p in zip(documents, postings)])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,77 @@
+import gzip
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from mir.utils import dataset
+from mir.utils.dataset import count_collection_lines, msmarco_collection_to_contents
+
+
+class TestDataset(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.lines = [(i, f"passage number {i}\twith a tab") for i in range(10)]
+        text = "".join(f"{docno}\t{body}\n" for docno, body in self.lines)
+        self.paths = [f"{self.temp_dir.name}/collection.tsv", f"{self.temp_dir.name}/collection.tsv.gz"]
+        with open(self.paths[0], "w") as f:
+            f.write(text)
+        with gzip.open(self.paths[1], "wt") as f:
+            f.write(text)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_stream(self):
+        for path in self.paths:
+            docs = msmarco_collection_to_contents(path, chunk_size=16)
+            self.assertEqual(len(docs), len(self.lines))
+            self.assertEqual([(doc.doc_id, doc.body) for doc in docs], self.lines)
+
+    def test_resume(self):
+        for path in self.paths:
+            docs = msmarco_collection_to_contents(path)
+            for _ in range(4):
+                last = next(docs)
+            resumed = msmarco_collection_to_contents(path, start_offset=last.offset)
+            self.assertEqual(len(resumed), len(self.lines) - 4)
+            self.assertEqual([doc.doc_id for doc in resumed], [docno for docno, _ in self.lines[4:]])
+
+    def test_cached_line_count(self):
+        for path in self.paths:
+            self.assertEqual(count_collection_lines(path), len(self.lines))
+            self.assertTrue(os.path.exists(f"{path}.lines"))
+            # the cached count is used while the file doesn't change
+            with open(f"{path}.lines") as f:
+                key = f.read().rpartition(" ")[0]
+            with open(f"{path}.lines", "w") as f:
+                f.write(f"{key} 1000\n")
+            self.assertEqual(count_collection_lines(path), 1000)
+            docs = msmarco_collection_to_contents(path)
+            for _ in range(3):
+                last = next(docs)
+            self.assertEqual(count_collection_lines(path, last.offset), 997)
+            with open(f"{path}.lines", "w") as f:
+                f.write("0 0 1000\n")
+            self.assertEqual(count_collection_lines(path, last.offset, chunk_size=7), len(self.lines) - 3)
+
+    def test_interrupted_download(self):
+        class Response:
+            headers = {}
+
+            def raise_for_status(self):
+                pass
+
+            def iter_content(self, block_size):
+                yield b"partial"
+                raise KeyboardInterrupt()
+        with mock.patch.object(dataset, "DATA_DIR", self.temp_dir.name), \
+                mock.patch.object(dataset.requests, "get", return_value=Response()):
+            with self.assertRaises(KeyboardInterrupt):
+                dataset.get_msmarco_dataset()
+        # the partial file is removed, so it is downloaded again
+        self.assertEqual(os.listdir(f"{self.temp_dir.name}/msmarco"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
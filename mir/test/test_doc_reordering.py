@@ -0,0 +1,56 @@
+import random
+import tempfile
+import unittest
+
+from mir.ir.doc_reordering import graph_bisection_order, log_gap_bits
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.default_index import DefaultIndex
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.index_converter import convert_index
+from mir.ir.ir import Ir
+from mir.utils.synthetic import synthetic_word
+
+
+class TestDocReordering(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.tokenizer = DefaultTokenizer()
+        # documents about 20 topics with their own words, in random order
+        rng = random.Random(0)
+        self.ir = Ir(DefaultIndex(), self.tokenizer)
+        for doc_id in range(1000):
+            topic = rng.randrange(20)
+            body = " ".join(synthetic_word(1000 + 40 * topic + rng.randrange(40)) for _ in range(15))
+            self.ir.index_document(DocumentContents("", "", body, doc_id=doc_id))
+        self.queries = [f"{synthetic_word(1000 + 40 * topic)} {synthetic_word(1001 + 40 * topic)}" for topic in range(20)]
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_bisection(self):
+        doc_order = graph_bisection_order(self.ir.index)
+        self.assertEqual(sorted(doc_order), list(range(1000)))
+        target = SqliteIndex(f"{self.temp_dir.name}/reordered.db", posting_blocks=True)
+        convert_index(self.ir.index, target, doc_order)
+        self.assertLess(log_gap_bits(target), log_gap_bits(self.ir.index) / 2)
+
+        reordered = Ir(target, self.tokenizer)
+        for query in self.queries:
+            expected = [(doc.external_id, doc.score, doc.body) for doc in self.ir.search(query)]
+            results = [(doc.external_id, doc.score, doc.body) for doc in reordered.search(query)]
+            self.assertEqual(sorted(results), sorted(expected))
+            self.assertEqual(
+                sorted(target.get_external_ids([doc_id for _, doc_id in reordered.rank(query)])),
+                sorted(doc_id for _, doc_id in self.ir.rank(query)))
+        # the mapping is kept by a second conversion and by compaction
+        copy = DefaultIndex(f"{self.temp_dir.name}/copy.pkl")
+        convert_index(target, copy, list(reversed(list(target.get_doc_ids()))))
+        self.assertEqual(copy.get_external_ids([0, 999]), target.get_external_ids([999, 0]))
+        copy.delete_document(0, self.tokenizer)
+        copy.compact()
+        self.assertEqual(copy.get_external_ids([999]), target.get_external_ids([0]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import unittest
+
+import pandas as pd
+
+from mir.ir.document_cache import DocumentCache
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.count_scoring_function import CountScoringFunction
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir
+from mir.ir.search_trace import SearchTrace
+from mir.ir.scoring_function import ScoringFunction
+
+
+class BodyLengthScoringFunction(ScoringFunction):
+    def __call__(self, document_info, postings, query, **kwargs):
+        return len(kwargs["document_content"])
+
+
+class CountingIndex(SqliteIndex):
+    def __init__(self):
+        super().__init__()
+        self.fetched: list[list[int]] = []
+
+    def get_documents_contents(self, doc_ids):
+        self.fetched.append(list(doc_ids))
+        return super().get_documents_contents(doc_ids)
+
+
+class TestDocumentCache(unittest.TestCase):
+    def setUp(self):
+        self.index = CountingIndex()
+        self.ir = Ir(self.index, DefaultTokenizer(), [(4, CountScoringFunction()), (2, BodyLengthScoringFunction())])
+        for body in ["quick brown fox", "lazy dog", "quick dog", "brown dog and fox", "cat"]:
+            self.ir.index_document(DocumentContents("", "", body))
+
+    def test_lru(self):
+        cache = DocumentCache(2)
+        for doc_id in range(3):
+            cache.put(doc_id, DocumentContents("", "", str(doc_id)))
+        self.assertIsNone(cache.get(0))
+        self.assertEqual(cache.get(1).body, "1")
+        cache.put(3, DocumentContents("", "", "3"))
+        self.assertIsNone(cache.get(2))
+        self.assertEqual(len(cache), 2)
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_lazy_results(self):
+        trace = SearchTrace("quick dog fox")
+        results = list(self.ir.search("quick dog fox", trace))
+        # only the documents reranked by the second stage were loaded, in one batch
+        self.assertEqual(len(self.index.fetched), 1)
+        self.assertEqual(len(self.index.fetched[0]), 2)
+        self.assertEqual([doc.score for doc in results], sorted((doc.score for doc in results), reverse=True))
+        self.assertEqual([doc.body for doc in results], [self.index.get_document_contents(doc.id).body for doc in results])
+        # the other results were loaded in a single batch, without loading the reranked ones again
+        self.assertEqual(len(self.index.fetched), 2)
+        self.assertEqual(sorted(self.index.fetched[0] + self.index.fetched[1]), sorted(doc.id for doc in results))
+        self.assertEqual(trace.counters["contents_fetched"], 4)
+
+    def test_run_does_not_load_contents(self):
+        self.ir.scoring_functions = [(4, CountScoringFunction())]
+        run = self.ir.get_run(pd.DataFrame({"query_id": [1, 2], "text": ["quick dog", "fox"]}))
+        self.assertEqual(len(run), 6)
+        self.assertEqual(self.index.fetched, [])
+
+    def test_cache(self):
+        cache = self.ir.enable_content_cache(10)
+        for _ in range(2):
+            [doc.body for doc in self.ir.search("quick dog fox")]
+        self.assertEqual(len(self.index.fetched), 2)
+        self.assertEqual(cache.hits, 4)
+        self.ir.update_document(1, DocumentContents("", "", "quick quick dog"))
+        self.assertIn("quick quick dog", [doc.body for doc in self.ir.search("quick dog fox")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+import os
+import tempfile
+import unittest
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.document_store import DocumentStore
+from mir.ir.impls.default_index import DefaultIndex
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir
+from mir.utils.synthetic import SyntheticCollection
+
+
+class TestDocumentStore(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.docs = list(SyntheticCollection(200, seed=5).documents(start_doc_id=1))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_store(self):
+        path = f"{self.temp_dir.name}/store"
+        store = DocumentStore(path, block_size=16, cache_size=2)
+        for doc in self.docs:
+            store.put(doc.doc_id, doc)
+        # pending documents are readable before the flush
+        self.assertEqual(store.get(200).body, self.docs[-1].body)
+        store.close()
+
+        store = DocumentStore(path, block_size=16, cache_size=2)
+        doc_ids = [5, 6, 150, 7, 1]
+        self.assertEqual([doc.body for doc in store.get_many(doc_ids)], [self.docs[doc_id - 1].body for doc_id in doc_ids])
+        self.assertEqual((store.cache_misses, store.cache_hits), (2, 3))
+        self.assertNotIn(0, store)
+        with self.assertRaises(KeyError):
+            store.get(1000)
+
+        size = store.disk_size()
+        store.put(3, DocumentContents("new", "new", "new"))
+        for doc_id in range(100, 201):
+            store.delete(doc_id)
+        store.compact()
+        self.assertLess(store.disk_size(), size)
+        self.assertNotIn(150, store)
+        self.assertEqual(store.get(3).body, "new")
+        self.assertEqual(store.get(99).body, self.docs[98].body)
+        store.close()
+        store = DocumentStore(path)
+        self.assertEqual(store.get(3).author, "new")
+        store.close()
+
+    def test_interrupted_compact(self):
+        path = f"{self.temp_dir.name}/store"
+        store = DocumentStore(path, block_size=16)
+        for doc in self.docs:
+            store.put(doc.doc_id, doc)
+        for doc_id in range(1, 101):
+            store.delete(doc_id)
+        store.flush()
+
+        def stop():
+            raise KeyboardInterrupt()
+        # the process stops after writing the new data file, before the table references it
+        store.flush = lambda: None
+        store._write_table = stop
+        with self.assertRaises(KeyboardInterrupt):
+            store.compact()
+        store.file.close()
+        self.assertTrue(os.path.exists(f"{path}.1"))
+        reopened = DocumentStore(path)
+        self.assertFalse(os.path.exists(f"{path}.1"))
+        self.assertNotIn(50, reopened)
+        self.assertEqual(reopened.get(150).body, self.docs[149].body)
+        reopened.compact()
+        reopened.compact()
+        self.assertEqual(sorted(os.listdir(self.temp_dir.name)), ["store.2", "store.idx"])
+        reopened.close()
+        reopened = DocumentStore(path, read_only=True)
+        self.assertEqual([doc.body for doc in reopened.get_many([101, 200])], [self.docs[100].body, self.docs[199].body])
+        reopened.close()
+
+    def test_indexes(self):
+        tokenizer = DefaultTokenizer()
+        for make in [
+                lambda path, separate: SqliteIndex(path, separate_contents=separate),
+                lambda path, separate: DefaultIndex(path, separate_contents=separate)]:
+            irs = []
+            for separate in [False, True]:
+                path = f"{self.temp_dir.name}/index-{len(os.listdir(self.temp_dir.name))}"
+                ir = Ir(make(path, separate), tokenizer)
+                ir.bulk_index_documents(SyntheticCollection(200, seed=5).documents())
+                irs.append((path, ir))
+            (_, inline), (path, separate) = irs
+            self.assertTrue(os.path.exists(f"{path}.docs"))
+            query = " ".join(self.docs[10].body.split()[:3])
+            self.assertEqual(
+                [(doc.id, doc.body) for doc in inline.search(query)],
+                [(doc.id, doc.body) for doc in separate.search(query)])
+            # the setting is kept when the index is opened again
+            reopened = Ir(make(path, False), tokenizer)
+            self.assertIsNotNone(reopened.index.document_store)
+            self.assertEqual([doc.body for doc in reopened.search(query)], [doc.body for doc in separate.search(query)])
+            reopened.delete_document(5)
+            reopened.update_document(6, DocumentContents("a", "b", "replaced"))
+            reopened.compact()
+            self.assertEqual(reopened.index.get_document_contents(6).body, "replaced")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import unittest
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impact_index import ImpactIndex
+from mir.ir.impls.bm25f_scoring import BM25FScoringFunction
+from mir.ir.impls.default_index import DefaultIndex
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir
+from mir.ir.search_trace import SearchTrace
+from mir.utils.synthetic import SyntheticCollection
+
+
+class TestImpactIndex(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = DefaultTokenizer()
+        self.docs = list(SyntheticCollection(400, vocabulary_size=300, seed=5).documents())
+        self.queries = [" ".join(doc.body.split()[:4]) for doc in self.docs[:20]]
+
+    def make_ir(self, index) -> Ir:
+        ir = Ir(index, self.tokenizer, [(10, BM25FScoringFunction())])
+        for i, doc in enumerate(self.docs):
+            ir.index_document(DocumentContents(doc.author, doc.title, doc.body, doc_id=i))
+        return ir
+
+    def test_segments(self):
+        ir = self.make_ir(DefaultIndex())
+        impact_index = ImpactIndex.build(ir.index, bits=8)
+        self.assertEqual(impact_index.num_slots, len(self.docs))
+        for term, (impacts, boundaries, doc_ids) in impact_index.segments.items():
+            self.assertTrue(all(impacts[i] > impacts[i + 1] for i in range(len(impacts) - 1)))
+            self.assertTrue(all(0 < impact < 256 for impact in impacts))
+            self.assertEqual(boundaries[-1], len(doc_ids))
+            self.assertEqual(len(set(doc_ids.tolist())), len(doc_ids))
+            term_id = ir.index.get_term_id(term)
+            self.assertLessEqual(len(doc_ids), ir.index.get_term(term_id).info["document_frequency"])
+
+    def test_same_results(self):
+        for index in [DefaultIndex(), SqliteIndex()]:
+            ir = self.make_ir(index)
+            ir.enable_impacts(ImpactIndex.build(ir.index, bits=16))
+            for query in self.queries:
+                expected = ir.rank(query)
+                ranking = ir.rank(query, mode="impact")
+                self.assertEqual([doc_id for _, doc_id in ranking], [doc_id for _, doc_id in expected])
+                for (score, _), (expected_score, _) in zip(ranking, expected):
+                    self.assertAlmostEqual(score, expected_score)
+
+    def test_early_termination(self):
+        ir = self.make_ir(DefaultIndex())
+        ir.enable_impacts(ImpactIndex.build(ir.index))
+        trace = SearchTrace(self.queries[0])
+        ir.rank(self.queries[0], trace, mode="impact")
+        total = trace.counters["postings_scanned"]
+        ir.enable_impacts(ir.impact_index, budget=total // 4)
+        trace = SearchTrace(self.queries[0])
+        ranking = ir.rank(self.queries[0], trace, mode="impact")
+        self.assertLessEqual(trace.counters["postings_scanned"], total // 4 + max(len(doc_ids) for _, _, doc_ids in ir.impact_index.segments.values()))
+        self.assertEqual(trace.counters["early_terminations"], 1)
+        self.assertEqual(len(ranking), 10)
+
+    def test_deleted_and_saved(self):
+        ir = self.make_ir(DefaultIndex())
+        impact_index = ImpactIndex.build(ir.index)
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "impacts.pkl")
+            impact_index.save(path)
+            ir.enable_impacts(ImpactIndex.load(path))
+        doc_ids = [doc_id for _, doc_id in ir.rank(self.queries[0], mode="impact")]
+        ir.delete_document(doc_ids[0])
+        self.assertNotIn(doc_ids[0], [doc_id for _, doc_id in ir.rank(self.queries[0], mode="impact")])
+        ir.disable_impacts()
+        with self.assertRaises(ValueError):
+            ir.rank(self.queries[0], mode="impact")
+
+
+if __name__ == "__main__":
+    unittest.main()
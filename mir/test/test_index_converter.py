@@ -0,0 +1,77 @@
+import tempfile
+import unittest
+
+from mir.ir.impls.default_index import DefaultIndex
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sharded_index import ShardedIndex
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.index_converter import convert_index, lexicographic_order
+from mir.ir.ir import Ir
+from mir.utils.synthetic import SyntheticCollection
+
+
+class TestIndexConverter(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.tokenizer = DefaultTokenizer()
+        collection = SyntheticCollection(400, seed=4)
+        self.source = Ir(SqliteIndex(f"{self.temp_dir.name}/source.db", positions=True), self.tokenizer)
+        self.source.bulk_index_documents(collection.documents())
+        self.source.delete_document(10)
+        self.queries = list(collection.queries(20, skip_top_words=5)["text"].unique())
+        self.phrase = " ".join(self.source.index.get_document_contents(20).body.split()[3:6])
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_convert(self):
+        targets = [
+            DefaultIndex(f"{self.temp_dir.name}/target.pkl", positions=True),
+            SqliteIndex(f"{self.temp_dir.name}/target.db", posting_blocks=True, separate_contents=True)]
+        for target in targets:
+            convert_index(self.source.index, target)
+            self.assertEqual(len(target), 399)
+            self.assertEqual(target.get_global_info(), self.source.index.get_global_info())
+            ir = Ir(target, self.tokenizer)
+            for query in self.queries:
+                self.assertEqual(ir.rank(query), self.source.rank(query))
+            if target.positions:
+                self.assertNotEqual(ir.rank(self.phrase, mode="phrase"), [])
+                self.assertEqual(ir.rank(self.phrase, mode="phrase"), self.source.rank(self.phrase, mode="phrase"))
+        # the converted index is saved and can be converted back
+        reloaded = DefaultIndex(f"{self.temp_dir.name}/target.pkl")
+        back = SqliteIndex(f"{self.temp_dir.name}/back.db", positions=True)
+        convert_index(reloaded, back)
+        self.assertEqual(Ir(back, self.tokenizer).rank(self.phrase, mode="phrase"), self.source.rank(self.phrase, mode="phrase"))
+        with self.assertRaises(ValueError):
+            convert_index(reloaded, back)
+        targets[1].close()
+
+    def test_reorder(self):
+        doc_order = lexicographic_order(self.source.index)
+        self.assertEqual(sorted(doc_order), list(self.source.index.get_doc_ids()))
+        target = SqliteIndex(f"{self.temp_dir.name}/target.db")
+        convert_index(self.source.index, target, doc_order)
+        ir = Ir(target, self.tokenizer)
+        for query in self.queries:
+            self.assertEqual(
+                sorted((score, doc_order[doc_id]) for score, doc_id in ir.rank(query)),
+                sorted(self.source.rank(query)))
+
+    def test_capabilities(self):
+        sharded = ShardedIndex(f"{self.temp_dir.name}/shards", num_shards=2)
+        self.assertTrue(sharded.supports_deletion)
+        # the shards can't be listed or filled as a whole, nothing is copied
+        target = DefaultIndex()
+        with self.assertRaises(ValueError):
+            convert_index(sharded, target)
+        with self.assertRaises(ValueError):
+            convert_index(self.source.index, sharded)
+        with self.assertRaises(ValueError):
+            lexicographic_order(sharded)
+        self.assertEqual(len(target), 0)
+        self.assertEqual(len(sharded), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import os
+import pickle
+import tempfile
+import unittest
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.bm25f_scoring import BM25FScoringFunction
+from mir.ir.impls.default_index import DefaultIndex
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir
+from mir.ir.tombstones import Tombstones
+
+
+class TestIndexDeletion(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = DefaultTokenizer()
+        self.docs = [
+            ("author1", "title1", "apple banana cherry"),
+            ("author2", "title2", "banana cherry date"),
+            ("author3", "title3", "cherry date elderberry"),
+        ]
+
+    def make_irs(self) -> list[Ir]:
+        irs = [Ir(SqliteIndex(), self.tokenizer), Ir(DefaultIndex(), self.tokenizer)]
+        for ir in irs:
+            for i, (author, title, body) in enumerate(self.docs):
+                ir.index_document(DocumentContents(author, title, body, doc_id=i))
+        return irs
+
+    def test_tombstones(self):
+        tombstones = Tombstones([3, 17])
+        self.assertTrue(tombstones.add(100))
+        self.assertFalse(tombstones.add(3))
+        self.assertIn(17, tombstones)
+        self.assertNotIn(16, tombstones)
+        self.assertEqual(list(tombstones), [3, 17, 100])
+        self.assertTrue(tombstones.discard(17))
+        self.assertEqual(len(tombstones), 2)
+
+    def test_delete(self):
+        for ir in self.make_irs():
+            banana = ir.index.get_term_id("banana")
+            ir.delete_document(1)
+            self.assertEqual(len(ir), 2)
+            self.assertEqual(ir.index.get_term(banana).info["document_frequency"], 1)
+            self.assertEqual(ir.index.get_global_info()["avg_field_lengths"]["body"], 3)
+            ids = [doc.id for doc in ir.search("banana date")]
+            self.assertNotIn(1, ids)
+            self.assertEqual(sorted(ids), [0, 2])
+            with self.assertRaises(ValueError):
+                ir.delete_document(1)
+
+    def test_get_terms(self):
+        for ir in self.make_irs():
+            banana, missing, cherry = ir.index.get_terms(["banana", "missing", "cherri"])
+            self.assertIsNone(missing)
+            self.assertEqual(banana.id, ir.index.get_term_id("banana"))
+            self.assertEqual((banana.info["document_frequency"], banana.info["posting_size"]), (2, 2))
+            self.assertEqual(cherry.info["document_frequency"], 3)
+            ir.delete_document(1)
+            banana, = ir.index.get_terms(["banana"])
+            self.assertEqual((banana.info["document_frequency"], banana.info["posting_size"]), (1, 2))
+            ir.compact()
+            banana, = ir.index.get_terms(["banana"])
+            self.assertEqual((banana.info["document_frequency"], banana.info["posting_size"]), (1, 1))
+            self.assertEqual(ir.index.get_terms([]), [])
+
+    def test_update(self):
+        for ir in self.make_irs():
+            ir.update_document(0, DocumentContents("author1", "title1", "fig grape"))
+            self.assertEqual(len(ir), 3)
+            self.assertEqual([doc.id for doc in ir.search("apple")], [])
+            self.assertEqual([doc.id for doc in ir.search("grape")], [0])
+            banana = ir.index.get_term_id("banana")
+            self.assertEqual(ir.index.get_term(banana).info["document_frequency"], 1)
+
+    def test_search_deleted_term(self):
+        # the only document of "zebra" is deleted, its document frequency is 0 until compact
+        for make_index in [SqliteIndex, DefaultIndex]:
+            for columnar in [True, False]:
+                scoring_function = BM25FScoringFunction()
+                if not columnar:
+                    scoring_function.columnar_call = None
+                ir = Ir(make_index(), self.tokenizer, [(10, scoring_function)])
+                for i, body in enumerate(["zebra apple", "apple banana", "apple cherry"]):
+                    ir.index_document(DocumentContents("", "", body, doc_id=i))
+                ir.delete_document(0)
+                self.assertEqual(sorted(doc.id for doc in ir.search("zebra apple")), [1, 2])
+                self.assertEqual(ir.rank("zebra apple"), ir.rank("apple"))
+
+    def test_compact(self):
+        for ir in self.make_irs():
+            ir.delete_document(2)
+            ir.compact()
+            self.assertEqual(len(ir), 2)
+            self.assertEqual(len(ir.index.get_tombstones()), 0 if isinstance(ir.index, SqliteIndex) else 1)
+            elderberry = ir.index.get_term_id("elderberri")
+            if isinstance(ir.index, SqliteIndex):
+                # the terms left without postings are dropped
+                self.assertIsNone(elderberry)
+            else:
+                self.assertEqual(list(ir.index.get_postings(elderberry)), [])
+            self.assertEqual(sorted(doc.id for doc in ir.search("cherry")), [0, 1])
+
+    def test_saved_formats(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "index.pkl")
+            index = DefaultIndex(path)
+            ir = Ir(index, self.tokenizer)
+            for i, (author, title, body) in enumerate(self.docs):
+                ir.index_document(DocumentContents(author, title, body, doc_id=i))
+            ir.delete_document(1)
+            index.save()
+            loaded = DefaultIndex(path)
+            self.assertEqual(len(loaded), 2)
+            self.assertEqual(loaded.memory_usage()["resident"], index.memory_usage()["resident"])
+            # the tuples saved by older versions, the baseline one without tombstones and statistics
+            for fields in [
+                    (index.postings, index.document_info, index.document_contents, index.terms, index.term_lookup, index.total_field_lengths, index.tombstones),
+                    (index.postings, index.document_info, index.document_contents, index.terms, index.term_lookup)]:
+                for term in index.terms:
+                    term.info.pop("min_document_length", None)
+                with open(path, "wb") as f:
+                    pickle.dump(fields, f)
+                loaded = DefaultIndex(path)
+                self.assertEqual(len(loaded), 2 if len(fields) == 7 else 3)
+                self.assertFalse(loaded.positions)
+                cherry = loaded.get_term(loaded.get_term_id("cherri"))
+                self.assertEqual(cherry.info["document_frequency"], 2 if len(fields) == 7 else 3)
+                self.assertEqual(sorted(doc.id for doc in Ir(loaded, self.tokenizer).search("cherry")), [0, 2] if len(fields) == 7 else [0, 1, 2])
+            with open(path, "wb") as f:
+                f.write(b"not an index")
+            with self.assertRaises(ValueError):
+                DefaultIndex(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
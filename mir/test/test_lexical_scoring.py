@@ -0,0 +1,139 @@
+import math
+import sqlite3
+import tempfile
+import unittest
+
+import numpy as np
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.document_info import DocumentInfo
+from mir.ir.impls.bm25plus_scoring import BM25PlusScoringFunction
+from mir.ir.impls.default_index import DefaultIndex
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.dfree_scoring import DFReeScoringFunction
+from mir.ir.impls.dirichlet_scoring import DirichletScoringFunction
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir
+from mir.ir.posting import Posting
+from mir.ir.scoring_function import ScoringBatch
+from mir.ir.term import Term
+from mir.utils.synthetic import SyntheticCollection
+
+
+class TestLexicalScoring(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = DefaultTokenizer()
+        self.docs = list(SyntheticCollection(200, vocabulary_size=150, seed=3).documents())
+        self.scoring_functions = [BM25PlusScoringFunction(), DFReeScoringFunction(), DirichletScoringFunction(mu=100)]
+
+    def make_ir(self, index) -> Ir:
+        ir = Ir(index, self.tokenizer)
+        for i, doc in enumerate(self.docs):
+            ir.index_document(DocumentContents(doc.author, doc.title, doc.body, doc_id=i))
+        return ir
+
+    def check_term_statistics(self, index, exact: bool):
+        tombstones = index.get_tombstones()
+        document_lengths = {doc_id: sum(index.get_document_info(doc_id).lengths) for doc_id in index.get_doc_ids()}
+        total_field_lengths = {"author": 0, "title": 0, "body": 0}
+        for term_id in index.get_term_ids():
+            info = index.get_term(term_id).info
+            postings = [posting for posting in index.get_postings(term_id) if posting.doc_id not in tombstones]
+            for field in total_field_lengths:
+                field_frequency = sum(posting.occurrences[field] for posting in postings)
+                self.assertEqual(info[f"collection_frequency_{field}"], field_frequency)
+                total_field_lengths[field] += field_frequency
+            self.assertEqual(info["collection_frequency"], sum(sum(posting.occurrences.values()) for posting in postings))
+            if len(postings) == 0:
+                continue
+            max_tf = max(sum(posting.occurrences.values()) for posting in postings)
+            min_document_length = min(document_lengths[posting.doc_id] for posting in postings)
+            if exact:
+                self.assertEqual(info["max_tf"], max_tf)
+                self.assertEqual(info["min_document_length"], min_document_length)
+            else:
+                self.assertGreaterEqual(info["max_tf"], max_tf)
+                self.assertLessEqual(info["min_document_length"], min_document_length)
+        global_info = index.get_global_info()
+        self.assertEqual(global_info["total_field_lengths"], total_field_lengths)
+        self.assertEqual(global_info["collection_length"], sum(total_field_lengths.values()))
+
+    def test_term_statistics(self):
+        for index in [DefaultIndex(), SqliteIndex(), SqliteIndex(posting_blocks=True)]:
+            ir = self.make_ir(index)
+            self.check_term_statistics(ir.index, exact=True)
+            for doc_id in range(0, len(self.docs), 7):
+                ir.delete_document(doc_id)
+            ir.update_document(1, DocumentContents("", "", self.docs[2].body * 3))
+            self.check_term_statistics(ir.index, exact=False)
+            ir.index.compact()
+            self.check_term_statistics(ir.index, exact=True)
+
+    def test_migrated_term_statistics(self):
+        # an index created before the statistics were stored gets them when it is opened
+        for posting_blocks in [False, True]:
+            with tempfile.TemporaryDirectory() as directory:
+                path = f"{directory}/index.db"
+                ir = self.make_ir(SqliteIndex(path, posting_blocks=posting_blocks))
+                for doc_id in range(0, len(self.docs), 7):
+                    ir.delete_document(doc_id)
+                ir.index.close()
+                connection = sqlite3.connect(path)
+                for column in ["collection_frequency", "collection_frequency_author", "collection_frequency_title",
+                               "collection_frequency_body", "max_tf", "min_document_length"]:
+                    connection.execute(f"alter table terms drop column {column}")
+                connection.commit()
+                connection.close()
+                index = SqliteIndex(path)
+                self.check_term_statistics(index, exact=True)
+                index.close()
+
+    def test_scalar_and_columnar(self):
+        ir = self.make_ir(DefaultIndex())
+        global_info = ir.index.get_global_info()
+        # the first word twice, so a term has two columns
+        words = self.docs[0].body.split()[:3]
+        query = [term for term in ir.index.get_terms([token.text for token in self.tokenizer.tokenize_query(" ".join(words[:1] + words))]) if term is not None]
+        doc_ids = list(range(40))
+        postings = [[] for _ in doc_ids]
+        for term in {term.id: term for term in query}.values():
+            for posting in ir.index.get_postings(term.id):
+                if posting.doc_id in doc_ids:
+                    postings[posting.doc_id].append(posting)
+        infos = [ir.index.get_document_info(doc_id) for doc_id in doc_ids]
+        batch = ScoringBatch.from_postings(doc_ids, [info.lengths for info in infos], postings, query)
+        for scoring_function in self.scoring_functions:
+            scores = scoring_function.columnar_call(batch, query, **global_info)
+            for i, info in enumerate(infos):
+                self.assertEqual(scoring_function(info, postings[i], query, **global_info), scores[i])
+            self.assertTrue(np.all(np.isfinite(scores)))
+
+    def test_ranking(self):
+        ir = self.make_ir(SqliteIndex())
+        for scoring_function in self.scoring_functions:
+            ir.scoring_functions = [(10, scoring_function)]
+            ranking = ir.rank(self.docs[5].body)
+            self.assertEqual(len(ranking), 10)
+            self.assertEqual([score for score, _ in ranking], sorted([score for score, _ in ranking], reverse=True))
+
+    def test_values(self):
+        document = DocumentInfo(0, [0, 2, 8])
+        postings = [Posting(0, 1, {"title": 1, "body": 2})]
+        query = [Term("a", 1, document_frequency=5, collection_frequency=20), Term("b", 2, document_frequency=2, collection_frequency=4)]
+        global_info = {"num_docs": 10, "avg_field_lengths": {"author": 0.0, "title": 2.0, "body": 18.0}, "collection_length": 200}
+        tf, dl = 3, 10
+        self.assertAlmostEqual(
+            DirichletScoringFunction(mu=50)(document, postings, query, **global_info),
+            math.log((tf + 50 * 20 / 200) / (dl + 50)) + math.log((50 * 4 / 200) / (dl + 50)))
+        self.assertAlmostEqual(
+            BM25PlusScoringFunction(k1=1.2, b=0.75, delta=1.0)(document, postings, query, **global_info),
+            math.log(11 / 5) * (2.2 * tf / (1.2 * (0.25 + 0.75 * dl / 20) + tf) + 1.0))
+        prior, posterior, inverse_prior = tf / dl, (tf + 1) / (dl + 1), 200 / 20
+        self.assertAlmostEqual(
+            DFReeScoringFunction()(document, postings, query, **global_info),
+            tf * math.log2(posterior / prior) * (
+                tf * -math.log2(prior * inverse_prior) + (tf + 1) * math.log2(posterior * inverse_prior) + 0.5 * math.log2(posterior / prior)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import tempfile
+import unittest
+
+from mir.ir.document_store import DocumentStore
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir
+from mir.ir.memory_budget import MemoryBudget
+from mir.ir.posting import Posting
+from mir.ir.posting_cache import PostingListCache
+from mir.ir.search_trace import SearchTrace
+from mir.utils.synthetic import SyntheticCollection
+
+
+class TestMemoryBudget(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = f"{self.temp_dir.name}/index.db"
+        self.tokenizer = DefaultTokenizer()
+        index = SqliteIndex(self.path, separate_contents=True)
+        writer = Ir(index, self.tokenizer)
+        writer.bulk_index_documents(SyntheticCollection(300, seed=3).documents())
+        self.queries = list(SyntheticCollection(300, seed=3).queries(20)["text"].unique())
+        self.expected = {query: writer.rank(query) for query in self.queries}
+        index.close()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_allocate(self):
+        budget = MemoryBudget(1000, connections=2, posting_cache_fraction=0.5, document_cache_fraction=0.1)
+        allocation = budget.allocate({"document_lengths": 100, "lexicon": 2000, "small": 300})
+        self.assertEqual(allocation["resident"], {"document_lengths": 100, "small": 300})
+        self.assertEqual(allocation["paged"], ["lexicon"])
+        self.assertEqual(allocation["posting_cache"], 300)
+        self.assertEqual(allocation["document_cache"], 60)
+        self.assertEqual(allocation["page_cache"], 120)
+        self.assertEqual(allocation["mmap"], 0)
+        # the shares of the missing caches go to the page cache
+        self.assertEqual(budget.allocate({}, posting_cache=False, document_cache=False)["page_cache"], 500)
+        self.assertEqual(budget.split(4).total, 250)
+
+    def test_resident(self):
+        index = SqliteIndex(self.path, read_only=True, memory_budget=MemoryBudget(64 * 1024 * 1024))
+        ir = Ir(index, self.tokenizer)
+        reference = Ir(SqliteIndex(self.path, read_only=True), self.tokenizer)
+        self.assertIsNotNone(index.resident_terms)
+        self.assertIsNotNone(index.resident_lengths)
+        for query in self.queries:
+            self.assertEqual(ir.rank(query), self.expected[query])
+            self.assertEqual(ir.rank(query, mode="and"), reference.rank(query, mode="and"))
+        reference.index.close()
+        # the lexicon, the lengths and the cached posting lists need no query
+        trace = SearchTrace(self.queries[0])
+        ir.rank(self.queries[0], trace)
+        self.assertEqual(trace.counters.get("sql_calls", 0), 0)
+        usage = ir.memory_usage()
+        self.assertGreater(usage["process"]["rss"], 0)
+        self.assertEqual(set(usage["index"]["resident"]), {"document_lengths", "lexicon"})
+        self.assertEqual(usage["index"]["mmap"], 0)
+        self.assertGreater(usage["index"]["posting_cache"]["hits"], 0)
+        self.assertLessEqual(usage["index"]["posting_cache"]["bytes"], usage["index"]["posting_cache"]["capacity"])
+        ir.get_documents_contents([doc_id for _, doc_id in self.expected[self.queries[0]]])
+        self.assertGreater(index.memory_usage()["document_store"]["misses"], 0)
+        index.close()
+
+    def test_small_budget(self):
+        # nothing fits, the structures are read from the database
+        index = SqliteIndex(self.path, read_only=True, memory_budget=MemoryBudget(1024))
+        ir = Ir(index, self.tokenizer)
+        self.assertIsNone(index.resident_terms)
+        self.assertIsNone(index.resident_lengths)
+        self.assertEqual(index.memory_usage()["paged"], ["document_lengths", "lexicon"])
+        for query in self.queries:
+            self.assertEqual(ir.rank(query), self.expected[query])
+        self.assertEqual(index.memory_usage()["posting_cache"]["entries"], 0)
+        index.close()
+
+    def test_caches(self):
+        cache = PostingListCache(1000, max_entry_fraction=0.5)
+        postings = [Posting(doc_id, 0) for doc_id in range(3)]
+        cache.put(0, [0, 1, 2], postings, 400)
+        cache.put(1, [0, 1, 2], postings, 400)
+        self.assertIsNotNone(cache.get(0))
+        cache.put(2, [0, 1, 2], postings, 400)
+        # term 1 was the least recently used
+        self.assertIsNone(cache.get(1))
+        self.assertFalse(cache.admits(600))
+        cache.put(3, [0, 1, 2], postings, 600)
+        self.assertEqual(cache.info(), {"entries": 2, "bytes": 800, "capacity": 1000, "hits": 1, "misses": 1})
+
+        store = DocumentStore(f"{self.path}.docs", read_only=True, cache_size=1000, cache_bytes=20000)
+        for doc_id in range(1, 301, 7):
+            store.get(doc_id)
+        info = store.cache_info()
+        self.assertLessEqual(info["bytes"], 20000)
+        self.assertGreater(info["blocks"], 0)
+        store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
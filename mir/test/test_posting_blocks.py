@@ -0,0 +1,65 @@
+import tempfile
+import unittest
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir
+from mir.ir.positions import encode_positions
+from mir.ir.posting import Posting
+from mir.ir.posting_block import decode_posting_block, encode_posting_block
+from mir.utils.synthetic import SyntheticCollection
+
+
+class TestPostingBlocks(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_codec(self):
+        postings = [
+            Posting(3, 7, {"author": 0, "title": 1, "body": 2}, encode_positions({"title": [4], "body": [1, 300]})),
+            Posting(10, 7, {"author": 1, "title": 0, "body": 0}, encode_positions({"author": [0]})),
+            Posting(100000, 7, {"author": 0, "title": 0, "body": 1}, encode_positions({"body": [2]}))]
+        decoded = decode_posting_block(encode_posting_block(postings), 7)
+        self.assertEqual(
+            [(posting.doc_id, posting.term_id, posting.occurrences, posting.get_positions()) for posting in decoded],
+            [(posting.doc_id, posting.term_id, posting.occurrences, posting.get_positions()) for posting in postings])
+        without_positions = [Posting(posting.doc_id, 7, posting.occurrences) for posting in postings]
+        self.assertIsNone(decode_posting_block(encode_posting_block(without_positions), 7)[0].positions)
+
+    def test_index(self):
+        tokenizer = DefaultTokenizer()
+        collection = SyntheticCollection(600, seed=3)
+        rows = Ir(SqliteIndex(f"{self.temp_dir.name}/rows.db", positions=True), tokenizer)
+        blocks = Ir(SqliteIndex(f"{self.temp_dir.name}/blocks.db", positions=True, posting_blocks=True), tokenizer)
+        rows.bulk_index_documents(collection.documents())
+        blocks.bulk_index_documents(collection.documents())
+        queries = list(collection.queries(20, skip_top_words=5)["text"].unique())
+        def check():
+            for query in queries:
+                for mode in ["or", "and"]:
+                    self.assertEqual(rows.rank(query, mode=mode), blocks.rank(query, mode=mode))
+        check()
+        self.assertGreater(blocks.index.connection.execute("select max(posting_count) from posting_blocks").fetchone()[0], 100)
+
+        for ir in [rows, blocks]:
+            ir.delete_document(5)
+            ir.update_document(7, DocumentContents("author", "title", queries[0]))
+            ir.index_document(DocumentContents("author", "title", queries[1]))
+        check()
+        for ir in [rows, blocks]:
+            ir.compact()
+        check()
+
+        rows.index.convert_to_posting_blocks()
+        self.assertEqual(rows.index.connection.execute("select count(*) from postings").fetchone()[0], 0)
+        check()
+        # the setting is kept when the index is opened again
+        self.assertTrue(SqliteIndex(f"{self.temp_dir.name}/rows.db").posting_blocks)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import random
+import unittest
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.default_index import DefaultIndex
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.posting import Posting
+from mir.ir.posting_cursor import BlockPostingCursor, GeneratorPostingCursor, ListPostingCursor, PostingCursor
+from mir.utils.synthetic import SyntheticCollection
+
+
+class TestPostingCursor(unittest.TestCase):
+    def check_cursor(self, make_cursor, doc_ids: list[int]):
+        rng = random.Random(0)
+        for _ in range(20):
+            cursor: PostingCursor = make_cursor()
+            self.assertEqual(cursor.doc_id, doc_ids[0] if len(doc_ids) > 0 else None)
+            position = 0
+            while cursor.doc_id is not None:
+                if rng.random() < 0.5:
+                    cursor.next()
+                    position += 1
+                else:
+                    target = doc_ids[position] + rng.randint(-2, 30)
+                    cursor.next_geq(target)
+                    position = next((i for i in range(position, len(doc_ids)) if doc_ids[i] >= target), len(doc_ids))
+                self.assertEqual(cursor.doc_id, doc_ids[position] if position < len(doc_ids) else None)
+
+    def test_cursors(self):
+        doc_ids = sorted(random.Random(1).sample(range(1000), 100))
+        postings = [Posting(doc_id, 0) for doc_id in doc_ids]
+        def fetch_block(doc_id: int, block_size: int) -> list[Posting]:
+            return [posting for posting in postings if posting.doc_id >= doc_id][:block_size]
+        self.check_cursor(lambda: GeneratorPostingCursor(iter(postings), len(postings)), doc_ids)
+        self.check_cursor(lambda: ListPostingCursor(doc_ids, postings), doc_ids)
+        for block_size in [1, 3, 100, 1000]:
+            self.check_cursor(lambda: BlockPostingCursor(fetch_block, len(postings), block_size), doc_ids)
+        self.assertIsNone(ListPostingCursor([], []).next_geq(5))
+        self.assertIsNone(BlockPostingCursor(lambda doc_id, block_size: [], 0).next())
+        # a cursor must implement next
+        with self.assertRaises(TypeError):
+            PostingCursor(0)
+
+    def test_indexes(self):
+        tokenizer = DefaultTokenizer()
+        for index in [SqliteIndex(), DefaultIndex()]:
+            for doc in SyntheticCollection(300, vocabulary_size=100, seed=2).documents():
+                index.index_document(DocumentContents(doc.author, doc.title, doc.body), tokenizer)
+            for term_id in [index.get_term_id(token.text) for token in tokenizer.tokenize_query("ba be bi bo bu")]:
+                doc_ids = [posting.doc_id for posting in index.get_postings(term_id)]
+                cursor = index.get_posting_cursor(term_id)
+                self.assertEqual(cursor.cost, len(doc_ids))
+                self.check_cursor(lambda: index.get_posting_cursor(term_id), doc_ids)
+
+
+if __name__ == "__main__":
+    unittest.main()
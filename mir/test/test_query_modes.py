@@ -0,0 +1,117 @@
+import random
+import unittest
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.bm25f_scoring import BM25FScoringFunction
+from mir.ir.impls.count_scoring_function import CountScoringFunction
+from mir.ir.impls.default_index import DefaultIndex
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir
+from mir.ir.positions import decode_positions, encode_positions, gallop
+from mir.ir.search_trace import SearchTrace
+from mir.utils.synthetic import SyntheticCollection
+
+
+class TestQueryModes(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = DefaultTokenizer()
+
+    def make_irs(self, docs: list[DocumentContents], positions: bool = True) -> list[Ir]:
+        irs = [Ir(SqliteIndex(positions=positions), self.tokenizer), Ir(DefaultIndex(positions=positions), self.tokenizer)]
+        for ir in irs:
+            for i, doc in enumerate(docs):
+                ir.index_document(DocumentContents(doc.author, doc.title, doc.body, doc_id=i))
+        return irs
+
+    def test_positions_codec(self):
+        positions = {"author": [0], "title": [], "body": [1, 2, 200, 100000]}
+        occurrences = {field: len(values) for field, values in positions.items()}
+        self.assertEqual(decode_positions(encode_positions(positions), occurrences), positions)
+
+    def test_gallop(self):
+        values = [1, 3, 5, 7, 9, 11, 13, 15, 17]
+        for low in range(len(values)):
+            for target in range(20):
+                expected = next((i for i in range(low, len(values)) if values[i] >= target), len(values))
+                self.assertEqual(gallop(values, target, low), expected)
+
+    def test_or(self):
+        docs = list(SyntheticCollection(300, vocabulary_size=500, seed=4).documents())
+        query = " ".join(doc.body.split()[0] for doc in docs[:30])
+        terms = set(token.text for token in self.tokenizer.tokenize_query(query))
+        expected = [
+            i for i, doc in enumerate(docs)
+            if len(terms & set(token.text for token in self.tokenizer.tokenize_document(doc))) > 0]
+        for ir in self.make_irs(docs, positions=False):
+            ir.scoring_functions = [(1000, ir.scoring_functions[0][1])]
+            trace = SearchTrace(query)
+            ranking = ir.rank(query, trace)
+            self.assertEqual(sorted(doc_id for _, doc_id in ranking), expected)
+            self.assertEqual(ranking, sorted(ranking, reverse=True))
+            self.assertEqual(trace.counters["documents_scored"], len(expected))
+
+    def test_and(self):
+        docs = list(SyntheticCollection(300, vocabulary_size=200, seed=3).documents())
+        rng = random.Random(3)
+        for ir in self.make_irs(docs, positions=False):
+            for _ in range(20):
+                words = rng.sample([word for doc in docs[:50] for word in doc.body.split()], 2)
+                query = " ".join(words)
+                or_scores = {doc_id: score for score, doc_id in ir.rank(query)}
+                and_ranking = ir.rank(query, mode="and")
+                terms = set(token.text for token in self.tokenizer.tokenize_query(query))
+                expected = [
+                    i for i, doc in enumerate(docs)
+                    if terms <= set(token.text for token in self.tokenizer.tokenize_document(doc))]
+                self.assertEqual(sorted(doc_id for _, doc_id in and_ranking), expected)
+                for score, doc_id in and_ranking:
+                    self.assertEqual(score, or_scores[doc_id])
+            self.assertEqual(ir.rank("zzzzzz " + docs[0].body, mode="and"), [])
+
+    def test_phrase(self):
+        docs = [
+            DocumentContents("anna smith", "new york", "the weather in new york is cold"),
+            DocumentContents("bob", "york", "a new house in york"),
+            DocumentContents("carl", "york new", "new new york"),
+        ]
+        for ir in self.make_irs(docs):
+            self.assertEqual(sorted(doc_id for _, doc_id in ir.rank("new york", mode="and")), [0, 1, 2])
+            trace = SearchTrace("new york")
+            self.assertEqual(sorted(doc_id for _, doc_id in ir.rank("new york", trace, mode="phrase")), [0, 2])
+            self.assertEqual(trace.counters["phrases_rejected"], 1)
+            self.assertEqual([doc.id for doc in ir.search("york cold", mode="phrase")], [0])
+            self.assertEqual([doc.id for doc in ir.search("anna smith", mode="phrase")], [0])
+            # the phrase can't cross two fields
+            self.assertEqual(list(ir.search("smith new", mode="phrase")), [])
+        for ir in self.make_irs(docs, positions=False):
+            with self.assertRaises(ValueError):
+                ir.rank("new york", mode="phrase")
+            with self.assertRaises(ValueError):
+                ir.rank("new york", mode="xor")
+
+    def test_columnar_scoring(self):
+        class ScalarCount(CountScoringFunction):
+            columnar_call = None
+
+        class ScalarBM25F(BM25FScoringFunction):
+            columnar_call = None
+
+        docs = list(SyntheticCollection(300, vocabulary_size=200, seed=6).documents())
+        queries = [" ".join(doc.body.split()[:5]) for doc in docs[:10]] + [" ".join([docs[0].body.split()[0]] * 2)]
+        for ir in self.make_irs(docs, positions=False):
+            # blocks smaller than the number of candidates, and a rerank stage
+            ir.scoring_block_size = 7
+            for scoring_functions, scalar_scoring_functions in [
+                    ([(50, BM25FScoringFunction())], [(50, ScalarBM25F())]),
+                    ([(50, CountScoringFunction()), (10, BM25FScoringFunction())], [(50, ScalarCount()), (10, ScalarBM25F())])]:
+                for query in queries:
+                    for mode in ("or", "and"):
+                        ir.scoring_functions = scalar_scoring_functions
+                        expected = ir.rank(query, mode=mode)
+                        ir.scoring_functions = scoring_functions
+                        self.assertEqual(ir.rank(query, mode=mode), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
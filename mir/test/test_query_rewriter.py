@@ -0,0 +1,100 @@
+import tempfile
+import unittest
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.bm25f_scoring import BM25FScoringFunction
+from mir.ir.impls.count_scoring_function import CountScoringFunction
+from mir.ir.impls.default_index import DefaultIndex
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.dirichlet_scoring import DirichletScoringFunction
+from mir.ir.impls.sharded_index import ShardedIndex
+from mir.ir.ir import Ir
+from mir.ir.query_rewriter import QueryRewriter
+from mir.ir.search_trace import SearchTrace
+from mir.ir.sharded_ir import ShardedIr
+from mir.ir.term import Term
+
+
+class TestQueryRewriter(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = DefaultTokenizer()
+        # "report" is in every document
+        self.bodies = [
+            "report on the quick brown fox", "report of a lazy dog", "the fox report",
+            "weather report for today", "report about brown bears", "annual report of the dog show",
+        ]
+        self.ir = Ir(DefaultIndex(), self.tokenizer)
+        for body in self.bodies:
+            self.ir.index_document(DocumentContents("", "", body))
+
+    def test_rewrite(self):
+        terms = [
+            Term("a", 0, document_frequency=90), Term("b", 1, document_frequency=5),
+            Term("a", 0, document_frequency=90), Term("c", 2, document_frequency=20), Term("b", 1, document_frequency=5)]
+        rewritten = QueryRewriter().rewrite(terms, 100)
+        self.assertEqual([(term.term, term.info["query_weight"]) for term in rewritten], [("a", 2), ("b", 2), ("c", 1)])
+        rewritten = QueryRewriter(max_document_fraction=0.5, common_term_weight=0.25).rewrite(terms, 100)
+        self.assertEqual([(term.term, term.info["query_weight"]) for term in rewritten], [("a", 0.5), ("b", 2), ("c", 1)])
+        trace = SearchTrace("a b a c b")
+        rewritten = QueryRewriter(max_document_fraction=0.5, max_terms=1).rewrite(terms, 100, trace)
+        self.assertEqual([term.term for term in rewritten], ["b"])
+        self.assertEqual(trace.counters["terms_dropped"], 2)
+        self.assertEqual(trace.info["query_rewriter"]["max_terms"], 1)
+        self.assertEqual(trace.info["query_rewriter"]["weights"], {"b": 2})
+        # a query of common terms is kept
+        self.assertEqual(len(QueryRewriter(max_document_fraction=0.01).rewrite(terms, 100)), 3)
+        # without dropping, the terms are only reweighted
+        rewritten = QueryRewriter(max_document_fraction=0.5, max_terms=1).rewrite(terms, 100, drop=False)
+        self.assertEqual([(term.term, term.info["query_weight"]) for term in rewritten], [("a", 0), ("b", 2), ("c", 1)])
+
+    def test_weights_keep_scores(self):
+        for scoring_function in [BM25FScoringFunction(), CountScoringFunction(), DirichletScoringFunction(mu=10)]:
+            self.ir.scoring_functions = [(10, scoring_function)]
+            self.ir.disable_query_rewriting()
+            expected = self.ir.rank("fox report fox brown")
+            self.ir.enable_query_rewriting(QueryRewriter())
+            ranking = self.ir.rank("fox report fox brown")
+            self.assertEqual(set(doc_id for _, doc_id in ranking), set(doc_id for _, doc_id in expected))
+            for (score, _), (expected_score, _) in zip(ranking, expected):
+                self.assertAlmostEqual(score, expected_score)
+
+    def test_common_terms_dropped(self):
+        self.ir.enable_query_rewriting(QueryRewriter(max_document_fraction=0.9))
+        trace = SearchTrace("report fox")
+        ranking = self.ir.rank("report fox", trace)
+        self.assertEqual(sorted(doc_id for _, doc_id in ranking), [0, 2])
+        self.assertEqual(trace.counters["terms"], 1)
+        self.assertEqual(trace.counters["terms_dropped"], 1)
+        self.assertEqual(trace.info["query_rewriter"]["max_document_fraction"], 0.9)
+
+    def test_and_mode_keeps_terms(self):
+        # every term of an "and" query is required, so none is dropped
+        self.ir.enable_query_rewriting(QueryRewriter(max_document_fraction=0.9))
+        trace = SearchTrace("report fox")
+        self.assertEqual(sorted(doc_id for _, doc_id in self.ir.rank("report fox", trace, mode="and")), [0, 2])
+        self.assertEqual(trace.counters["terms"], 2)
+        self.assertEqual(trace.counters.get("terms_dropped", 0), 0)
+        self.ir.enable_query_rewriting(QueryRewriter(max_terms=1))
+        self.assertEqual(self.ir.rank("lazy fox", mode="and"), [])
+        self.assertEqual(sorted(doc_id for _, doc_id in self.ir.rank("brown fox", mode="and")), [0])
+
+    def test_sharded(self):
+        with tempfile.TemporaryDirectory() as directory:
+            sharded_index = ShardedIndex(f"{directory}/shards", num_shards=3)
+            with ShardedIr(sharded_index, self.tokenizer, [(10, BM25FScoringFunction())]) as sharded:
+                for i, body in enumerate(self.bodies):
+                    sharded.index_document(DocumentContents("", "", body, doc_id=i))
+                self.ir.scoring_functions = [(10, BM25FScoringFunction())]
+                for query_rewriter in [QueryRewriter(), QueryRewriter(max_document_fraction=0.9), QueryRewriter(max_terms=1)]:
+                    self.ir.enable_query_rewriting(query_rewriter)
+                    sharded.enable_query_rewriting(query_rewriter)
+                    for query, mode in [("fox report fox", "or"), ("brown dog report", "or"), ("lazy fox", "or"), ("lazy fox", "and"), ("fox report", "and")]:
+                        expected = self.ir.rank(query, mode=mode)
+                        ranking = sharded.rank(query, mode=mode)
+                        self.assertEqual(set(doc_id for _, doc_id in ranking), set(doc_id for _, doc_id in expected))
+                        for (score, _), (expected_score, _) in zip(ranking, expected):
+                            self.assertAlmostEqual(score, expected_score)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import gc
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir
+from mir.utils.synthetic import SyntheticCollection
+
+
+class TestReadOnlyIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.path = f"{self.temp_dir.name}/index.db"
+        self.tokenizer = DefaultTokenizer()
+        index = SqliteIndex(self.path, separate_contents=True)
+        self.writer = Ir(index, self.tokenizer)
+        self.writer.bulk_index_documents(SyntheticCollection(300, seed=2).documents())
+        self.queries = list(SyntheticCollection(300, seed=2).queries(20, skip_top_words=10)["text"].unique())
+        self.expected = {query: self.writer.rank(query) for query in self.queries}
+        index.close()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_threads(self):
+        index = SqliteIndex(self.path, read_only=True, cache_size=1024 * 1024)
+        ir = Ir(index, self.tokenizer)
+        self.assertIsNotNone(index.document_store)
+        self.assertEqual(len(index), 300)
+        results = {}
+        def run(queries):
+            for query in queries:
+                results[query] = ir.rank(query)
+        threads = [threading.Thread(target=run, args=(self.queries[i::4],)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, self.expected)
+        # the main thread opened one connection, every worker thread another one
+        self.assertEqual(len(index.read_connections), 5)
+        del threads, thread
+        gc.collect()
+        self.assertEqual(len(index.free_read_connections), 4)
+        thread = threading.Thread(target=run, args=(self.queries,))
+        thread.start()
+        thread.join()
+        # the connections of the finished threads are reused
+        self.assertEqual(len(index.read_connections), 5)
+
+        with self.assertRaises(sqlite3.OperationalError):
+            ir.index_document(DocumentContents("author", "title", "body"))
+        index.close()
+        self.assertFalse(os.path.exists(f"{self.path}-wal") and os.path.getsize(f"{self.path}-wal") > 0)
+
+    def test_missing(self):
+        with self.assertRaises(ValueError):
+            SqliteIndex(f"{self.temp_dir.name}/missing.db", read_only=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,84 @@
+import tempfile
+import threading
+import time
+import unittest
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.bm25f_scoring import BM25FScoringFunction
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir
+from mir.ir.scoring_function import ScoringFunction
+from mir.server.search_client import SearchClient
+from mir.server.search_server import SearchServer, read_only_sqlite_index
+
+
+class LengthScoringFunction(ScoringFunction):
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, document_info, postings, query, **kwargs):
+        raise NotImplementedError()
+
+    def batched_call(self, document_contents, query_contents):
+        self.calls += 1
+        # give the batch time to fill
+        time.sleep(0.01)
+        return [len(document) / 100 for document in document_contents]
+
+
+class TestSearchServer(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.tokenizer = DefaultTokenizer()
+        index_path = f"{self.temp_dir.name}/index.db"
+        ir = Ir(SqliteIndex(index_path), self.tokenizer)
+        for body in ["the quick brown fox", "a lazy dog", "the quick dog jumps over the fox", "foxes and dogs"]:
+            ir.index_document(DocumentContents("", "", body))
+        self.reranker = LengthScoringFunction()
+        self.scoring_functions = [(3, BM25FScoringFunction()), (2, self.reranker)]
+        self.expected = Ir(SqliteIndex(index_path), self.tokenizer, self.scoring_functions)
+        self.server = SearchServer(
+            lambda: read_only_sqlite_index(index_path), self.tokenizer, self.scoring_functions,
+            pool_size=4, max_batch_wait=0.05)
+        self.socket_path = f"{self.temp_dir.name}/server.sock"
+        self.thread = threading.Thread(target=self.server.serve, kwargs={"socket_path": self.socket_path})
+        self.thread.start()
+        while self.server.http_server is None:
+            time.sleep(0.01)
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.thread.join()
+        self.temp_dir.cleanup()
+
+    def test_search(self):
+        with SearchClient(socket_path=self.socket_path) as client:
+            self.assertEqual(client.health()["num_docs"], 4)
+            results = client.search("quick fox")
+            expected = list(self.expected.search("quick fox"))
+            self.assertEqual([doc.id for doc in results], [doc.id for doc in expected])
+            self.assertEqual([doc.body for doc in results], [doc.body for doc in expected])
+            self.assertEqual(client.rank("dog", k=1), self.expected.rank("dog")[:1])
+            self.assertEqual(client.metrics()["latency"]["search"]["count"], 2)
+
+    def test_batching(self):
+        self.reranker.calls = 0
+        results = {}
+        def run(query):
+            with SearchClient(socket_path=self.socket_path) as client:
+                results[query] = client.rank(query)
+        queries = ["quick fox", "lazy dog", "fox", "dog"]
+        threads = [threading.Thread(target=run, args=(query,)) for query in queries]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLess(self.reranker.calls, len(queries))
+        self.assertEqual(self.server.batchers[0].num_requests, len(queries))
+        for query in queries:
+            self.assertEqual(results[query], self.expected.rank(query))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.bm25f_scoring import BM25FScoringFunction
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir
+from mir.ir.search_trace import Histogram, SearchTrace
+
+
+class TestSearchTrace(unittest.TestCase):
+    def setUp(self):
+        self.ir = Ir(SqliteIndex(), DefaultTokenizer(), [(2, BM25FScoringFunction())])
+        for body in ["quick brown fox", "lazy dog", "quick dog", "brown dog and fox"]:
+            self.ir.index_document(DocumentContents("", "", body))
+
+    def test_trace(self):
+        trace = SearchTrace("quick dog")
+        results = self.ir.rank("quick dog", trace)
+        self.assertEqual(results, self.ir.rank("quick dog"))
+        self.assertEqual(trace.counters["terms"], 2)
+        self.assertEqual(trace.counters["postings_scanned"], 5)
+        self.assertEqual(trace.counters["documents_scored"], 4)
+        self.assertEqual(trace.counters["heap_evictions"], 1)
+        self.assertGreater(trace.counters["sql_calls"], 0)
+        for stage in ["tokenize", "term_lookup", "posting_fetch", "merge", "document_info", "score"]:
+            self.assertIn(stage, trace.timings)
+
+    def test_profiler(self):
+        profiler = self.ir.enable_profiling()
+        for query in ["quick", "dog", "brown fox"]:
+            # the contents are loaded only when they are accessed
+            [doc.body for doc in self.ir.search(query)]
+        summary = profiler.summary()
+        self.assertEqual(summary["total"]["search"]["count"], 3)
+        self.assertEqual(summary["counters"]["documents_scored"]["count"], 3)
+        self.assertIn("content_fetch", summary["timings"])
+        self.ir.disable_profiling()
+        list(self.ir.search("quick"))
+        self.assertEqual(profiler.summary()["total"]["search"]["count"], 3)
+
+    def test_trace_reset(self):
+        profiler = self.ir.enable_profiling()
+        # a search stopped after the first result is recorded when the generator is closed
+        results = self.ir.search("dog")
+        next(results)
+        results.close()
+        self.assertEqual(profiler.summary()["total"]["search"]["count"], 1)
+
+        def fail(*args):
+            raise RuntimeError()
+        self.ir._rerank = fail
+        trace = SearchTrace("quick dog")
+        with self.assertRaises(RuntimeError):
+            self.ir.rank("quick dog", trace)
+        # the index stopped counting in the trace of the failed query
+        sql_calls = trace.counters["sql_calls"]
+        self.ir.index.get_global_info()
+        self.ir.index.connection.execute("select 1")
+        self.assertEqual(trace.counters["sql_calls"], sql_calls)
+
+    def test_histogram(self):
+        histogram = Histogram()
+        for value in [1, 2, 3, 4, 100]:
+            histogram.add(value)
+        self.assertEqual(histogram.count, 5)
+        self.assertEqual(histogram.percentile(0.5), 4)
+        self.assertEqual(histogram.percentile(1.0), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,95 @@
+import tempfile
+import unittest
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.bm25f_scoring import BM25FScoringFunction
+from mir.ir.impls.count_scoring_function import CountScoringFunction
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sharded_index import ShardedIndex
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.ir.ir import Ir
+from mir.ir.sharded_ir import ShardedIr
+from mir.utils.sized_generator import SizedGenerator
+
+
+class TestShardedIr(unittest.TestCase):
+    def setUp(self):
+        self.tokenizer = DefaultTokenizer()
+        self.bodies = [
+            "the quick brown fox", "jumps over the lazy dog", "a quick brown dog",
+            "lazy foxes sleep all day", "brown bears and brown foxes", "the dog barks at the fox",
+            "quick thinking saves the day", "dogs and foxes are canines",
+        ]
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_same_results_as_single_index(self):
+        scoring_functions = [(5, BM25FScoringFunction())]
+        single = Ir(SqliteIndex(), self.tokenizer, scoring_functions)
+        for partition in ["hash", "range"]:
+            sharded_index = ShardedIndex(f"{self.temp_dir.name}/{partition}", num_shards=3, partition=partition, range_size=3)
+            with ShardedIr(sharded_index, self.tokenizer, scoring_functions) as sharded:
+                for i, body in enumerate(self.bodies, start=1):
+                    doc = DocumentContents("", "", body, doc_id=i)
+                    sharded.index_document(doc)
+                    if partition == "hash":
+                        single.index_document(DocumentContents("", "", body, doc_id=i))
+                self.assertEqual(len(sharded), len(self.bodies))
+                self.assertTrue(all(len(shard) > 0 for shard in sharded_index.shards))
+                for query in ["quick fox", "lazy brown dog", "canines"]:
+                    expected = single.rank(query)
+                    results = sharded.rank(query)
+                    self.assertEqual([doc_id for _, doc_id in results], [doc_id for _, doc_id in expected])
+                    for (score, _), (expected_score, _) in zip(results, expected):
+                        self.assertAlmostEqual(score, expected_score)
+                terms = ["brown", "fox", "canin"]
+                statistics = sharded_index.get_term_statistics(terms)
+                for term in single.index.get_terms(terms):
+                    for key, value in statistics[term.term].items():
+                        self.assertEqual(value, term.info[key])
+                # the inherited guards of Ir see the attributes set by Ir.__init__
+                self.assertIsNone(sharded.impact_index)
+                self.assertEqual(sharded.scoring_block_size, single.scoring_block_size)
+                sharded.delete_document(2)
+                self.assertNotIn(2, [doc.id for doc in sharded.search("lazy dog")])
+
+    def test_bulk(self):
+        scoring_functions = [(5, BM25FScoringFunction())]
+        single = Ir(SqliteIndex(), self.tokenizer, scoring_functions)
+        single.bulk_index_documents(SizedGenerator((DocumentContents("", "", body) for body in self.bodies), len(self.bodies)))
+        sharded_index = ShardedIndex(f"{self.temp_dir.name}/bulk", num_shards=3)
+        commits = []
+        for shard_id, shard in enumerate(sharded_index.shards):
+            commit = shard._commit
+            shard._commit = lambda commit=commit, shard_id=shard_id: (commits.append(shard_id), commit())
+        sharded_index.bulk_index_documents(
+            SizedGenerator((DocumentContents("", "", body) for body in self.bodies), len(self.bodies)), self.tokenizer, batch_size=2)
+        # one commit per full batch of a shard and one at the end, not one per document
+        self.assertLess(len(commits), len(self.bodies))
+        self.assertEqual(sorted(doc_id for shard in sharded_index.shards for doc_id in shard.get_doc_ids()), list(range(1, 9)))
+        with ShardedIr(sharded_index, self.tokenizer, scoring_functions) as sharded:
+            for query in ["quick fox", "lazy brown dog", "canines"]:
+                self.assertEqual([doc_id for _, doc_id in sharded.rank(query)], [doc_id for _, doc_id in single.rank(query)])
+
+    def test_multi_stage(self):
+        # the second stage reranks the global top k of the first one, like in a single index
+        # (the queries have no ties at the cutoff of the first stage)
+        scoring_functions = [(5, BM25FScoringFunction()), (2, CountScoringFunction())]
+        single = Ir(SqliteIndex(), self.tokenizer, scoring_functions)
+        sharded_index = ShardedIndex(f"{self.temp_dir.name}/stages", num_shards=3)
+        with ShardedIr(sharded_index, self.tokenizer, scoring_functions) as sharded:
+            for i, body in enumerate(self.bodies, start=1):
+                sharded.index_document(DocumentContents("", "", body, doc_id=i))
+                single.index_document(DocumentContents("", "", body, doc_id=i))
+            for query in ["lazy brown dog", "the fox and the dog", "quick brown fox jumps", "lazy day"]:
+                expected = single.rank(query)
+                results = sharded.rank(query)
+                self.assertEqual([doc_id for _, doc_id in results], [doc_id for _, doc_id in expected])
+                for (score, _), (expected_score, _) in zip(results, expected):
+                    self.assertAlmostEqual(score, expected_score)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import tempfile
+import unittest
+
+from mir.ir.document_contents import DocumentContents
+from mir.ir.impls.default_tokenizers import DefaultTokenizer
+from mir.ir.impls.sqlite_index import SqliteIndex
+from mir.utils.dataset import msmarco_collection_to_contents
+from mir.utils.sized_generator import SizedGenerator
+
+
+def dump_index(index: SqliteIndex) -> dict[str, list[tuple]]:
+    tables = ["postings", "document_info", "document_contents", "terms", "global_info"]
+    return {table: index.connection.execute(f"select * from {table} order by 1, 2").fetchall() for table in tables}
+
+
+class TestSqliteIndex(unittest.TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.tokenizer = DefaultTokenizer()
+        words = ["apple", "banana", "cherry", "date", "elderberry", "fig", "grape"]
+        self.collection = f"{self.temp_dir.name}/collection.tsv"
+        with open(self.collection, "w") as f:
+            for i in range(25):
+                f.write(f"{i}\t{' '.join(words[j % len(words)] for j in range(i, i + 2 + i % 5))}\n")
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_resume_from_checkpoint(self):
+        expected = SqliteIndex(f"{self.temp_dir.name}/expected.db")
+        expected.bulk_index_documents(msmarco_collection_to_contents(self.collection), self.tokenizer, checkpoint_every=4)
+
+        path = f"{self.temp_dir.name}/resumed.db"
+        index = SqliteIndex(path)
+        docs = msmarco_collection_to_contents(self.collection)
+        def interrupted():
+            for i, doc in enumerate(docs):
+                if i == 10:
+                    raise KeyboardInterrupt()
+                yield doc
+        with self.assertRaises(KeyboardInterrupt):
+            index.bulk_index_documents(SizedGenerator(interrupted(), len(docs)), self.tokenizer, checkpoint_every=4)
+        index.connection.close()
+
+        index = SqliteIndex(path)
+        checkpoint = index.get_checkpoint()
+        self.assertEqual(checkpoint["batch"], 2)
+        self.assertEqual(checkpoint["documents"], 8)
+        self.assertFalse(checkpoint["completed"])
+        self.assertEqual(len(index), 8)
+        # the whole collection again, the reading restarts from the offset of the checkpoint
+        docs = msmarco_collection_to_contents(self.collection)
+        resume = docs.resume
+        resumed = []
+        docs.resume = lambda offset, length: resumed.append((offset, length)) or resume(offset, length)
+        index.bulk_index_documents(docs, self.tokenizer, checkpoint_every=4)
+        self.assertEqual(resumed, [(checkpoint["offset"], 17)])
+        # the documents before the offset were not read
+        self.assertEqual(next(docs).doc_id, 0)
+        checkpoint = index.get_checkpoint()
+        self.assertTrue(checkpoint["completed"])
+        self.assertEqual(checkpoint["documents"], 25)
+        self.assertEqual(dump_index(index), dump_index(expected))
+
+    def test_interrupted_in_process(self):
+        # the partial batch is dropped from the database, the pending postings and the document store
+        expected = SqliteIndex(f"{self.temp_dir.name}/expected.db", posting_blocks=True, separate_contents=True)
+        expected.bulk_index_documents(msmarco_collection_to_contents(self.collection), self.tokenizer, checkpoint_every=4)
+        index = SqliteIndex(f"{self.temp_dir.name}/resumed.db", posting_blocks=True, separate_contents=True)
+        docs = msmarco_collection_to_contents(self.collection)
+        def interrupted():
+            for i, doc in enumerate(docs):
+                if i == 10:
+                    raise KeyboardInterrupt()
+                yield doc
+        with self.assertRaises(KeyboardInterrupt):
+            index.bulk_index_documents(SizedGenerator(interrupted(), len(docs)), self.tokenizer, checkpoint_every=4)
+        self.assertEqual(len(index), 8)
+        self.assertEqual(sorted(index.get_doc_ids()), list(range(8)))
+        self.assertNotIn(9, index.document_store)
+        index.bulk_index_documents(msmarco_collection_to_contents(self.collection), self.tokenizer, checkpoint_every=4)
+        self.assertEqual(dump_index(index), dump_index(expected))
+        for term_id in expected.get_term_ids():
+            self.assertEqual(
+                [(posting.doc_id, posting.occurrences) for posting in index.get_postings(term_id)],
+                [(posting.doc_id, posting.occurrences) for posting in expected.get_postings(term_id)])
+        self.assertEqual(
+            [doc.body for doc in index.get_documents_contents(list(range(25)))],
+            [doc.body for doc in expected.get_documents_contents(list(range(25)))])
+        index.close()
+        expected.close()
+
+    def test_checkpoint_across_builds(self):
+        index = SqliteIndex()
+        index.bulk_index_documents(msmarco_collection_to_contents(self.collection), self.tokenizer, checkpoint_every=4)
+        more = [DocumentContents("", "", f"apple fig {i}", doc_id=100 + i) for i in range(10)]
+        def interrupted():
+            for i, doc in enumerate(more):
+                if i == 6:
+                    raise KeyboardInterrupt()
+                yield doc
+        with self.assertRaises(KeyboardInterrupt):
+            index.bulk_index_documents(SizedGenerator(interrupted(), len(more)), self.tokenizer, checkpoint_every=4)
+        checkpoint = index.get_checkpoint()
+        self.assertEqual((checkpoint["batch"], checkpoint["documents"], checkpoint["build_documents"]), (8, 29, 4))
+        self.assertEqual(len(index), 29)
+        index.bulk_index_documents(SizedGenerator((doc for doc in more), len(more)), self.tokenizer, checkpoint_every=4)
+        checkpoint = index.get_checkpoint()
+        self.assertEqual((checkpoint["batch"], checkpoint["documents"], checkpoint["build_documents"]), (10, 35, 10))
+        self.assertTrue(checkpoint["completed"])
+        self.assertEqual(sorted(index.get_doc_ids())[-10:], list(range(100, 110)))
+
+
+if __name__ == "__main__":
+    unittest.main()
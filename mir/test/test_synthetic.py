@@ -0,0 +1,40 @@
+from collections import Counter
+import unittest
+
+from mir.utils.synthetic import SyntheticCollection, synthetic_word
+
+
+class TestSynthetic(unittest.TestCase):
+    def test_words_are_distinct(self):
+        words = [synthetic_word(i) for i in range(10000)]
+        self.assertEqual(len(set(words)), len(words))
+        self.assertTrue(all(word.isalpha() for word in words))
+
+    def test_documents(self):
+        collection = SyntheticCollection(200, vocabulary_size=1000, seed=1)
+        docs = list(collection.documents(start_doc_id=10))
+        self.assertEqual(len(docs), 200)
+        self.assertEqual([doc.doc_id for doc in docs], list(range(10, 210)))
+        self.assertTrue(all(doc.author and doc.body for doc in docs))
+        # same seed, same documents
+        self.assertEqual([doc.body for doc in docs], [doc.body for doc in SyntheticCollection(200, vocabulary_size=1000, seed=1).documents(10)])
+        counts = Counter(word for doc in docs for word in doc.body.split())
+        ranked = [word for word, _ in counts.most_common()]
+        self.assertEqual(ranked[0], synthetic_word(0))
+        self.assertGreater(counts[synthetic_word(0)], 10 * counts[synthetic_word(99)])
+        mean_length = sum(len(doc.body.split()) for doc in docs) / len(docs)
+        self.assertAlmostEqual(mean_length, 56, delta=8)
+
+    def test_queries(self):
+        queries = SyntheticCollection(10, seed=1).queries(1000, num_distinct=300)
+        self.assertEqual(list(queries.columns), ["query_id", "text"])
+        self.assertEqual(len(queries), 1000)
+        frequencies = queries["query_id"].value_counts()
+        # head queries are repeated, most of the distinct queries are rare
+        self.assertGreater(frequencies.iloc[0], 50)
+        self.assertLessEqual(frequencies.median(), 3)
+        self.assertTrue((queries.groupby("query_id")["text"].nunique() == 1).all())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,5 +1,8 @@
 from collections.abc import Generator
+from typing import Optional
 import gzip
+import io
+import shutil
 import tarfile
 import requests
 from mir import DATA_DIR
@@ -10,6 +13,8 @@ from tqdm.auto import tqdm
 from mir.ir.document_contents import DocumentContents
 from mir.utils.sized_generator import SizedGenerator
 
+COLLECTION_CHUNK_SIZE = 1024 * 1024
+
 def get_msmarco_dataset(verbose: bool = False):
     """
     Downloads the MS MARCO dataset to the data directory.
@@ -42,9 +47,10 @@ def get_msmarco_dataset(verbose: bool = False):
                         for data in response.iter_content(block_size):
                             f.write(data)
                             pbar.update(len(data))
-            except (KeyboardInterrupt, Exception) as e:
-                os.remove(path)
-                raise e
+            except BaseException:
+                if os.path.exists(path):
+                    os.remove(path)
+                raise
         decompressed_path = path.replace(".tar.gz", "")
         decompressed_path = decompressed_path.replace(".gz", "")
         if file_name.endswith(".tar.gz") and not os.path.exists(f"{decompressed_path}.tsv"):
@@ -57,20 +63,117 @@ def get_msmarco_dataset(verbose: bool = False):
                 not os.path.exists(decompressed_path):
             if verbose:
                 print(f"Decompressing {file_name}...")
-            with gzip.open(path, "rb") as f_in:
-                with open(decompressed_path, "wb") as f_out:
-                    f_out.write(f_in.read())
+            try:
+                with gzip.open(path, "rb") as f_in:
+                    with open(decompressed_path, "wb") as f_out:
+                        shutil.copyfileobj(f_in, f_out, COLLECTION_CHUNK_SIZE)
+            except BaseException:
+                if os.path.exists(decompressed_path):
+                    os.remove(decompressed_path)
+                raise
 
 def msmarco_dataset_to_contents(corpus: pd.DataFrame, verbose: bool = False) -> SizedGenerator[DocumentContents, None, None]:
     """
     Returns the number of documents and a generator of DocumentContents from the test corpus.
     """
     def inner() -> Generator[DocumentContents, None, None]:
-        for _, row in corpus.iterrows():
-            yield DocumentContents(author="", title="", body=row['text'], doc_id=int(row['docno']))
+        for docno, text in zip(corpus['docno'], corpus['text']):
+            yield DocumentContents(author="", title="", body=text, doc_id=int(docno))
     return SizedGenerator(inner(), len(corpus))
 
 
+def _open_collection(path: str, chunk_size: int):
+    if path.endswith(".gz"):
+        # the decompressed data is read in chunks of chunk_size too
+        return io.BufferedReader(gzip.open(path, "rb"), buffer_size=chunk_size)
+    return open(path, "rb", buffering=chunk_size)
+
+
+def _count_lines(path: str, chunk_size: int, end_offset: Optional[int] = None) -> int:
+    # the lines of the file up to end_offset (of the decompressed file), a last line without a newline counts too
+    lines = 0
+    last_chunk = b""
+    read = 0
+    with _open_collection(path, chunk_size) as f:
+        while chunk := f.read(chunk_size if end_offset is None else min(chunk_size, end_offset - read)):
+            read += len(chunk)
+            lines += chunk.count(b"\n")
+            last_chunk = chunk
+    if last_chunk and not last_chunk.endswith(b"\n"):
+        lines += 1
+    return lines
+
+
+def count_collection_lines(path: str, start_offset: int = 0, chunk_size: int = COLLECTION_CHUNK_SIZE) -> int:
+    """
+    Count the lines of a collection file after an offset, reading it in chunks.
+    The number of lines of the whole file is cached in path + ".lines" with the size and modification time of the file,
+    so a file is only read once, afterwards only the part before start_offset is read.
+
+    # Parameters
+    - path (str): The path of the file, it can be gzip compressed.
+    - start_offset (int): The offset in bytes (of the decompressed file) where to start counting, at the start of a line.
+    - chunk_size (int): The size of the chunks read from the file.
+
+    # Returns
+    - int: The number of lines.
+    """
+    stat = os.stat(path)
+    key = f"{stat.st_size} {stat.st_mtime_ns}"
+    cache_path = f"{path}.lines"
+    lines = None
+    try:
+        with open(cache_path) as f:
+            cached_key, _, cached_lines = f.read().strip().rpartition(" ")
+        if cached_key == key:
+            lines = int(cached_lines)
+    except (OSError, ValueError):
+        pass
+    if lines is None:
+        lines = _count_lines(path, chunk_size)
+        try:
+            with open(cache_path, "w") as f:
+                f.write(f"{key} {lines}\n")
+        except OSError:
+            # the directory of the collection can be read-only
+            pass
+    if start_offset > 0:
+        lines -= _count_lines(path, chunk_size, start_offset)
+    return lines
+
+
+def msmarco_collection_to_contents(path: str, start_offset: int = 0, chunk_size: int = COLLECTION_CHUNK_SIZE, length: Optional[int] = None) -> SizedGenerator[DocumentContents, None, None]:
+    """
+    Stream the documents of a collection in the MS MARCO format (docno<TAB>text, one per line)
+    without loading the whole file in memory.
+    Every document has an offset attribute with the position of the next document in the file,
+    passing it as start_offset resumes the reading after that document,
+    and the generator can be resumed that way by SqliteIndex.bulk_index_documents.
+
+    # Parameters
+    - path (str): The path of the collection, it can be gzip compressed.
+    - start_offset (int): The offset in bytes (of the decompressed file) where to start reading.
+    - chunk_size (int): The size of the chunks read from the file.
+    - length (Optional[int]): The number of documents after start_offset, if known, otherwise they are counted.
+
+    # Returns
+    - SizedGenerator[DocumentContents, None, None]: The documents after start_offset.
+    """
+    def inner() -> Generator[DocumentContents, None, None]:
+        offset = start_offset
+        with _open_collection(path, chunk_size) as f:
+            f.seek(start_offset)
+            for line in f:
+                offset += len(line)
+                docno, _, text = line.decode("utf-8").rstrip("\r\n").partition("\t")
+                if docno == "":
+                    continue
+                yield DocumentContents(author="", title="", body=text, doc_id=int(docno), offset=offset)
+    return SizedGenerator(
+        inner(), length if length is not None else count_collection_lines(path, start_offset, chunk_size),
+        lambda offset, length: msmarco_collection_to_contents(path, offset, chunk_size, length))
+
+
 if __name__ == "__main__":
     #df = get_dataset(verbose=True)
     get_msmarco_dataset(verbose=True)
@@ -1,5 +1,5 @@
-from collections.abc import Generator, Sized
-from typing import TypeVar, Generic
+from collections.abc import Callable, Generator, Sized
+from typing import Generic, Optional, TypeVar
 
 T = TypeVar('T')
 P = TypeVar('P')
@@ -7,9 +7,12 @@ Q = TypeVar('Q')
 
 
 class SizedGenerator(Generic[T, P, Q], Generator[T, P, Q], Sized):
-    def __init__(self, generator: Generator[T, P, Q], length: int):
+    def __init__(self, generator: Generator[T, P, Q], length: int, resume: Optional[Callable[[int, int], "SizedGenerator[T, P, Q]"]] = None):
         self.generator = generator
         self.length = length
+        # a function of an offset and a length that returns the items after the one with that offset attribute,
+        # used to resume an interrupted bulk indexing without reading the items again
+        self.resume = resume
 
     def __iter__(self):
         return self.generator
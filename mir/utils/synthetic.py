@@ -0,0 +1,142 @@
+from collections.abc import Generator
+import itertools
+import math
+import random
+from typing import Optional
+
+import pandas as pd
+
+from mir.ir.document_contents import DocumentContents
+from mir.utils.sized_generator import SizedGenerator
+
+
+def synthetic_word(i: int) -> str:
+    """
+    Get a pronounceable word made only of letters from an integer, different integers give different words.
+
+    # Parameters
+    - i (int): The index of the word.
+
+    # Returns
+    - str: The word.
+    """
+    consonants = "bcdfghjklmnpqrstvwxz"
+    vowels = "aeiou"
+    word = ""
+    while True:
+        word += consonants[i % len(consonants)] + vowels[(i // len(consonants)) % len(vowels)]
+        i //= len(consonants) * len(vowels)
+        if i == 0:
+            return word
+
+
+def zipf_cumulative_weights(n: int, exponent: float) -> list[float]:
+    """
+    Get the cumulative weights of a Zipf distribution over n ranks, to be used with random.choices.
+
+    # Parameters
+    - n (int): The number of ranks.
+    - exponent (float): The exponent of the distribution, the weight of rank r is 1 / r^exponent.
+
+    # Returns
+    - list[float]: The cumulative weights.
+    """
+    return list(itertools.accumulate(1 / rank ** exponent for rank in range(1, n + 1)))
+
+
+class SyntheticCollection:
+    def __init__(
+            self,
+            num_docs: int,
+            vocabulary_size: int = 50000,
+            zipf_exponent: float = 1.07,
+            mean_body_length: float = 56,
+            body_length_sigma: float = 0.45,
+            mean_title_length: float = 6,
+            num_authors: int = 1000,
+            seed: int = 42):
+        """
+        A synthetic collection with author, title and body fields, for offline load testing.
+        Words follow a Zipf distribution and body lengths a log-normal distribution,
+        the defaults are close to the statistics of the MS MARCO passages.
+        The same seed always generates the same documents and queries.
+
+        # Parameters
+        - num_docs (int): The number of documents.
+        - vocabulary_size (int): The number of distinct words.
+        - zipf_exponent (float): The exponent of the Zipf distribution of the words.
+        - mean_body_length (float): The mean number of words in a body.
+        - body_length_sigma (float): The standard deviation of the logarithm of the body length.
+        - mean_title_length (float): The mean number of words in a title, 0 for no titles.
+        - num_authors (int): The number of distinct authors, 0 for no authors.
+        - seed (int): The seed of the random generator.
+        """
+        self.num_docs = num_docs
+        self.vocabulary = [synthetic_word(i) for i in range(vocabulary_size)]
+        self.cumulative_weights = zipf_cumulative_weights(vocabulary_size, zipf_exponent)
+        self.body_length_mu = math.log(mean_body_length) - body_length_sigma ** 2 / 2
+        self.body_length_sigma = body_length_sigma
+        self.mean_title_length = mean_title_length
+        # authors are words outside of the vocabulary
+        self.authors = [
+            f"{synthetic_word(vocabulary_size + 2 * i)} {synthetic_word(vocabulary_size + 2 * i + 1)}"
+            for i in range(num_authors)]
+        self.seed = seed
+
+    def _words(self, rng: random.Random, k: int) -> list[str]:
+        return rng.choices(self.vocabulary, cum_weights=self.cumulative_weights, k=k)
+
+    def documents(self, start_doc_id: int = 0) -> SizedGenerator[DocumentContents, None, None]:
+        """
+        Generate the documents of the collection.
+
+        # Parameters
+        - start_doc_id (int): The doc_id of the first document.
+
+        # Returns
+        - SizedGenerator[DocumentContents, None, None]: The documents, with consecutive doc_ids.
+        """
+        rng = random.Random(self.seed)
+        def inner() -> Generator[DocumentContents, None, None]:
+            for doc_id in range(start_doc_id, start_doc_id + self.num_docs):
+                body_length = max(1, round(rng.lognormvariate(self.body_length_mu, self.body_length_sigma)))
+                title_length = min(3 * self.mean_title_length, rng.expovariate(1 / self.mean_title_length)) if self.mean_title_length > 0 else 0
+                author = rng.choice(self.authors) if len(self.authors) > 0 else ""
+                title = " ".join(self._words(rng, round(title_length)))
+                body = " ".join(self._words(rng, body_length))
+                yield DocumentContents(author, title, body, doc_id=doc_id)
+        return SizedGenerator(inner(), self.num_docs)
+
+    def queries(self, num_queries: int, num_distinct: Optional[int] = None, repetition_exponent: float = 1.0, mean_length: float = 6, skip_top_words: int = 100) -> pd.DataFrame:
+        """
+        Generate a query log where popular (head) queries are repeated many times
+        and the tail is made of rare queries.
+
+        # Parameters
+        - num_queries (int): The number of queries in the log.
+        - num_distinct (Optional[int]): The number of distinct queries. If None, half of num_queries.
+        - repetition_exponent (float): The exponent of the Zipf distribution of the query frequencies,
+        0 gives no repetition bias.
+        - mean_length (float): The mean number of words in a query.
+        - skip_top_words (int): The number of most frequent words that are not used in the queries,
+        like stopwords are rarely the content of a query.
+
+        # Returns
+        - pd.DataFrame: The query log in the format of Ir.get_run, with the columns "query_id" and "text".
+        Repeated queries have the same query_id.
+        """
+        rng = random.Random(self.seed + 1)
+        num_distinct = num_distinct if num_distinct is not None else max(1, num_queries // 2)
+        skip_top_words = min(skip_top_words, len(self.vocabulary) - 1)
+        query_vocabulary = self.vocabulary[skip_top_words:]
+        query_weights = [weight - self.cumulative_weights[skip_top_words - 1] for weight in self.cumulative_weights[skip_top_words:]] \
+            if skip_top_words > 0 else self.cumulative_weights
+        distinct_queries = []
+        for _ in range(num_distinct):
+            length = max(1, min(round(rng.gauss(mean_length, mean_length / 3)), 3 * round(mean_length)))
+            distinct_queries.append(" ".join(rng.choices(query_vocabulary, cum_weights=query_weights, k=length)))
+        query_ids = rng.choices(range(num_distinct), cum_weights=zipf_cumulative_weights(num_distinct, repetition_exponent), k=num_queries)
+        return pd.DataFrame({
+            "query_id": query_ids,
+            "text": [distinct_queries[query_id] for query_id in query_ids],
+        })